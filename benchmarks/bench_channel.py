@@ -0,0 +1,108 @@
+"""
+Benchmark the press-to-dispatch latency of the command channel.
+
+Compares three ways of getting a command from a key press onto the controller's
+command queue:
+
+    legacy      a fresh `send_command.py` interpreter and TCP connection per press
+    connect     a new TCP connection per press from an already running client
+    persistent  one resident connection carrying every press
+
+Usage:
+    python benchmarks/bench_channel.py [presses] [--port <port>]
+"""
+
+import os
+import queue
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import controller  # pylint: disable=wrong-import-position
+from controller import Controller  # pylint: disable=wrong-import-position
+
+COMMAND = "skip_forward"
+SEND_COMMAND = os.path.join(ROOT, "send_command.py")
+
+dispatched = queue.Queue()
+
+
+def drain_queue():
+    """Stand-in for send_command_loop: timestamp every command taken off the queue."""
+    while True:
+        command = Controller.command_queue.get()
+        if command.name == "exit":
+            return
+        dispatched.put(time.perf_counter())
+
+def press_legacy(port):
+    """One press the way the .bat files do it today."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, SEND_COMMAND, "--port", str(port), COMMAND], check=True)
+    return dispatched.get() - start
+
+def press_connect(port):
+    """One press over a fresh connection, without the interpreter startup."""
+    start = time.perf_counter()
+    with socket.create_connection((Controller.host, port)) as s:
+        s.sendall(f"{COMMAND}\n".encode())
+        latency = dispatched.get() - start
+        s.recv(64)
+    return latency
+
+def make_press_persistent(port):
+    """Open one resident connection and return a press function that reuses it."""
+    s = socket.create_connection((Controller.host, port))
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    reader = s.makefile("rb")
+
+    def press(_port):
+        start = time.perf_counter()
+        s.sendall(f"{COMMAND}\n".encode())
+        latency = dispatched.get() - start
+        reader.readline()
+        return latency
+    return press, s
+
+def report(name, samples):
+    """Print the latency summary of one path in milliseconds."""
+    ms = sorted(sample * 1000 for sample in samples)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    print(f"{name:<12} mean {statistics.mean(ms):8.3f} ms   p50 {statistics.median(ms):8.3f} ms"
+          f"   p95 {p95:8.3f} ms   ({len(ms)} presses)")
+
+def main(argv):
+    """Run every path against an in-process listener."""
+    presses = 50
+    if "--port" in argv:
+        index = argv.index("--port")
+        Controller.port = int(argv[index + 1])
+        del argv[index:index + 2]
+    if argv:
+        presses = int(argv[0])
+
+    controller.print_msg = lambda *args, **kwargs: None
+    threading.Thread(target=controller.socket_listener, daemon=True).start()
+    threading.Thread(target=drain_queue, daemon=True).start()
+    time.sleep(0.2)
+
+    press_persistent, persistent_socket = make_press_persistent(Controller.port)
+    for name, press in (("legacy", press_legacy),
+                        ("connect", press_connect),
+                        ("persistent", press_persistent)):
+        press(Controller.port)  # warm-up
+        report(name, [press(Controller.port) for _ in range(presses)])
+    persistent_socket.close()
+
+    Controller.running = False
+    Controller.command_queue.put(controller.QueuedCommand("exit"))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
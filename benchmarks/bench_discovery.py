@@ -0,0 +1,71 @@
+"""
+Benchmark how fast the controller finds a YouTube tab that was just opened.
+
+Runs find_youtube_tabs against the fake DevTools endpoint in benchmarks/fake_cdp.py,
+opens a video tab while it is waiting and measures how long it takes to return, once
+with the CDP Target events and once with HTTP polling of /json.
+
+Usage:
+    python benchmarks/bench_discovery.py [rounds]
+"""
+
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import controller  # pylint: disable=wrong-import-position
+from controller import Controller  # pylint: disable=wrong-import-position
+from fake_cdp import FakeChrome  # pylint: disable=wrong-import-position
+
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def discover_once(chrome):
+    """Open a video tab while the controller is looking and time until it is found."""
+    found = {}
+
+    def find():
+        found["url"] = controller.find_youtube_tabs()[0]["webSocketDebuggerUrl"]
+        found["at"] = time.perf_counter()
+
+    chrome.open_tab("https://www.youtube.com/")
+    finder = threading.Thread(target=find)
+    finder.start()
+    time.sleep(0.3)  # Let it settle into waiting for a video
+    start = time.perf_counter()
+    tab = chrome.open_tab(VIDEO_URL)
+    finder.join()
+    for other in list(chrome.tabs.values()):
+        chrome.close_tab(other)
+    watcher = Controller.tab_watcher
+    while Controller.use_target_discovery and watcher and watcher.snapshot():
+        time.sleep(0.01)  # Let the closes reach the index before the next round
+    assert found["url"].endswith(tab.id), found["url"]
+    return found["at"] - start
+
+def report(name, samples):
+    """Print the discovery latency summary in milliseconds."""
+    ms = [sample * 1000 for sample in samples]
+    print(f"{name:<15} mean {statistics.mean(ms):9.3f} ms   p50 {statistics.median(ms):9.3f} ms"
+          f"   max {max(ms):9.3f} ms   ({len(ms)} rounds)")
+
+def main(argv):
+    """Compare Target events with HTTP polling."""
+    rounds = int(argv[0]) if argv else 5
+    controller.print_msg = lambda *args, **kwargs: None
+    chrome = FakeChrome().start()
+    Controller.devtools_urls = [chrome.devtools_url]
+
+    for name, use_events in (("target events", True), ("http polling", False)):
+        Controller.use_target_discovery = use_events
+        report(name, [discover_once(chrome) for _ in range(rounds)])
+    chrome.stop()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,54 @@
+"""
+Benchmark what logging costs the command pipeline.
+
+Runs benchmarks/load_test.py with logging off, with every message written by the thread
+that sends the commands (sync, how print_msg used to work) and through the LogWorker
+thread (async), each in its own process, and prints their throughput and latency. The
+log goes to os.devnull unless --log-output names a file or a terminal (e.g. /dev/tty),
+which is where writing it synchronously hurts most.
+
+Usage:
+    python benchmarks/bench_logging.py [--clients 4] [--commands 500] [--asyncio]
+                                       [--log-output PATH] [--port PORT]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+LOAD_TEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "load_test.py")
+MODES = ("off", "sync", "async")
+
+
+def run(mode, args, port):
+    """Run the load test in one logging mode and return its throughput and latency lines."""
+    command = [sys.executable, LOAD_TEST, "--logging", mode, "--log-output", args.log_output,
+               "--clients", str(args.clients), "--commands", str(args.commands),
+               "--port", str(port)]
+    if args.asyncio:
+        command.append("--asyncio")
+    result = subprocess.run(command, capture_output=True, text=True, check=False, timeout=600)
+    lines = [line for line in result.stdout.splitlines()
+             if line.startswith(("throughput", "latency"))]
+    if result.returncode or len(lines) != 2:
+        return f"failed (exit {result.returncode}): {result.stderr.strip()[-200:]}"
+    return "\n        ".join(lines)
+
+def main(argv):
+    """Compare the logging modes."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--commands", type=int, default=500, help="commands per client")
+    parser.add_argument("--asyncio", action="store_true", help="use the asyncio event core")
+    parser.add_argument("--log-output", default=os.devnull, metavar="PATH")
+    parser.add_argument("--port", type=int, default=65440,
+                        help="first of the three ports the runs listen on")
+    args = parser.parse_args(argv)
+
+    for index, mode in enumerate(MODES):
+        print(f"{mode:<7} {run(mode, args, args.port + index)}", flush=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,82 @@
+"""
+Helpers shared by the benchmarks that run the whole controller in-process.
+
+They start the controller's listener and sender the way main() does (without the tray),
+point them at the fake Chrome in benchmarks/fake_cdp.py, and wait until the fake tab is
+connected and the command port is listening. Import them after the repository root is
+on sys.path, since they import the controller.
+"""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import controller
+from controller import Controller, Metrics
+from fake_cdp import FakeChrome
+
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def percentile(ordered, fraction):
+    """Gets the nearest-rank percentile of sorted samples."""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def start_fake_chrome(latency=0.0):
+    """Start a fake Chrome with one video tab and point the controller at it.
+
+    Returns the FakeChrome and its FakeTab; latency delays every reply of the tab (seconds).
+    """
+    chrome = FakeChrome(latency=latency).start()
+    tab = chrome.open_tab(VIDEO_URL)
+    Controller.devtools_urls = [chrome.devtools_url]
+    return chrome, tab
+
+def start_controller(use_asyncio):
+    """Run the listener and the sender on Controller.port, and wait until the sender is
+    connected to a tab and the port accepts connections."""
+    controller.check_port_available(Controller.port)
+    controller.setup_tray = lambda: None
+    if use_asyncio:
+        threading.Thread(target=lambda: asyncio.run(controller.async_main()), daemon=True).start()
+    else:
+        threading.Thread(target=controller.socket_listener, daemon=True).start()
+        threading.Thread(target=controller.send_command_loop, daemon=True).start()
+    while not Metrics.counters["connects"]:
+        time.sleep(0.05)  # Wait until the controller is connected to the tab
+    while True:
+        try:
+            socket.create_connection((Controller.host, Controller.port)).close()
+            break
+        except ConnectionRefusedError:
+            time.sleep(0.05)  # ...and listening
+
+def connect_client():
+    """Open a command connection to the controller; returns the socket and a reader of its
+    reply lines."""
+    s = socket.create_connection((Controller.host, Controller.port))
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    s.settimeout(30)
+    return s, s.makefile("rb")
+
+def start_receiver(reader, count):
+    """Read up to count JSON frame replies on a thread, until the connection times out.
+
+    Returns the started thread and a dict that maps the id of every reply to
+    (arrival time, reply).
+    """
+    replies = {}
+
+    def receive():
+        try:
+            for _ in range(count):
+                reply = json.loads(reader.readline())
+                replies[reply["id"]] = (time.perf_counter(), reply)
+        except (OSError, ValueError):
+            pass  # Timed out; the missing replies count as unanswered
+
+    receiver = threading.Thread(target=receive)
+    receiver.start()
+    return receiver, replies
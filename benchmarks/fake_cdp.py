@@ -0,0 +1,292 @@
+"""
+A stand-in for Chrome's DevTools endpoint, for benchmarks that must run without Chrome.
+
+Serves the HTTP endpoints (/json, /json/list, /json/version) and the WebSockets of the
+browser and of every tab on one port, like `chrome --remote-debugging-port` does. Tabs
+can be opened, navigated and closed from Python; browser connections that called
+Target.setDiscoverTargets receive the matching Target events. Every request sent to a
+tab is answered with an empty result and recorded in FakeTab.received.
+
+Faults can be injected per tab: FakeTab.latency delays every reply (like a busy page),
+FakeTab.drop_every drops the tab's connections after every n-th Runtime.evaluate
+without answering it, and FakeChrome.disconnect() drops them at once.
+FakeChrome.call_binding() stands in for the page calling a binding such as __ytcState.
+
+Usage:
+    chrome = FakeChrome(latency=0.002).start()
+    tab = chrome.open_tab("https://www.youtube.com/watch?v=abc")
+    Controller.devtools_urls = [chrome.devtools_url]
+"""
+
+import base64
+import hashlib
+import itertools
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class FakeTab:
+    """A tab of the fake browser"""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, target_id, url, latency=0.0):
+        self.id = target_id
+        self.url = url
+        self.latency = latency
+        self.drop_every = 0
+        self.received = []
+        self.connections = []
+        self.context_ids = itertools.count(1)
+        self.evaluations = itertools.count(1)
+        self.dropped = 0
+
+    def expressions(self):
+        """The expressions of every Runtime.evaluate received, in order"""
+        return [message["params"]["expression"] for message in list(self.received)
+                if message.get("method") == "Runtime.evaluate"]
+
+    def info(self):
+        """The tab as a Target.TargetInfo"""
+        return {"targetId": self.id, "type": "page", "title": self.url, "url": self.url,
+                "attached": bool(self.connections)}
+
+
+class WebSocketConnection:
+    """Server side of one WebSocket connection (text frames only)"""
+
+    def __init__(self, sock, reader):
+        self.sock = sock
+        self.reader = reader
+        self.send_lock = threading.Lock()
+
+    def recv(self):
+        """Read one text message, or None once the client closed the connection"""
+        while True:
+            head = self.reader.read(2)
+            if len(head) < 2:
+                return None
+            opcode, length = head[0] & 0x0F, head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack(">H", self.reader.read(2))[0]
+            elif length == 127:
+                length = struct.unpack(">Q", self.reader.read(8))[0]
+            mask = self.reader.read(4) if head[1] & 0x80 else b"\0\0\0\0"
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self.reader.read(length)))
+            if opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                self._send_frame(0xA, payload)
+            elif opcode in (0x1, 0x2):
+                return payload.decode()
+
+    def send(self, message):
+        """Send one JSON message"""
+        self._send_frame(0x1, json.dumps(message).encode())
+
+    def _send_frame(self, opcode, payload):
+        if len(payload) < 126:
+            header = struct.pack(">BB", 0x80 | opcode, len(payload))
+        elif len(payload) < 1 << 16:
+            header = struct.pack(">BBH", 0x80 | opcode, 126, len(payload))
+        else:
+            header = struct.pack(">BBQ", 0x80 | opcode, 127, len(payload))
+        with self.send_lock:
+            try:
+                self.sock.sendall(header + payload)
+            except OSError:
+                pass
+
+    def close(self):
+        """Drop the connection"""
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class FakeChrome:
+    """The fake browser: its tabs and the server that exposes them"""
+    ids = itertools.count(1)  # Shared, so tab ids are unique across fake browsers like in Chrome
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.tabs = {}
+        self.browser_connections = []
+        self.lock = threading.Lock()
+        self.server = None
+
+    @property
+    def devtools_url(self):
+        """An entry for Controller.devtools_urls"""
+        return f"http://{self.host}:{self.port}/json"
+
+    def start(self):
+        """Start serving on a background thread"""
+        chrome = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            """Dispatches one client connection"""
+            def handle(self):
+                chrome.handle(self.connection, self.rfile)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop the server and drop every connection"""
+        self.server.shutdown()
+        self.server.server_close()
+        with self.lock:
+            connections = self.browser_connections + [
+                conn for tab in self.tabs.values() for conn in tab.connections]
+        for conn in connections:
+            conn.close()
+
+    ### Tabs ###
+
+    def open_tab(self, url):
+        """Open a tab and announce it to the browser connections"""
+        tab = FakeTab(f"TAB{next(self.ids)}", url, self.latency)
+        with self.lock:
+            self.tabs[tab.id] = tab
+        self._broadcast("Target.targetCreated", {"targetInfo": tab.info()})
+        return tab
+
+    def navigate(self, tab, url):
+        """Change the URL of a tab, like a YouTube navigation"""
+        tab.url = url
+        self._broadcast("Target.targetInfoChanged", {"targetInfo": tab.info()})
+
+    def disconnect(self, tab):
+        """Drop the WebSockets of a tab while leaving the tab open, like a renderer crash"""
+        with self.lock:
+            connections = list(tab.connections)
+        for conn in connections:
+            conn.close()
+
+    def call_binding(self, tab, name, payload):
+        """Send a Runtime.bindingCalled event to a tab's connections, as if the page called it"""
+        with self.lock:
+            connections = list(tab.connections)
+        for conn in connections:
+            conn.send({"method": "Runtime.bindingCalled", "params": {
+                "name": name, "payload": payload, "executionContextId": 1}})
+
+    def close_tab(self, tab):
+        """Close a tab and its WebSockets"""
+        with self.lock:
+            self.tabs.pop(tab.id, None)
+            connections = list(tab.connections)
+        for conn in connections:
+            conn.close()
+        self._broadcast("Target.targetDestroyed", {"targetId": tab.id})
+
+    def _broadcast(self, method, params):
+        with self.lock:
+            connections = list(self.browser_connections)
+        for conn in connections:
+            conn.send({"method": method, "params": params})
+
+    def _tab_json(self, tab):
+        return {"id": tab.id, "type": "page", "title": tab.url, "url": tab.url,
+                "webSocketDebuggerUrl": f"ws://{self.host}:{self.port}/devtools/page/{tab.id}"}
+
+    ### Protocol ###
+
+    def handle(self, sock, rfile):
+        """Serve one HTTP request or WebSocket connection"""
+        sock.settimeout(None)  # Connections may idle; controller.py lowers the default timeout
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        request_line = rfile.readline().decode(errors="replace").split()
+        headers = {}
+        for line in iter(rfile.readline, b"\r\n"):
+            if not line:
+                return
+            name, _, value = line.decode(errors="replace").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if len(request_line) < 2:
+            return
+        path = request_line[1]
+
+        if headers.get("upgrade", "").lower() == "websocket":
+            accept = base64.b64encode(hashlib.sha1(
+                (headers["sec-websocket-key"] + WS_GUID).encode()).digest()).decode()
+            sock.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                          "Connection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+            conn = WebSocketConnection(sock, rfile)
+            if path.startswith("/devtools/browser"):
+                self.serve_browser(conn)
+            else:
+                self.serve_tab(conn, path.rsplit("/", 1)[-1])
+            return
+
+        if path in ("/json", "/json/list"):
+            with self.lock:
+                body = [self._tab_json(tab) for tab in self.tabs.values()]
+        elif path == "/json/version":
+            body = {"Browser": "FakeChrome/1.0",
+                    "webSocketDebuggerUrl": f"ws://{self.host}:{self.port}/devtools/browser/fake"}
+        else:
+            sock.sendall(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+            return
+        data = json.dumps(body).encode()
+        sock.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: %d\r\nConnection: close\r\n\r\n%s" % (len(data), data))
+
+    def serve_browser(self, conn):
+        """Answer browser-level requests, sending Target events once discovery is on"""
+        while (raw := conn.recv()) is not None:
+            message = json.loads(raw)
+            if message.get("method") == "Target.setDiscoverTargets":
+                with self.lock:
+                    tabs = list(self.tabs.values())
+                for tab in tabs:
+                    conn.send({"method": "Target.targetCreated",
+                               "params": {"targetInfo": tab.info()}})
+                with self.lock:
+                    self.browser_connections.append(conn)
+            conn.send({"id": message["id"], "result": {}})
+        with self.lock:
+            if conn in self.browser_connections:
+                self.browser_connections.remove(conn)
+
+    def serve_tab(self, conn, target_id):
+        """Answer the requests sent to a tab and record them"""
+        with self.lock:
+            tab = self.tabs.get(target_id)
+            if tab is None:
+                conn.close()
+                return
+            tab.connections.append(conn)
+        while (raw := conn.recv()) is not None:
+            message = json.loads(raw)
+            tab.received.append(message)
+            if (message.get("method") == "Runtime.evaluate" and tab.drop_every
+                    and next(tab.evaluations) % tab.drop_every == 0):
+                tab.dropped += 1
+                self.disconnect(tab)
+                break
+            if tab.latency:
+                time.sleep(tab.latency)
+            if message.get("method") == "Runtime.enable":
+                context = {"id": next(tab.context_ids),
+                           "auxData": {"isDefault": True, "frameId": tab.id}}
+                conn.send({"method": "Runtime.executionContextCreated",
+                           "params": {"context": context}})
+            conn.send({"id": message["id"], "result": {"result": {"type": "undefined"}}})
+        with self.lock:
+            if conn in tab.connections:
+                tab.connections.remove(conn)
@@ -0,0 +1,151 @@
+"""
+Load-test the whole command pipeline against the fake DevTools endpoint.
+
+Starts the controller's listener and sender in-process, pointed at the fake Chrome in
+benchmarks/fake_cdp.py, and has many concurrent clients blast pipelined JSON frames at
+the command port. Every command carries a unique (client, sequence) number, so the
+expressions the fake tab received show which commands were lost, duplicated or reached
+the tab out of order. Reports throughput and the client-side latency percentiles.
+With --logging sync or async the controller logs every command as usual (to os.devnull
+unless --log-output names a file or terminal); by default logging is off.
+
+Usage:
+    python benchmarks/load_test.py [--clients 8] [--commands 200] [--latency MS]
+                                   [--drop-every N] [--asyncio] [--port PORT]
+                                   [--capacity N] [--logging off|sync|async]
+                                   [--log-output PATH]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import controller  # pylint: disable=wrong-import-position
+from controller import Controller  # pylint: disable=wrong-import-position
+from bench_util import (  # pylint: disable=wrong-import-position
+    connect_client, percentile, start_controller, start_fake_chrome, start_receiver)
+
+CLIENT_SPAN = 1_000_000  # skip_seconds = client * CLIENT_SPAN + sequence
+SECONDS_RE = re.compile(r'"skip_seconds":\s*(\d+)|currentTime \+= (\d+)')
+
+
+def run_client(client, commands, results):
+    """Send every command of one client over one connection and time each reply."""
+    sent = {}
+    s, reader = connect_client()
+    with s:
+        receiver, replies = start_receiver(reader, commands)
+        for sequence in range(commands):
+            frame = {"v": 1, "id": sequence, "name": "skip_forward",
+                     "args": {"skip_seconds": client * CLIENT_SPAN + sequence}}
+            sent[sequence] = time.perf_counter()
+            s.sendall(f"{json.dumps(frame)}\n".encode())
+        receiver.join()
+    results[client] = (sent, {sequence: (replied, reply["ok"])
+                              for sequence, (replied, reply) in replies.items()})
+
+def check_arrivals(tab, clients, commands):
+    """Count the commands the tab never got, got twice or got out of order."""
+    arrived = {}
+    misordered = 0
+    last = {}
+    for expression in tab.expressions():
+        match = SECONDS_RE.search(expression)
+        if not match:
+            continue
+        client, sequence = divmod(int(match.group(1) or match.group(2)), CLIENT_SPAN)
+        arrived[(client, sequence)] = arrived.get((client, sequence), 0) + 1
+        if sequence < last.get(client, -1):
+            misordered += 1
+        last[client] = sequence
+    missing = clients * commands - len(arrived)
+    duplicates = sum(count - 1 for count in arrived.values())
+    return missing, duplicates, misordered
+
+def main(argv):
+    """Run the load test and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--commands", type=int, default=200, help="commands per client")
+    parser.add_argument("--latency", type=float, default=0.0, metavar="MS",
+                        help="delay every reply of the fake tab by MS milliseconds")
+    parser.add_argument("--drop-every", type=int, default=0, metavar="N",
+                        help="drop the tab's connection after every N-th command")
+    parser.add_argument("--asyncio", action="store_true", help="use the asyncio event core")
+    parser.add_argument("--port", type=int, default=Controller.port)
+    parser.add_argument("--capacity", type=int, default=0, metavar="N",
+                        help="bound the command queue to N commands (default: room for all)")
+    parser.add_argument("--logging", choices=("off", "sync", "async"), default="off",
+                        help="log on the sending thread (sync) or the log worker (async)")
+    parser.add_argument("--log-output", default=os.devnull, metavar="PATH",
+                        help="where the log goes with --logging (default: discarded)")
+    args = parser.parse_args(argv)
+
+    report = sys.stdout
+    if args.logging == "off":
+        controller.print_msg = lambda *args, **kwargs: None
+    else:
+        Controller.log_async = args.logging == "async"
+        sys.stdout = open(args.log_output, "w", encoding="utf-8")  # pylint: disable=consider-using-with
+    controller.clear_screen = lambda: None
+    chrome, tab = start_fake_chrome(args.latency / 1000)
+    tab.drop_every = args.drop_every
+    Controller.port = args.port
+    Controller.queue_capacity = args.capacity or args.clients * args.commands
+    start_controller(args.asyncio)
+
+    results = {}
+    clients = [threading.Thread(target=run_client, args=(client, args.commands, results))
+               for client in range(args.clients)]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    time.sleep(0.2)  # Let the last evaluations reach the tab
+    controller.LogWorker.flush()
+    sys.stdout = report
+
+    latencies = []
+    failed = unanswered = 0
+    for sent, replies in results.values():
+        unanswered += len(sent) - len(replies)
+        for sequence, (replied, ok) in replies.items():
+            latencies.append((replied - sent[sequence]) * 1000)
+            failed += not ok
+    missing, duplicates, misordered = check_arrivals(tab, args.clients, args.commands)
+    total = args.clients * args.commands
+    latencies.sort()
+
+    print(f"{'asyncio' if args.asyncio else 'threads'}: {args.clients} clients x "
+          f"{args.commands} commands, logging {args.logging}, tab latency {args.latency} ms, "
+          f"drop every {args.drop_every or '-'} ({tab.dropped} drops)")
+    print(f"throughput  {total / elapsed:10.1f} commands/s   ({elapsed:.3f} s)")
+    if latencies:
+        print(f"latency     p50 {percentile(latencies, 0.5):8.3f} ms   "
+              f"p95 {percentile(latencies, 0.95):8.3f} ms   "
+              f"p99 {percentile(latencies, 0.99):8.3f} ms   max {latencies[-1]:8.3f} ms")
+    print(f"failed {failed}   unanswered {unanswered}   never reached the tab {missing}   "
+          f"duplicated {duplicates}   misordered {misordered}")
+    counters = controller.Metrics.snapshot()
+    print(f"queue: max depth {counters['max_queue_depth']}   rejected {counters['rejected']}   "
+          f"evicted {counters['evicted']}   expired {counters['expired']}")
+    recover = counters["latency_ms"].get("recover", {})
+    print(f"reconnects {counters['reconnects']}   replayed {counters['replayed']}   "
+          f"time to recover p50 {recover.get('p50', '-')} ms   p99 {recover.get('p99', '-')} ms")
+
+    controller.on_quit(None)
+    chrome.stop()
+    return 1 if unanswered or misordered or missing > failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,152 @@
+"""
+Replay a recorded command trace through the controller and compare the stage latencies.
+
+A trace is written by the controller when it runs with --trace PATH (see TraceRecorder).
+This starts the controller's listener and sender in-process, pointed at the fake Chrome
+in benchmarks/fake_cdp.py (or at a real browser with --devtools), and sends the traced
+commands as JSON frames at their original pace, --speed times faster, or back to back
+with --speed 0. The replay is traced itself; the report shows the p50/p95 of every stage
+of the original and the replay side by side, so changes to the commands, the queue or
+the connection code can be compared on the same workload. --compare diffs two traces
+without replaying anything.
+
+Commands traced for a specific tab go to the default tab, since tab ids differ between
+browser sessions; commands for "all" tabs still go to all of them.
+
+Usage:
+    python benchmarks/replay_trace.py TRACE [--speed 1] [--devtools URL] [--latency MS]
+                                            [--asyncio] [--port PORT] [--output PATH]
+    python benchmarks/replay_trace.py TRACE --compare OTHER_TRACE
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+import controller  # pylint: disable=wrong-import-position
+from controller import Controller, Metrics, TraceRecorder  # pylint: disable=wrong-import-position
+from bench_util import (  # pylint: disable=wrong-import-position
+    connect_client, percentile, start_controller, start_fake_chrome, start_receiver)
+
+STAGES = (*Metrics.STAGES, "js")
+
+
+def load_trace(path):
+    """Read the entries of a trace file, skipping lines that are cut off or malformed."""
+    entries = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and "name" in entry and "t" in entry:
+                entries.append(entry)
+    return entries
+
+def replay(entries, args):
+    """Send the traced commands to a running controller at the traced pace; returns the replies."""
+    s, reader = connect_client()
+    with s:
+        receiver, replies = start_receiver(reader, len(entries))
+        first = entries[0]["t"]
+        start = time.perf_counter()
+        for index, entry in enumerate(entries):
+            if args.speed > 0:
+                delay = (entry["t"] - first) / args.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            frame = {"v": 1, "id": index, "name": entry["name"], "args": entry.get("args", {})}
+            if entry.get("tab") == "all":
+                frame["tab"] = "all"
+            s.sendall(f"{json.dumps(frame)}\n".encode())
+        receiver.join()
+    return {index: reply for index, (_, reply) in replies.items()}
+
+def stage_summary(entries):
+    """Gets the sorted samples of every stage (and the JS sizes) of a trace."""
+    return {stage: sorted(entry[stage] for entry in entries if stage in entry)
+            for stage in STAGES}
+
+def print_report(original, other, labels):
+    """Print the p50/p95 of every stage of two traces and how much they differ."""
+    for entries, label in zip((original, other), labels):
+        failed = sum(not entry["ok"] for entry in entries)
+        span = entries[-1]["t"] - entries[0]["t"] if entries else 0.0
+        print(f"{label:<9}{len(entries)} commands over {span:.3f} s, {failed} failed")
+    print(f"{'stage':<8}{'':>4}{labels[0]:>12}{labels[1]:>12}{'diff':>12}")
+    first, second = stage_summary(original), stage_summary(other)
+    for stage in STAGES:
+        if not first[stage] or not second[stage]:
+            continue
+        unit = "B" if stage == "js" else "ms"
+        for name, fraction in (("p50", 0.5), ("p95", 0.95)):
+            a = percentile(first[stage], fraction)
+            b = percentile(second[stage], fraction)
+            change = f"{(b - a) / a * 100:+.0f}%" if a else ""
+            print(f"{stage if name == 'p50' else '':<8}{name:>4}{a:>10.3f}{unit:<2}"
+                  f"{b:>10.3f}{unit:<2}{b - a:>+10.3f}{unit:<2} {change}")
+
+def main(argv):
+    """Replay a trace, or compare two, and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("trace", help="trace file written with controller.py --trace")
+    parser.add_argument("--compare", metavar="TRACE",
+                        help="compare with another trace instead of replaying")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay N times faster than recorded, 0 for no pauses (default: 1)")
+    parser.add_argument("--devtools", metavar="URL",
+                        help="replay against a real browser's DevTools /json URL")
+    parser.add_argument("--latency", type=float, default=0.0, metavar="MS",
+                        help="delay every reply of the fake tab by MS milliseconds")
+    parser.add_argument("--asyncio", action="store_true", help="use the asyncio event core")
+    parser.add_argument("--port", type=int, default=Controller.port)
+    parser.add_argument("--output", metavar="PATH",
+                        help="keep the trace of the replay in PATH (default: discarded)")
+    args = parser.parse_args(argv)
+
+    original = load_trace(args.trace)
+    if not original:
+        print(f"No commands in {args.trace}")
+        return 1
+    if args.compare:
+        print_report(original, load_trace(args.compare), ("first", "second"))
+        return 0
+
+    controller.print_msg = lambda *args, **kwargs: None
+    controller.clear_screen = lambda: None
+    chrome = None
+    if args.devtools:
+        Controller.devtools_urls = [args.devtools]
+    else:
+        chrome, _tab = start_fake_chrome(args.latency / 1000)
+    output = args.output or os.path.join(tempfile.mkdtemp(), "replay.trace")
+    if os.path.exists(output):
+        os.remove(output)
+    Controller.trace_file = output
+    Controller.port = args.port
+    start_controller(args.asyncio)
+
+    replies = replay(original, args)
+    TraceRecorder.flush()
+    replayed = load_trace(output)
+    print(f"replayed {args.trace} at {'full' if args.speed <= 0 else f'{args.speed:g}x'} "
+          f"speed against {args.devtools or 'the fake tab'}"
+          f"{f' (tab latency {args.latency} ms)' if chrome else ''}, "
+          f"{len(original) - len(replies)} unanswered")
+    print_report(original, replayed, ("recorded", "replayed"))
+
+    controller.on_quit(None)
+    if chrome:
+        chrome.stop()
+    return 1 if len(replies) < len(original) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,66 @@
+(() => {
+    const video = document.querySelector('video');
+    if (!video) return null;
+
+    // Chapter index of the current video: sorted start times and titles, built once per video
+    const id = new URLSearchParams(location.search).get('v');
+    let index = window.__ytcChapters;
+    if (index?.video !== id || !index.starts.length) {
+        let chapters = [];
+        const data = window.ytInitialData;
+        if (data?.currentVideoEndpoint?.watchEndpoint?.videoId === id) {
+            const markers = data.playerOverlays?.playerOverlayRenderer?.decoratedPlayerBarRenderer
+                ?.decoratedPlayerBarRenderer?.playerBar?.multiMarkersPlayerBarRenderer?.markersMap || [];
+            chapters = (markers.find(marker => marker.key === 'DESCRIPTION_CHAPTERS')
+                        || markers[0])?.value?.chapters?.map(({ chapterRenderer: chapter }) => ({
+                start: chapter.timeRangeStartMillis / 1000,
+                title: chapter.title?.simpleText || '',
+            })) || [];
+        }
+        if (!chapters.length) {
+            // Chapters listed in the description
+            const items = document.querySelectorAll('ytd-macro-markers-list-item-renderer');
+            const parseTime = (text) => text.split(':').reduce((acc, part) => acc * 60 + parseFloat(part), 0);
+            chapters = Array.from(items, item => ({
+                start: parseTime(item.querySelector('#time')?.textContent.trim() || ''),
+                title: item.querySelector('h4')?.textContent.trim() || '',
+            })).filter(chapter => Number.isFinite(chapter.start));
+        }
+        chapters.sort((a, b) => a.start - b.start);
+        index = { video: id, starts: chapters.map(c => c.start), titles: chapters.map(c => c.title) };
+        window.__ytcChapters = index;
+    }
+
+    // Number of the chapter at a position: the last chapter starting at or before it
+    const chapterAt = (position) => {
+        let low = 0;
+        let high = index.starts.length - 1;
+        while (low <= high) {
+            const middle = (low + high) >> 1;
+            if (index.starts[middle] <= position) low = middle + 1;
+            else high = middle - 1;
+        }
+        return high;
+    };
+
+    const step = Number($step);
+    const number = Number($index);
+    const position = Number($position);
+    if (position >= 0) {
+        video.currentTime = position;
+    } else if (!index.starts.length) {
+        return null;
+    } else if (number > 0) {
+        video.currentTime = index.starts[Math.min(number, index.starts.length) - 1];
+    } else {
+        // A second of tolerance, so a press right after a jump moves on to the next chapter
+        const current = chapterAt(video.currentTime + 1);
+        const target = current + step;
+        if (target >= index.starts.length) {
+            video.currentTime = video.duration;
+        } else {
+            video.currentTime = index.starts[Math.max(target, 0)];
+        }
+    }
+    return chapterAt(video.currentTime) + 1;
+})()
@@ -0,0 +1,41 @@
+(() => {
+    const player = document.getElementById('movie_player');
+    if (!player?.getAvailableQualityLevels) return null;
+
+    // Quality ladder of the current video, highest first, cached until the video changes
+    const video = new URLSearchParams(location.search).get('v');
+    let ladder = window.__ytcQualityLadder;
+    if (ladder?.video !== video || !ladder.levels.length) {
+        ladder = { video, levels: player.getAvailableQualityLevels().filter(level => level !== 'auto') };
+        window.__ytcQualityLadder = ladder;
+    }
+    const levels = ladder.levels;
+    if (!levels.length) return null;
+
+    const heights = { highres: 4320, hd2880: 2880, hd2160: 2160, hd1440: 1440, hd1080: 1080,
+                      hd720: 720, large: 480, medium: 360, small: 240, tiny: 144 };
+    const target = String($target);
+    const steps = Number($steps);
+    let level;
+    if (target === 'auto' || target === 'max') {
+        level = target === 'auto' ? 'auto' : levels[0];
+    } else if (target === 'min') {
+        level = levels[levels.length - 1];
+    } else if (target === 'up' || target === 'down') {
+        const current = Math.max(0, levels.indexOf(player.getPlaybackQuality()));
+        const index = current + (target === 'up' ? -steps : steps);
+        level = levels[Math.min(levels.length - 1, Math.max(0, index))];
+    } else {
+        // A height such as "1080p" or a level name: the best level that is not higher
+        const wanted = heights[target] ?? parseInt(target, 10);
+        level = levels.find(name => heights[name] <= wanted) ?? levels[levels.length - 1];
+    }
+
+    if (level === 'auto') {
+        player.setPlaybackQualityRange?.('auto');
+    } else {
+        player.setPlaybackQualityRange?.(level, level);
+    }
+    player.setPlaybackQuality?.(level);
+    return level;
+})()
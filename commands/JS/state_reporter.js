@@ -0,0 +1,58 @@
+(() => {
+    window.__ytcStopReporting?.();
+    const interval = $interval_ms;
+    const events = ['timeupdate', 'seeked', 'play', 'pause', 'ratechange', 'volumechange',
+                    'durationchange', 'loadedmetadata'];
+    let last = {};
+    let lastSent = 0;
+
+    const read = () => {
+        const video = document.querySelector('video');
+        if (!video) return null;
+        const player = document.getElementById('movie_player');
+        const chapter = document.querySelector('.ytp-chapter-title-content');
+        const id = new URLSearchParams(location.search).get('v');
+        const chapters = window.__ytcChapters?.video === id ? window.__ytcChapters : null;
+        return {
+            video: id,
+            title: document.title.replace(/ - YouTube$$/, ''),
+            time: Math.round(video.currentTime * 10) / 10,
+            duration: Number.isFinite(video.duration) ? Math.round(video.duration * 10) / 10 : null,
+            paused: video.paused,
+            rate: video.playbackRate,
+            volume: Math.round(video.volume * 100),
+            muted: video.muted,
+            quality: player?.getPlaybackQuality?.() || null,
+            chapter: chapter?.textContent || null,
+            chapters: chapters ? chapters.starts.length : null,
+        };
+    };
+
+    // Report at once when anything but the position changed, otherwise at most every interval
+    const report = (force) => {
+        const state = read();
+        if (!state) return;
+        const changed = Object.keys(state).some(key => key !== 'time' && state[key] !== last[key]);
+        const now = Date.now();
+        if (!force && !changed && (state.time === last.time || now - lastSent < interval)) return;
+        const payload = { ...state };
+        if (state.chapters !== last.chapters && state.chapters) {
+            // Send the chapter index once per video; the controller keeps it
+            const { starts, titles } = window.__ytcChapters;
+            payload.chapter_index = { starts, titles };
+        }
+        last = state;
+        lastSent = now;
+        window.__ytcState?.(JSON.stringify(payload));
+    };
+
+    const onEvent = (event) => report(event.type !== 'timeupdate');
+    events.forEach(type => document.addEventListener(type, onEvent, true));
+    // Quality and chapter changes fire no media event while paused
+    const timer = setInterval(() => report(false), interval);
+    window.__ytcStopReporting = () => {
+        events.forEach(type => document.removeEventListener(type, onEvent, true));
+        clearInterval(timer);
+    };
+    report(true);
+})();
@@ -1,127 +1,99 @@
 (() => {
         try {
-        // Check if the navigator is initialized
-        if (typeof window.NavigatorOn === 'undefined') {
-            window.NavigatorOn = true;
-        } else if (window.NavigatorOn === true) {
-            window.NavigatorOn = false;
-            document.getElementById('video-nav-overlay')?.remove();
-            document.getElementById('video-nav-style')?.remove();
-            delete window.videoNavController;
-            return;
-        } else {
-            window.NavigatorOn = true;
+        // Show or hide the navigator of this video; it is only rebuilt for another video
+        const watchedVideo = new URLSearchParams(location.search).get('v');
+        if (window.videoNavController?.video === watchedVideo) {
+            return window.videoNavController.toggle();
         }
+        window.videoNavController?.destroy();
+        window.NavigatorOn = true;
+
+        const COLUMNS = 2;
+        const GAP = 12;
+        const PADDING = 24;
+        const TEXT_HEIGHT = 86;   // Title (two lines) and metadata line below the thumbnail
+        const OVERSCAN_ROWS = 2;  // Rows kept in the DOM above and below the visible ones
+        const PREFETCH_ROWS = 4;  // Load more videos once the view is this close to the end
+        const VIDEO_SELECTOR = `
+            ytd-compact-video-renderer,
+            ytd-video-renderer,
+            ytd-rich-item-renderer,
+            yt-lockup-view-model,
+            yt-lockup-view-model-wiz
+            `.trim();
 
-        let VIDEOS = [];
-        let ADDED_VIDEO_IDS = new Set();
+        // Recommended videos in page order, as { id, href, node, title, meta }
+        const VIDEOS = [];
+        const ADDED_VIDEO_IDS = new Set();
 
 
         // Locate the video container
-        function getVideoList() {
-            const videoContainer = document
+        function getVideoContainer() {
+            return document
                 .querySelector('div#items.style-scope.ytd-watch-next-secondary-results-renderer')
                 ?.querySelector('ytd-item-section-renderer')
                 ?.querySelector('#contents');
+        }
 
-            if (!videoContainer) {
-                console.warn('[video-nav] videoContainer not found!');
-                VIDEOS = [];
-                return;
+        // Add the videos in (or below) the given nodes that are not in the list yet
+        function addVideos(nodes) {
+            let added = 0;
+            for (const node of nodes) {
+                if (node.nodeType !== Node.ELEMENT_NODE) continue;
+                const candidates = node.matches(VIDEO_SELECTOR)
+                    ? [node, ...node.querySelectorAll(VIDEO_SELECTOR)]
+                    : node.querySelectorAll(VIDEO_SELECTOR);
+                for (const video of candidates) {
+                    const link = video.querySelector('a[href*="/watch?v="]');
+                    const videoId = link?.href.match(/[?&]v=([\w-]+)/)?.[1];
+                    if (!videoId || ADDED_VIDEO_IDS.has(videoId)) continue;
+                    ADDED_VIDEO_IDS.add(videoId);
+                    VIDEOS.push({ id: videoId, href: link.href, node: video, title: '', meta: '' });
+                    added++;
+                }
             }
-
-            // Collect video elements
-            const selector = `
-            ytd-compact-video-renderer,
-            ytd-video-renderer,
-            ytd-rich-item-renderer,
-            yt-lockup-view-model,
-            yt-lockup-view-model-wiz
-            `.trim();
-
-            const foundVideos = Array.from(videoContainer.querySelectorAll(selector));
-            VIDEOS = foundVideos;
-        }
-        getVideoList();
-
-        function waitForVideoListChange(container) {
-            return new Promise((resolve) => {
-                const originalHeight = container.offsetHeight;
-            
-                const observer = new ResizeObserver(() => {
-                    if (container.offsetHeight !== originalHeight) {
-                        observer.disconnect();
-                        resolve();
-                    }
-                });
-            
-                observer.observe(container);
-            });
+            return added;
         }
 
-        // Extend the video list by scrolling to the last video and loading more
-        function delay(ms) {
-            return new Promise(resolve => setTimeout(resolve, ms));
+        // Title and channel of a video, read from its page node the first time it is shown
+        // (YouTube fills the text in after adding the node)
+        function describe(video) {
+            if (!video.title) {
+                const text = (selector) => video.node.querySelector(selector)?.textContent
+                    .replace(/\s+/g, ' ').trim() || '';
+                video.title = text('#video-title, [class*="lockup-metadata-view-model"][class*="__title"], h3');
+                video.meta = text('#channel-name, ytd-channel-name, [class*="content-metadata-view-model"]');
+            }
+            return video;
         }
 
-        async function extendOriginalVideoList() {
-            try {
-                let scrollY = window.scrollY;
-                const container = document
-                    .querySelector('div#items.style-scope.ytd-watch-next-secondary-results-renderer')
-                    ?.querySelector('ytd-item-section-renderer')
-                    ?.querySelector('#contents');
-            
-                if (!container) {
-                    console.warn('[video-nav] videoContainer not found for observing!');
-                    return [];
-                }
-            
-                VIDEOS[VIDEOS.length - 1].scrollIntoView();
-            
-                await delay(50);
-                window.scrollTo(0, scrollY);
-            
-                await waitForVideoListChange(container);
-            
-                getVideoList(); // Updates VIDEOS
-                return Array.from(VIDEOS);
-            } catch (e) {
-                console.error('[video-nav] Error extending video list:', e);
-                return [];
-            }
+        const container = getVideoContainer();
+        if (container) {
+            addVideos([container]);
+        } else {
+            console.warn('[video-nav] videoContainer not found!');
         }
 
 
-        // Create overlay and grid (same as before)...
+        // Create overlay and grid
         const overlay = Object.assign(document.createElement('div'), {
             id: 'video-nav-overlay',
             style: `
             position:fixed; inset:0; z-index:1000000;
             background:rgba(0,0,0,.90); overflow-y:auto;
-            display:flex; flex-direction:column;
             font-family:Roboto,Arial,sans-serif;`
         });
 
+        // Only the tiles near the visible rows exist; the grid is sized for all of them
         const grid = Object.assign(document.createElement('div'), {
             id: 'video-nav-grid',
-            style: `
-            display:grid;
-            grid-template-columns:repeat(2, 1fr);
-            gap:12px;
-            padding:24px;
-            max-width: calc(100vw - 30px);
-            margin:0 auto;
-            width:max-content;
-            box-sizing:border-box;
-            position:relative;
-            padding-bottom: 93px; /* Space for the load more button */`
+            style: 'position:relative; margin:0 auto;'
         });
 
-        const loadMoreBtn = Object.assign(document.createElement('button'), {
-            textContent: 'Load more videos',
-            className: 'video-nav-loadmore video-nav-item',
+        const status = Object.assign(document.createElement('div'), {
+            className: 'video-nav-status',
         });
+        grid.appendChild(status);
         overlay.appendChild(grid);
         document.body.appendChild(overlay);
 
@@ -130,14 +102,16 @@
             style.id = 'video-nav-style';
             style.textContent = `
             .video-nav-item {
+                position: absolute;
+                top: 0;
+                left: 0;
+                box-sizing: border-box;
                 padding: 10px;
                 border-radius: 10px;
+                color: white;
                 transition:
                     scale 0.2s ease-in-out,
-                    background-color 0.2s ease-in-out,
-                    transform 0.2s ease-in-out;
-                margin: 0 !important;
-                zoom: 1.75;
+                    background-color 0.2s ease-in-out;
             }
 
             .video-nav-item__selected {
@@ -145,131 +119,246 @@
                 scale: 1.05;
             }
 
-            .video-nav-loadmore {
-                position: absolute;
-                bottom: 24px;
-                left: 50%;
-                transform: translateX(-50%) scale(1);
-                transform-origin: center;
-                border: 0;
-                background-color: rgba(255, 255, 255, 0.2);
-                color: white;
-                zoom: 1;
-                font-size: 32px;
-                line-height: 1;
-                width: 25%;
+            .video-nav-item img {
+                display: block;
+                width: 100%;
+                aspect-ratio: 16 / 9;
+                object-fit: cover;
+                border-radius: 8px;
+                background-color: rgba(255, 255, 255, 0.1);
             }
 
-            .video-nav-loadmore.video-nav-item__selected {
-                background-color: rgba(255, 255, 255, 0.5) !important;
-                transform: translateX(-50%) scale(1.1);
-                scale: 1;
+            .video-nav-title {
+                margin-top: 8px;
+                font-size: 22px;
+                font-weight: 500;
+                line-height: 28px;
+                height: 56px;
+                overflow: hidden;
+                display: -webkit-box;
+                -webkit-line-clamp: 2;
+                -webkit-box-orient: vertical;
+            }
+
+            .video-nav-meta {
+                font-size: 16px;
+                line-height: 22px;
+                color: #aaa;
+                white-space: nowrap;
+                overflow: hidden;
+                text-overflow: ellipsis;
+            }
+
+            .video-nav-status {
+                position: absolute;
+                left: 0;
+                right: 0;
+                text-align: center;
+                color: #aaa;
+                font-size: 24px;
             }
             `;
             document.head.appendChild(style);
         }
 
-        // Add videos to grid
-        function addVideosToGrid(newVideos) {
-            const grid = document.getElementById('video-nav-grid');
-            document.querySelector('.video-nav-loadmore')?.remove();
 
-            const videoItems = newVideos.filter(v => {
-                const link = v.querySelector('a[href*="/watch?v="]');
-                const match = link?.href.match(/[?&]v=([\w-]+)/);
-                const videoId = match?.[1];
+        // Virtual grid layout, recomputed when the window is resized
+        let tileWidth = 0;
+        let tileHeight = 0;
+        let rowHeight = 0;
 
-                if (videoId && !ADDED_VIDEO_IDS.has(videoId)) {
-                    ADDED_VIDEO_IDS.add(videoId);
-                    return true;
+        function layout() {
+            const available = overlay.clientWidth - 2 * PADDING - (COLUMNS - 1) * GAP;
+            tileWidth = Math.max(160, Math.floor(Math.min(560, available / COLUMNS)));
+            tileHeight = 20 + Math.round((tileWidth - 20) * 9 / 16) + TEXT_HEIGHT;
+            rowHeight = tileHeight + GAP;
+            grid.style.width = (COLUMNS * tileWidth + (COLUMNS - 1) * GAP + 2 * PADDING) + 'px';
+            rendered.forEach((tile, index) => place(tile, index));
+        }
+
+        function rowCount() {
+            return Math.ceil(VIDEOS.length / COLUMNS);
+        }
+
+        function place(tile, index) {
+            const row = Math.floor(index / COLUMNS);
+            const column = index % COLUMNS;
+            tile.style.width = tileWidth + 'px';
+            tile.style.height = tileHeight + 'px';
+            tile.style.transform = 'translate(' + (PADDING + column * (tileWidth + GAP)) + 'px, '
+                + (PADDING + row * rowHeight) + 'px)';
+        }
+
+        // Tiles in the DOM by video index, and detached tiles kept for reuse
+        const rendered = new Map();
+        const spare = [];
+        let selectedIndex = 0;
+        let visible = true;
+        let scrollTop = 0;  // Scroll position of the overlay while it is hidden
+
+        function createTile() {
+            const tile = document.createElement('div');
+            tile.className = 'video-nav-item';
+            tile.append(
+                Object.assign(document.createElement('img'), { loading: 'eager', decoding: 'async' }),
+                Object.assign(document.createElement('div'), { className: 'video-nav-title' }),
+                Object.assign(document.createElement('div'), { className: 'video-nav-meta' }));
+            return tile;
+        }
+
+        function fill(tile, index) {
+            const video = describe(VIDEOS[index]);
+            const [img, title, meta] = tile.children;
+            img.src = 'https://i.ytimg.com/vi/' + video.id + '/hqdefault.jpg';
+            title.textContent = video.title;
+            meta.textContent = video.meta;
+            tile.classList.toggle('video-nav-item__selected', index === selectedIndex);
+            place(tile, index);
+        }
+
+        // Bring the tiles of the rows around the viewport into the DOM, recycling the others
+        function render() {
+            if (!visible) return;
+            grid.style.height = (2 * PADDING + rowCount() * rowHeight + 40) + 'px';
+            status.style.top = (PADDING + rowCount() * rowHeight) + 'px';
+            status.textContent = loading ? 'Loading more videos...' : '';
+
+            const firstRow = Math.max(0, Math.floor((overlay.scrollTop - PADDING) / rowHeight) - OVERSCAN_ROWS);
+            const lastRow = Math.floor((overlay.scrollTop + overlay.clientHeight - PADDING) / rowHeight) + OVERSCAN_ROWS;
+            const first = firstRow * COLUMNS;
+            const last = Math.min(VIDEOS.length, (lastRow + 1) * COLUMNS) - 1;
+
+            rendered.forEach((tile, index) => {
+                if (index < first || index > last) {
+                    rendered.delete(index);
+                    tile.remove();
+                    spare.push(tile);
                 }
-                return false;
             });
+            for (let index = first; index <= last; index++) {
+                if (rendered.has(index)) continue;
+                const tile = spare.pop() || createTile();
+                fill(tile, index);
+                rendered.set(index, tile);
+                grid.appendChild(tile);
+            }
 
-            videoItems.forEach(original => {
-                const v = original.cloneNode(true);
-                const link = v.querySelector('a[href*="/watch?v="]');
-                const img = v.querySelector('img');
-
-                v.classList.add('video-nav-item');
-                original.querySelectorAll('.yt-lockup-metadata-view-model-wiz__menu-button, yt-touch-feedback-shape').forEach(el => el.remove());
-
-                if (link && img) {
-                    const match = link.href.match(/[?&]v=([\w-]+)/);
-                    if (match) {
-                        const videoId = match[1];
-                        const thumbnailUrl = 'https://i.ytimg.com/vi/' + videoId + '/hqdefault.jpg';
-                        img.src = thumbnailUrl;
-                        img.loading = 'eager';
-                        img.classList.add('yt-core-image--loaded');
-                    }
-                }
+            if (lastRow >= rowCount() - PREFETCH_ROWS) prefetch();
+        }
+
+        let frame = 0;
+        function scheduleRender() {
+            if (!frame) frame = requestAnimationFrame(() => { frame = 0; render(); });
+        }
 
 
-                grid.appendChild(v);
-            });
-            grid.appendChild(loadMoreBtn);
+        // Load the next page of recommendations in the background by scrolling the real
+        // page to its last video; the observer picks up the videos YouTube appends
+        let loading = false;
+        let exhausted = false;  // The last load added nothing; wait for the page to add videos
+        let loadTimer = 0;
+
+        function prefetch() {
+            const last = VIDEOS[VIDEOS.length - 1]?.node;
+            if (loading || exhausted || !last?.isConnected) return;
+            loading = true;
+            const scrollY = window.scrollY;
+            last.scrollIntoView();
+            requestAnimationFrame(() => window.scrollTo(0, scrollY));
+            clearTimeout(loadTimer);
+            loadTimer = setTimeout(() => { loading = false; exhausted = true; scheduleRender(); }, 3000);
         }
 
-        // Initially add videos
-        addVideosToGrid(VIDEOS);
+        const observer = new MutationObserver((mutations) => {
+            let added = 0;
+            for (const mutation of mutations) added += addVideos(mutation.addedNodes);
+            if (added) {
+                loading = exhausted = false;
+                clearTimeout(loadTimer);
+                scheduleRender();
+            }
+        });
+        if (container) observer.observe(container, { childList: true, subtree: true });
+
+        overlay.addEventListener('scroll', scheduleRender, { passive: true });
+        const onResize = () => { if (visible) { layout(); scheduleRender(); } };
+        window.addEventListener('resize', onResize);
+
+        layout();
+        render();
+
 
         // Navigation controller code...
         window.videoNavController = (() => {
-            let selectedIndex = 0;
-            let items = Array.from(document.querySelectorAll('.video-nav-item'));
-            items[0]?.classList.add('video-nav-item__selected');
+            // What the controller logs: whether it is shown and the selected video
+            function state() {
+                const selected = VIDEOS[selectedIndex];
+                return {
+                    visible,
+                    count: VIDEOS.length,
+                    selected: selected ? { id: selected.id, title: describe(selected).title } : null,
+                };
+            }
 
             function updateSelection(newIndex) {
-                if (newIndex < 0) return;
-                if (newIndex > items.length - 1) newIndex = items.length - 1;
+                if (!visible || newIndex < 0 || !VIDEOS.length) return;
+                if (newIndex > VIDEOS.length - 1) newIndex = VIDEOS.length - 1;
 
-                items[selectedIndex]?.classList.remove('video-nav-item__selected');
+                rendered.get(selectedIndex)?.classList.remove('video-nav-item__selected');
                 selectedIndex = newIndex;
-                items[selectedIndex]?.classList.add('video-nav-item__selected');
+                rendered.get(selectedIndex)?.classList.add('video-nav-item__selected');
 
                 // Scroll to the selected video, at the center of the screen
-                const overlay = document.getElementById('video-nav-overlay');
-                const overlayRect = overlay.getBoundingClientRect();
-                const selectedRect = items[selectedIndex].getBoundingClientRect();
-                const offset = selectedRect.top - overlayRect.top - (overlay.clientHeight / 2) + (items[selectedIndex].clientHeight / 2);
-                overlay.scrollBy({ top: offset, behavior: 'smooth' });
+                const top = PADDING + Math.floor(selectedIndex / COLUMNS) * rowHeight;
+                overlay.scrollTo({ top: top - (overlay.clientHeight - tileHeight) / 2, behavior: 'smooth' });
+                if (Math.floor(selectedIndex / COLUMNS) >= rowCount() - PREFETCH_ROWS) prefetch();
             }
 
             return {
-                up() { updateSelection(selectedIndex - 2); },
-                down() { updateSelection(selectedIndex + 2); },
-                left() {  if (selectedIndex % 2 === 1) updateSelection(selectedIndex - 1); },
-                right() {  if (selectedIndex % 2 === 0) updateSelection(selectedIndex + 1); },
+                video: watchedVideo,
+                state,
+                up() { updateSelection(selectedIndex - COLUMNS); return state(); },
+                down() { updateSelection(selectedIndex + COLUMNS); return state(); },
+                left() { if (selectedIndex % COLUMNS > 0) updateSelection(selectedIndex - 1); return state(); },
+                right() { if (selectedIndex % COLUMNS < COLUMNS - 1) updateSelection(selectedIndex + 1); return state(); },
                 select() {
-                    items = Array.from(document.querySelectorAll('.video-nav-item'));
-                    const selected = items[selectedIndex];
-
-                    if (selected.classList.contains('video-nav-loadmore')) {
-                        extendOriginalVideoList().then((newVideos) => {
-                            addVideosToGrid(newVideos);
-                            items = Array.from(document.querySelectorAll('.video-nav-item'));
-                        
-                            // If the previously selected index is beyond new videos length (excluding the button),
-                            // clamp it to last video index (excluding the button)
-                            const lastVideoIndex = items.length - 2; // -1 for button, -1 for zero-based index
-                        
-                            selectedIndex = Math.min(selectedIndex, lastVideoIndex);
-                            updateSelection(selectedIndex);
-                        });
-                        return;
+                    const selected = VIDEOS[selectedIndex];
+                    if (!visible) return state();
+                    if (selected) {
+                        this.toggle();
+                        window.location.href = selected.href;
+                    } else {
+                        console.warn('[video-nav] No video selected');
+                    }
+                    return state();
+                },
+                // Hide the overlay keeping its tiles, scroll position and selection, or show it again
+                toggle() {
+                    if (visible) scrollTop = overlay.scrollTop;
+                    visible = !visible;
+                    window.NavigatorOn = visible;
+                    overlay.style.display = visible ? '' : 'none';
+                    if (visible) {
+                        layout();
+                        overlay.scrollTop = scrollTop;
+                        render();
                     }
-                    
-                    let link;
-                    try { link = selected.querySelector('a[href*="/watch?v="]'); }
-                    catch (e) { console.warn('[video-nav] Error: ' + e); }
-                    
-                    if (link) { window.location.href = link.href; }
-                    else { console.warn('[video-nav] No link found in selected item'); }
+                    return state();
+                },
+                destroy() {
+                    observer.disconnect();
+                    clearTimeout(loadTimer);
+                    cancelAnimationFrame(frame);
+                    window.removeEventListener('resize', onResize);
+                    overlay.remove();
+                    document.getElementById('video-nav-style')?.remove();
+                    window.NavigatorOn = false;
+                    delete window.videoNavController;
                 }
             };
         })();
+        return window.videoNavController.state();
     } catch (e) {
         console.log('error: ' + e)
     }
-})();
\ No newline at end of file
+})();
@@ -3,25 +3,34 @@ Youtube Controller module
 
 Handles connection to YouTube's WebSocket for sending commands,
 manages the command queue, and interfaces with the GUI.
+
+The command pipeline only needs the standard library and websocket-client, so it runs
+headless on any OS. The GUI front-ends (tray icon and log viewer) import pystray,
+Pillow and tkinter when they are first used.
 """
 
+import argparse
+import asyncio
+import collections
 import datetime
+import hashlib
 import json
-import msvcrt
+import itertools
+import math
 import os
 import queue
+import random
 import re
+import selectors
 import socket
 import sys
 import threading
 import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
 
-import tkinter as tk
 from string import Template
-from tkinter.scrolledtext import ScrolledText
-from PIL import Image
-import requests
-from pystray import Icon, MenuItem as item, Menu
 import websocket
 from websocket import WebSocketException, WebSocketTimeoutException
 
@@ -30,6 +39,10 @@ from websocket import WebSocketException, WebSocketTimeoutException
 socket.setdefaulttimeout(5)
 
 
+# Version of the JSON frames spoken on the command socket
+PROTOCOL_VERSION = 1
+
+
 # ANSI color codes for terminal output
 RED = '\033[31m'
 GREEN = '\033[32m'
@@ -41,37 +54,1437 @@ RESET = '\033[0m'
 
 ### Classes
 
+class LogBuffer:
+    """A fixed-capacity ring buffer of log lines, safe to use from any thread.
+
+    Every change gets the next sequence number, so a reader that remembers the last
+    number it has seen can fetch only what changed since (see since()). Entries are
+    (seq, line, first_seq) tuples; first_seq is the number the line was appended with
+    and stays the same when the last line is rewritten (the "(x3)" repeat counter).
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.entries = collections.deque(maxlen=capacity)
+        self.seq = 0
+        self.cleared = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index][1]
+
+    def append(self, line: str):
+        """Add a line, dropping the oldest one when the buffer is full"""
+        with self.lock:
+            self.seq += 1
+            self.entries.append((self.seq, line, self.seq))
+
+    def replace_last(self, line: str):
+        """Rewrite the last line"""
+        with self.lock:
+            if not self.entries:
+                self.seq += 1
+                self.entries.append((self.seq, line, self.seq))
+                return
+            self.seq += 1
+            self.entries[-1] = (self.seq, line, self.entries[-1][2])
+
+    def clear(self):
+        """Remove every line"""
+        with self.lock:
+            self.entries.clear()
+            self.seq += 1
+            self.cleared = self.seq
+
+    def lines(self) -> list[str]:
+        """Gets a copy of the lines"""
+        with self.lock:
+            return [line for _, line, _ in self.entries]
+
+    def since(self, seq: int):
+        """Gets what changed after sequence number seq.
+
+        Returns (reset, entries, last_seq): reset is True when the reader must start over
+        from the returned entries, because the buffer was cleared or lines it has not seen
+        were already dropped; otherwise entries are only the new or rewritten lines.
+        """
+        with self.lock:
+            if seq >= self.seq:
+                return False, [], self.seq
+            reset = self.cleared > seq or not self.entries or self.entries[0][2] > seq + 1
+            if reset:
+                return True, list(self.entries), self.seq
+            changed = []
+            for entry in reversed(self.entries):
+                if entry[0] <= seq:
+                    break
+                changed.append(entry)
+            changed.reverse()
+            return False, changed, self.seq
+
+class CommandQueue:
+    """Controller.command_queue: a bounded queue with a policy for every kind of command
+    (see policy and the Queue Limits section of the README). Commands that are dropped or
+    outlive their time to live finish with an error.
+    """
+    PRIORITY = ("exit", "pause", "heartbeat")
+    SEEKS = ("skip_forward", "skip_backward", "skip", "seek", "next_chapter", "prev_chapter",
+             "chapter")
+    SETTERS = ("rate", "volume", "quality", "seek")
+
+    def __init__(self):
+        self.urgent = collections.deque()
+        self.waiting = collections.deque()
+        self.condition = threading.Condition()
+
+    @classmethod
+    def policy(cls, command) -> str:
+        """Gets the queue policy of a command: priority, toggle, latest, drop-oldest or reject"""
+        if command.name in cls.PRIORITY:
+            return "priority"
+        if command.name in CommandCoalescer.TOGGLES:
+            return "toggle"
+        if command.name in cls.SETTERS:
+            return "latest"
+        if command.name in cls.SEEKS:
+            return "drop-oldest"
+        return "reject"
+
+    @classmethod
+    def overdue(cls, command) -> bool:
+        """Whether a command waited longer than its time to live"""
+        if command.name in ("exit", "heartbeat"):
+            return False
+        ttl = Controller.seek_ttl if command.name in cls.SEEKS else Controller.command_ttl
+        return time.perf_counter() - command.received > ttl
+
+    @classmethod
+    def expire(cls, command) -> bool:
+        """Finish a command that waited longer than its time to live, returning True if it did"""
+        if not cls.overdue(command):
+            return False
+        Metrics.count("expired")
+        command.finish(False, "expired in the queue")
+        return True
+
+    def put(self, command) -> bool:
+        """Queue a command from any thread, returning False if it was rejected"""
+        with self.condition:
+            paired = self._pair(command)
+            if paired is not None:
+                admitted, dropped = True, []
+                Controller.merged_commands += 2
+            else:
+                admitted, dropped = self._admit(command)
+                if admitted:
+                    self._wake()
+        if paired is not None:
+            paired.finish(True)
+            command.finish(True)
+            return True
+        for other, replacement in dropped:
+            if replacement is None:
+                Metrics.count("evicted")
+                other.finish(False, "dropped from the full queue")
+            else:
+                Metrics.count("superseded")
+                other.follow(replacement, superseded=True)
+        if not admitted:
+            Metrics.count("rejected")
+            command.finish(False, "queue full")
+        return admitted
+
+    def _pair(self, command):
+        """Take the waiting press of the same toggle that a new press cancels out, if any"""
+        if self.policy(command) != "toggle":
+            return None
+        other = next((other for other in self.waiting
+                      if other.name == command.name and other.tab == command.tab), None)
+        if other is not None:
+            self.waiting.remove(other)
+        return other
+
+    def _admit(self, command):
+        """Apply the policy of a new command; returns (admitted, [(dropped, replacement)])"""
+        dropped = []
+        policy = self.policy(command)
+        if policy == "priority":
+            if command.name != "heartbeat" or all(other.name != "heartbeat"
+                                                  for other in self.urgent):
+                self.urgent.append(command)
+            return True, dropped
+        if policy == "latest":
+            for other in [other for other in self.waiting
+                          if other.name == command.name and other.tab == command.tab]:
+                self.waiting.remove(other)
+                dropped.append((other, command))
+        if len(self.waiting) >= Controller.queue_capacity:
+            victim = None
+            if policy == "drop-oldest":
+                victim = next((other for other in self.waiting
+                               if self.policy(other) == "drop-oldest"), None)
+            if victim is None:
+                return False, dropped
+            self.waiting.remove(victim)
+            dropped.append((victim, None))
+        self.waiting.append(command)
+        return True, dropped
+
+    def requeue(self, command):
+        """Put a command that could not be sent back at the front of the queue"""
+        with self.condition:
+            if self.policy(command) == "priority":
+                self.urgent.appendleft(command)
+            else:
+                self.waiting.appendleft(command)
+            self._wake()
+
+    def expire_waiting(self):
+        """Expire the commands that outlived their time to live without being taken, which
+        happens while no tab is connected and the sender is looking for one"""
+        with self.condition:
+            expired = [command for command in (*self.urgent, *self.waiting)
+                       if self.overdue(command)]
+            for command in expired:
+                (self.urgent if command in self.urgent else self.waiting).remove(command)
+        for command in expired:
+            self.expire(command)
+
+    def _wake(self):
+        self.condition.notify()
+
+    def _pop(self):
+        if self.urgent:
+            return self.urgent.popleft()
+        if self.waiting:
+            return self.waiting.popleft()
+        return None
+
+    def get(self, timeout: float | None = None):
+        """Take the next command that has not expired, raising queue.Empty after timeout seconds"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.condition:
+                while (command := self._pop()) is None:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise queue.Empty
+                    self.condition.wait(remaining)
+            if not self.expire(command):
+                return command
+
+    def qsize(self) -> int:
+        """Gets the number of commands waiting"""
+        with self.condition:
+            return len(self.urgent) + len(self.waiting)
+
 class Controller:
     """Controller Class"""
     # pylint: disable=too-few-public-methods
 
     version = "1.6"
     running = True
-    command_queue = queue.Queue()
+    host = "localhost"
+    port = 65432
+    devtools_urls = ["http://localhost:9222/json"]
+    use_target_discovery = True
+    tab_watcher = None
+    idle_timeout = 1800
+    ping_interval = 2.0
+    ping_timeout = 5.0
+    reconnect_delay = 0.05
+    reconnect_max_delay = 5.0
+    command_queue = CommandQueue()
+    queue_capacity = 32
+    command_ttl = 10.0
+    seek_ttl = 3.0
     lockfile_handle = None
     lockfile = "controller.lock"
+    headless = False
 
     last_printed = None
     last_count = 0
     last_timer = 0.0
-    screen_buffer = []
+    log_async = True
+    log_file = None
+    log_format = "text"
+    log_max_bytes = 1_000_000
+    log_backups = 3
+    trace_file = None
+    screen_buffer = LogBuffer(capacity=1000)
     log_viewer = None
     log_viewer_thread = None
 
+    pipeline_depth = 8
+    coalesce_window = 0.0
+    merged_commands = 0
+    use_helper = True
+    cdp_timeout = 5
+    state_interval = 1.0
+    client_backlog = 1000
+
     skip_seconds = 5
     skip_options = [5, 10, 30, 60]
     selected_video = None
 
+class ClientWriter:
+    """Sends the replies of one command socket client from a thread of its own.
+
+    write() never blocks, so a client that stops reading cannot hold up the reader
+    thread that finishes commands and publishes the playback state; a client that falls
+    Controller.client_backlog lines behind is disconnected instead.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lines = queue.Queue(maxsize=Controller.client_backlog)
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, text: str):
+        """Queue a line for the client, disconnecting it if its backlog is full"""
+        if self.closed:
+            return
+        try:
+            self.lines.put_nowait(f"{text}\n".encode())
+        except queue.Full:
+            print_msg(f"{YELLOW}WARNING: Disconnecting a client that stopped reading.{RESET}")
+            self.close()
+            try:
+                self.conn.shutdown(socket.SHUT_RDWR)  # Also ends the client's reader
+            except OSError:
+                pass
+
+    def run(self):
+        """Writer thread: send the queued lines until closed"""
+        while (data := self.lines.get()) is not None:
+            try:
+                self.conn.sendall(data)
+            except OSError:
+                break  # Legacy clients close without reading the reply
+        self.closed = True
+
+    def close(self, timeout: float = 0.0):
+        """Stop writing once the queued lines are sent, waiting up to timeout seconds"""
+        self.closed = True
+        try:
+            self.lines.put_nowait(None)
+        except queue.Full:
+            pass  # The writer is stuck sending; shutting the socket down ends it
+        self.thread.join(timeout)
+
+class FrameError(ValueError):
+    """Raised for a JSON frame that cannot be accepted, remembering its request id"""
+
+    def __init__(self, message: str, request_id=None):
+        super().__init__(message)
+        self.request_id = request_id
+
+class QueuedCommand:
+    """A command waiting in the command queue, together with its arguments and outcome"""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, name: str, args: dict | None = None, request_id=None, tab=None):
+        self.name = name
+        self.args = args or {}
+        self.request_id = request_id
+        self.tab = tab
+        self.sent_to = None
+        self.received = time.perf_counter()
+        self.stages = {}
+        self.future = Future()
+        self.retried = False
+        self.replayed = False
+        self.js_size = None
+
+    def mark(self, stage: str):
+        """Record the time the command reached a pipeline stage (see Metrics.STAGES)"""
+        self.stages[stage] = time.perf_counter()
+
+    def follow(self, *others: "QueuedCommand", **extra):
+        """Finish this command with the outcome of the commands that replaced it"""
+        remaining = itertools.count(len(others) - 1, -1)
+
+        def done(_future):
+            if next(remaining) != 0 or self.future.done():
+                return
+            results = [other.future.result() for other in others]
+            rtts = [result["rtt_ms"] for result in results if result["rtt_ms"] is not None]
+            tabs = [result["tab"] for result in results]
+            self.future.set_result({
+                "name": self.name,
+                "ok": all(result["ok"] for result in results),
+                "error": next((result["error"] for result in results if result["error"]), None),
+                "ms": round((time.perf_counter() - self.received) * 1000, 3),
+                "rtt_ms": max(rtts, default=None),
+                "tab": tabs[0] if len(tabs) == 1 else tabs,
+                **extra,
+            })
+
+        for other in others:
+            other.future.add_done_callback(done)
+
+    def finish(self, ok: bool, error: str | None = None, rtt: float | None = None):
+        """Record the outcome of the command, waking up anyone waiting on it"""
+        if not self.future.done():
+            Metrics.record(self, ok)
+            self.future.set_result({
+                "name": self.name,
+                "ok": ok,
+                "error": error,
+                "ms": round((time.perf_counter() - self.received) * 1000, 3),
+                "rtt_ms": None if rtt is None else round(rtt * 1000, 3),
+                "tab": self.sent_to,
+            })
+
+class CdpSession:
+    """A CDP connection that numbers its requests and matches Chrome's replies to them.
+
+    send() returns a Future that resolves to (reply, round-trip seconds) once Chrome
+    answers. Replies are read by read_one(), called from a reader thread or from the
+    event loop when the socket is readable. Several requests may be in flight at once.
+    Events are passed to the callbacks registered with subscribe().
+    """
+
+    def __init__(self, ws, target_id=None):
+        self.ws = ws
+        self.fileno = ws.sock.fileno()
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.listeners = {}
+        self.closed = False
+        self.closed_at = None
+        self.on_close = None
+        self.condition = threading.Condition()
+
+        # Page state, kept up to date by the Runtime events (see prepare_session)
+        self.target_id = target_id
+        self.context_id = None
+        self.helper_context = None
+        self.helper_version = None
+
+    def subscribe(self, method: str, callback):
+        """Call callback(params) for every CDP event with the given method"""
+        self.listeners.setdefault(method, []).append(callback)
+
+    def send(self, method: str, params: dict | None = None) -> Future:
+        """Send a CDP request and return the Future of its reply"""
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise WebSocketException("CDP session is closed")
+            request_id = next(self.ids)
+            self.pending[request_id] = (future, time.perf_counter())
+        try:
+            self.ws.send(json.dumps({"id": request_id, "method": method, "params": params or {}}))
+        except Exception:
+            with self.condition:
+                self.pending.pop(request_id, None)
+                self.condition.notify_all()
+            raise
+        return future
+
+    def in_flight(self) -> int:
+        """Number of requests still waiting for a reply"""
+        return len(self.pending)
+
+    def oldest(self) -> Future | None:
+        """Future of the longest-waiting request"""
+        with self.condition:
+            return next((future for future, _ in self.pending.values()), None)
+
+    def wait_for_capacity(self, depth: int, timeout: float) -> bool:
+        """Block until fewer than depth requests are in flight, False if Chrome stopped replying"""
+        with self.condition:
+            if self.condition.wait_for(lambda: self.closed or len(self.pending) < depth, timeout):
+                return not self.closed
+        self.close("no reply from Chrome")
+        return False
+
+    def read_one(self):
+        """Read one message from Chrome and resolve the request it answers"""
+        message = json.loads(self.ws.recv())
+        if "id" not in message:
+            for callback in self.listeners.get(message.get("method"), ()):
+                callback(message.get("params", {}))
+            return
+        with self.condition:
+            future, sent = self.pending.pop(message["id"], (None, 0.0))
+            self.condition.notify_all()
+        if future is not None and not future.done():
+            future.set_result((message, time.perf_counter() - sent))
+
+    def read_ready(self):
+        """Event loop callback: read a message, or stop watching the socket once it is gone"""
+        try:
+            self.read_one()
+        except (WebSocketException, OSError, ValueError) as e:
+            asyncio.get_running_loop().remove_reader(self.fileno)
+            self.close(str(e) or "connection closed")
+
+    def run_reader(self):
+        """Reader thread: resolve replies until the connection closes"""
+        while not self.closed:
+            try:
+                self.read_one()
+            except WebSocketTimeoutException:
+                continue
+            except (WebSocketException, OSError, ValueError) as e:
+                self.close(str(e) or "connection closed")
+
+    def close(self, reason: str = "connection closed"):
+        """Fail every request still waiting for a reply, and call on_close the first time"""
+        with self.condition:
+            was_open = not self.closed
+            self.closed = True
+            pending = list(self.pending.values())
+            self.pending.clear()
+            self.condition.notify_all()
+        for future, _ in pending:
+            if not future.done():
+                future.set_exception(ConnectionError(reason))
+        if was_open:
+            self.closed_at = time.monotonic()
+            if self.on_close:
+                self.on_close()
+
+class SessionReader:
+    """Reads the replies and events of many CDP sessions on a single thread.
+
+    Sessions are added and removed from any thread; a socket pair wakes up the selector
+    so the change applies at once. Removing a session also closes its WebSocket.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.wakeup, self.waker = socket.socketpair()
+        self.wakeup.setblocking(False)
+        self.selector.register(self.wakeup, selectors.EVENT_READ)
+        self.changes = queue.SimpleQueue()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def add(self, session: CdpSession):
+        """Start reading a session"""
+        self.changes.put((True, session))
+        self.waker.send(b"\0")
+
+    def remove(self, session: CdpSession):
+        """Stop reading a session and close its WebSocket"""
+        self.changes.put((False, session))
+        self.waker.send(b"\0")
+
+    def run(self):
+        """Reader thread: dispatch every readable session"""
+        while True:
+            for key, _ in self.selector.select():
+                if key.data is None:
+                    self._apply_changes()
+                    continue
+                if self.selector.get_map().get(key.fileobj) is not key:
+                    continue  # Removed by the changes applied just before
+                try:
+                    key.data.read_one()
+                except (WebSocketException, OSError, ValueError) as e:
+                    self.selector.unregister(key.fileobj)
+                    key.data.close(str(e) or "connection closed")
+
+    def _apply_changes(self):
+        try:
+            self.wakeup.recv(4096)
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                add, session = self.changes.get_nowait()
+            except queue.Empty:
+                return
+            if add:
+                self.selector.register(session.fileno, selectors.EVENT_READ, session)
+                continue
+            try:
+                self.selector.unregister(session.fileno)
+            except KeyError:
+                pass  # Already unregistered after a read error
+            session.ws.close()
+
+class TabWatcher:
+    """Keeps a live index of the tabs of every browser, fed by CDP Target events.
+
+    One browser-level connection per entry of Controller.devtools_urls subscribes to
+    Target.setDiscoverTargets, so tabs that open, navigate or close are known within
+    milliseconds instead of at the next poll of the /json endpoint. Tabs are stored in
+    the same shape as the /json entries, with the "browser" they belong to (see
+    browser_name). The browsers are connected to at the same time, and connect() tries
+    again for those that were unreachable; their tabs are dropped when they go away.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.tabs = {}
+        self.version = 0
+        self.listeners = []
+        self.closers = {}
+        self.changed = threading.Condition()
+        self.connecting = threading.Lock()
+
+    def ready(self) -> bool:
+        """Whether at least one browser connection is up and the index is live"""
+        with self.changed:
+            return any(not session.closed for session in self.sessions.values())
+
+    def missing(self) -> list[str]:
+        """Gets the DevTools endpoints without a live browser connection"""
+        with self.changed:
+            return [url for url in Controller.devtools_urls
+                    if url not in self.sessions or self.sessions[url].closed]
+
+    def connect(self) -> bool:
+        """Open the missing browser-level connections at once, False if none is up"""
+        with self.connecting:
+            missing = self.missing()
+            if missing:
+                with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                    list(executor.map(self._connect, missing))
+        return self.ready()
+
+    def _connect(self, url):
+        parts = urllib.parse.urlsplit(url)
+        try:
+            info = get_json(f"{parts.scheme}://{parts.netloc}/json/version", timeout=2)
+            ws = websocket.create_connection(info["webSocketDebuggerUrl"], timeout=5)
+        except (WebSocketException, OSError, KeyError, ValueError):
+            return
+        ws.settimeout(None)  # The reader may wait for events indefinitely
+        browser = browser_name(url)
+        session = CdpSession(ws)
+        session.subscribe("Target.targetCreated", lambda params: self._update(browser, params))
+        session.subscribe("Target.targetInfoChanged",
+                          lambda params: self._update(browser, params))
+        session.subscribe("Target.targetDestroyed", self._remove)
+        self._forget(browser)
+        threading.Thread(target=session.run_reader, daemon=True).start()
+        try:
+            session.send("Target.setDiscoverTargets", {"discover": True}).result(timeout=5)
+        except (WebSocketException, ConnectionError, TimeoutError):
+            session.close()
+            ws.close()
+            return
+        session.on_close = lambda: self._forget(browser)
+        with self.changed:
+            self.sessions[url] = session
+
+    def snapshot(self) -> list[dict]:
+        """Gets the current tabs"""
+        with self.changed:
+            return list(self.tabs.values())
+
+    def wait_for_change(self, version: int, timeout: float):
+        """Block until the tabs differ from the given index version, or the timeout passes"""
+        with self.changed:
+            self.changed.wait_for(
+                lambda: self.version != version or not Controller.running, timeout)
+
+    def wake(self):
+        """Wake up every thread waiting for a change, e.g. on shutdown"""
+        with self.changed:
+            self.changed.notify_all()
+
+    def _notify(self):
+        self.version += 1
+        self.changed.notify_all()
+        for listener in self.listeners:
+            listener()
+
+    def _update(self, browser, params):
+        info = params.get("targetInfo", {})
+        if info.get("type") != "page":
+            return
+        with self.changed:
+            self.tabs[info["targetId"]] = {
+                "id": info["targetId"],
+                "type": "page",
+                "title": info.get("title", ""),
+                "url": info.get("url", ""),
+                "webSocketDebuggerUrl": f"ws://{browser}/devtools/page/{info['targetId']}",
+                "browser": browser,
+            }
+            self._notify()
+
+    def _forget(self, browser):
+        """Drop the tabs of a browser whose connection closed (or is being reopened)"""
+        with self.changed:
+            gone = [target_id for target_id, tab in self.tabs.items()
+                    if tab["browser"] == browser]
+            for target_id in gone:
+                del self.tabs[target_id]
+            if gone:
+                self._notify()
+
+    def _remove(self, params):
+        target_id = params.get("targetId")
+        with self.changed:
+            self.tabs.pop(target_id, None)
+            closer = self.closers.pop(target_id, None)
+            self._notify()
+        if closer:
+            closer()
+
+class TabPool:
+    """The CDP sessions of the open YouTube video tabs, and the routing of commands to them.
+
+    attach and detach start and stop reading a session (SessionReader or the event loop).
+    Idle sessions are closed and reopened on demand; lost ones are reconnected on their own
+    threads by heartbeat() (see the Multiple Tabs and Reconnecting sections of the README).
+    """
+    PING = ("Runtime.evaluate", {"expression": "0"})
+
+    def __init__(self, attach, detach):
+        self.attach = attach
+        self.detach = detach
+        self.sessions = {}
+        self.tabs = {}
+        self.activity = {}
+        self.idle = set()
+        self.seen = set()
+        self.watcher_version = None
+        self.pings = {}
+        self.down_since = {}
+        self.failures = {}
+        self.retry_at = {}
+        self.reconnecting = {}
+        self.reconnected = collections.deque()
+        self.parked = {}
+        self.unparked = []
+
+    def sync(self, tabs: list[dict]):
+        """Connect to new video tabs and drop the sessions of tabs that are gone.
+
+        Lost tabs are left to their reconnect threads (see reconnect_lost).
+        """
+        self.tabs = {tab["id"]: tab for tab in tabs}
+        self._collect()
+        for target_id in list(self.sessions):
+            if target_id not in self.tabs:
+                self.drop(target_id)
+        self.idle &= set(self.tabs)
+        if not self.sessions:
+            self.idle.clear()
+        self.reconnect_lost()
+        for target_id, tab in self.tabs.items():
+            if target_id not in self.sessions and target_id not in self.idle \
+                    and target_id not in self.down_since:
+                self.connect(tab)
+
+    def stale(self) -> bool:
+        """Whether the tab watcher saw tabs change since the last refresh"""
+        watcher = Controller.tab_watcher
+        return bool(watcher and watcher.ready() and watcher.version != self.watcher_version)
+
+    def refresh(self):
+        """Sync with the tab watcher's index"""
+        watcher = Controller.tab_watcher
+        self.watcher_version = watcher.version
+        self.sync(video_tabs(watcher.snapshot()))
+
+    def connect(self, tab: dict) -> CdpSession | None:
+        """Open a session to a tab and install the page helper in it"""
+        session = self.open(tab)
+        if session is None:
+            self._retry_later(tab["id"])
+            return None
+        return self.adopt(tab, session)
+
+    def open(self, tab: dict) -> CdpSession | None:
+        """Connect to a tab and prepare the session, without adding it to the pool yet.
+
+        Safe to call from any thread; returns None if the tab could not be reached.
+        """
+        try:
+            ws = websocket.create_connection(tab["webSocketDebuggerUrl"], timeout=5)
+        except (WebSocketException, OSError) as e:
+            print_msg(f"{RED}ERROR: Error connecting to tab {tab['id']}.{RESET}")
+            print_msg(f"{RED}Exception: {str(e)}{RESET}")
+            return None
+        target_id = tab["id"]
+        session = CdpSession(ws, target_id)
+        session.subscribe("Runtime.bindingCalled",
+                          lambda params: self._on_binding(target_id, params))
+        self.attach(session)
+        try:
+            prepare_session(session)
+        except WebSocketException:
+            self.detach(session)
+            return None
+        return session
+
+    def adopt(self, tab: dict, session: CdpSession) -> CdpSession:
+        """Add a session opened by open() to the pool"""
+        target_id = tab["id"]
+        watch_connected_tab(session)
+        session.on_close = self.wake
+        Metrics.count("reconnects" if target_id in self.seen else "connects")
+        self.seen.add(target_id)
+        self.sessions[target_id] = session
+        self.activity[target_id] = time.monotonic()
+        self.idle.discard(target_id)
+        down = self.down_since.pop(target_id, None)
+        if down is not None:
+            Metrics.sample("recover", time.monotonic() - down)
+            self.failures.pop(target_id, None)
+            self.retry_at.pop(target_id, None)
+        print_msg(f"Connected to tab {GREEN}{target_id}{RESET}: {tab['url']}", no_time_prefix=True)
+        return session
+
+    def drop(self, target_id: str, lost: bool = False):
+        """Close the session of a tab; a lost session is reconnected by the next heartbeat"""
+        session = self.sessions.pop(target_id, None)
+        self.pings.pop(target_id, None)
+        if session is not None:
+            session.on_close = None
+            session.close()
+            self.detach(session)
+            PlaybackState.forget(target_id)
+            if lost and target_id in self.tabs:
+                self.down_since.setdefault(target_id, session.closed_at)
+                self.wake()
+
+    def close(self):
+        """Close every session"""
+        for target_id in list(self.sessions):
+            self.drop(target_id)
+
+    def sweep(self):
+        """Close sessions that are dead or saw no activity for Controller.idle_timeout seconds.
+
+        Runs on every heartbeat and before routing a command. Idle sessions stay open while
+        a client is subscribed to the playback state, since their tabs stream it.
+        """
+        cutoff = time.monotonic() - Controller.idle_timeout
+        watched = bool(PlaybackState.subscribers)
+        for target_id, session in list(self.sessions.items()):
+            if session.closed:
+                self.drop(target_id, lost=True)
+            elif (Controller.idle_timeout > 0 and not watched
+                  and self.activity.get(target_id, 0) < cutoff):
+                self.drop(target_id)
+                self.idle.add(target_id)
+
+    def heartbeat(self):
+        """Ping every session and reconnect the tabs whose session was lost.
+
+        A session that closed, failed to send its ping, or left the previous ping
+        unanswered for Controller.ping_timeout seconds is dropped. Lost tabs that are
+        still open are reconnected once their backoff has passed.
+        """
+        if self.stale():
+            self.refresh()
+        self._collect()
+        self.sweep()
+        now = time.monotonic()
+        for target_id, session in list(self.sessions.items()):
+            ping = self.pings.get(target_id)
+            if ping and not ping[0].done() and now - ping[1] > Controller.ping_timeout:
+                print_msg(f"{RED}ERROR: Tab {target_id} stopped answering pings. "
+                          f"Reconnecting...{RESET}")
+                session.close("no reply to ping")
+            elif not session.closed and (ping is None or ping[0].done()):
+                try:
+                    self.pings[target_id] = (session.send(*self.PING), now)
+                except (WebSocketException, OSError) as e:
+                    session.close(str(e) or "connection closed")
+            if session.closed:
+                self.drop(target_id, lost=True)
+        self.reconnect_lost()
+        self.requeue_unparked()
+
+    def reconnect_lost(self):
+        """Start a reconnect thread for every lost tab whose backoff has passed"""
+        for target_id in list(self.down_since):
+            tab = self.tabs.get(target_id)
+            if tab is None or target_id in self.sessions:
+                self.down_since.pop(target_id)
+                self.failures.pop(target_id, None)
+                self.retry_at.pop(target_id, None)
+                self.unpark(target_id)
+            elif (target_id not in self.reconnecting
+                  and self.retry_at.get(target_id, 0) <= time.monotonic()):
+                print_msg(f"{YELLOW}Reconnecting to tab {target_id}...{RESET}")
+                reconnect = threading.Thread(target=self._reconnect, args=(tab,), daemon=True)
+                self.reconnecting[target_id] = reconnect
+                reconnect.start()
+
+    def _reconnect(self, tab):
+        """Reconnect thread: open a session to a lost tab and hand it to the sending thread"""
+        self.reconnected.append((tab, self.open(tab)))
+        self.wake()
+
+    def _collect(self):
+        """Add the sessions opened by the reconnect threads to the pool, or schedule the next
+        attempt for the tabs they could not reach"""
+        while self.reconnected:
+            tab, session = self.reconnected.popleft()
+            self.reconnecting.pop(tab["id"], None)
+            if session is None:
+                self._retry_later(tab["id"])
+            elif tab["id"] in self.tabs and tab["id"] not in self.sessions:
+                self.adopt(self.tabs[tab["id"]], session)
+            else:
+                session.close()
+                self.detach(session)
+            self.unpark(tab["id"])
+
+    def lost(self, browser: str | None = None) -> list[str]:
+        """Gets the open tabs whose session was lost, of one browser if given"""
+        return [target_id for target_id in self.down_since if target_id in self.tabs
+                and browser in (None, self.tabs[target_id].get("browser"))]
+
+    def park(self, command: QueuedCommand, lost: list[str]) -> list:
+        """Hold a command until the most recently active of the lost tabs is reconnected or
+        its attempt failed; it is then routed again, or expires in the queue"""
+        target_id = max(lost, key=lambda target_id: self.activity.get(target_id, 0))
+        self.parked.setdefault(target_id, []).append(command)
+        return []
+
+    def unpark(self, target_id: str):
+        """Release the commands held for a tab once its reconnect succeeded or failed"""
+        self.unparked.extend(self.parked.pop(target_id, []))
+
+    def requeue_unparked(self):
+        """Put the released commands back at the front of the queue, in order"""
+        for command in reversed(self.unparked):
+            Controller.command_queue.requeue(command)
+        self.unparked.clear()
+
+    @staticmethod
+    def backoff(failures: int) -> float:
+        """Seconds to wait after a number of failed attempts: doubling from
+        Controller.reconnect_delay up to Controller.reconnect_max_delay, with jitter"""
+        delay = min(Controller.reconnect_max_delay,
+                    Controller.reconnect_delay * 2 ** max(failures - 1, 0))
+        return random.uniform(delay / 2, delay)
+
+    @staticmethod
+    def wake(delay: float = 0.0):
+        """Queue a heartbeat from any thread, now or after delay seconds"""
+        if delay <= 0:
+            Controller.command_queue.put(QueuedCommand("heartbeat"))
+            return
+        timer = threading.Timer(delay, TabPool.wake)
+        timer.daemon = True
+        timer.start()
+
+    def _retry_later(self, target_id):
+        """Schedule the next attempt to reconnect a lost tab after a failed one"""
+        if target_id in self.down_since:
+            self.failures[target_id] = self.failures.get(target_id, 0) + 1
+            delay = self.backoff(self.failures[target_id])
+            self.retry_at[target_id] = time.monotonic() + delay
+            self.wake(delay)
+
+    def missing(self, command: QueuedCommand) -> list[dict]:
+        """Gets the known tabs a command is routed to that have no session yet"""
+        self.sweep()
+        self._collect()
+        if command.tab == "all":
+            return [tab for target_id, tab in self.tabs.items()
+                    if target_id not in self.sessions and target_id not in self.down_since]
+        if command.tab in self.tabs:
+            return [self.tabs[command.tab]] if command.tab not in self.sessions \
+                and command.tab not in self.down_since else []
+        tabs = [tab for tab in self.tabs.values() if tab["id"] not in self.down_since]
+        if command.tab:
+            tabs = [tab for tab in tabs if tab.get("browser") == command.tab]
+        if not tabs or any(tab["id"] in self.sessions for tab in tabs):
+            return []
+        return [max(tabs, key=lambda tab: self.activity.get(tab["id"], 0))]
+
+    def route(self, command: QueuedCommand):
+        """Pair a command with the sessions it goes to.
+
+        Returns a list of (session, command) pairs, with a copy of the command per tab
+        when it is sent to all tabs, or None when no tab is connected at all. A command
+        that only a lost tab could take is parked (see park) and gives no pairs, like a
+        command that has to wait behind the released ones.
+        """
+        if self.unparked:
+            Controller.command_queue.requeue(command)
+            self.requeue_unparked()
+            return []
+        if command.tab in self.lost():
+            return self.park(command, [command.tab])
+        if command.tab == "all":
+            sessions = list(self.sessions.values())
+        elif command.tab in self.sessions:
+            sessions = [self.sessions[command.tab]]
+        elif command.tab:
+            browser = [session for target_id, session in self.sessions.items()
+                       if self.tabs.get(target_id, {}).get("browser") == command.tab]
+            if not browser:
+                if lost := self.lost(command.tab):
+                    return self.park(command, lost)
+                command.finish(False, f"unknown tab: {command.tab}")
+                return []
+            sessions = [max(browser, key=lambda session: self.activity.get(session.target_id, 0))]
+        elif self.sessions:
+            sessions = [max(self.sessions.values(),
+                            key=lambda session: self.activity.get(session.target_id, 0))]
+        else:
+            sessions = []
+
+        if not sessions:
+            lost = self.lost()
+            return self.park(command, lost) if lost else None
+        for session in sessions:
+            self.activity[session.target_id] = max(
+                self.activity.get(session.target_id, 0), time.monotonic() - 1)
+        if len(sessions) == 1:
+            return [(sessions[0], command)]
+        copies = [QueuedCommand(command.name, command.args, command.request_id, session.target_id)
+                  for session in sessions]
+        for copy in copies:
+            copy.received, copy.stages = command.received, dict(command.stages)
+        command.follow(*copies)
+        return list(zip(sessions, copies))
+
+    def _on_binding(self, target_id, params):
+        if params.get("name") == "__ytcActive":
+            self.activity[target_id] = time.monotonic()
+        elif params.get("name") == "__ytcState":
+            PlaybackState.update(target_id, params.get("payload"))
+
+class PlaybackState:
+    """The live playback state of every connected tab, pushed by the page.
+
+    The state reporter in the page helper sends the position, duration, rate, volume,
+    quality and chapter through the __ytcState binding whenever something other than
+    the position changes, and at most every Controller.state_interval seconds while
+    the video plays. The chapter index (start times and titles) is sent once per video
+    and kept until the tab moves to another video. Clients of the command socket can
+    query the cached state or subscribe to every update instead of polling Chrome.
+    """
+    tabs = {}
+    subscribers = []
+    lock = threading.Lock()
+
+    @classmethod
+    def update(cls, target_id: str, payload: str):
+        """Store a state pushed by a tab and pass it on to the subscribers"""
+        try:
+            state = json.loads(payload)
+        except (TypeError, ValueError):
+            return
+        if not isinstance(state, dict):
+            return
+        state.update(tab=target_id, updated=round(time.time(), 3))
+        with cls.lock:
+            previous = cls.tabs.get(target_id, {})
+            if "chapter_index" not in state and previous.get("video") == state.get("video"):
+                if "chapter_index" in previous:
+                    state["chapter_index"] = previous["chapter_index"]
+            cls.tabs[target_id] = state
+        cls._publish(state)
+
+    @classmethod
+    def forget(cls, target_id: str):
+        """Drop the state of a tab the controller disconnected from"""
+        with cls.lock:
+            known = cls.tabs.pop(target_id, None) is not None
+        if known:
+            cls._publish({"tab": target_id, "closed": True})
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        """Gets the last state of every tab"""
+        with cls.lock:
+            return {"tabs": list(cls.tabs.values())}
+
+    @classmethod
+    def subscribe(cls, reply):
+        """Send every state update to reply (a client's reply function) from now on"""
+        with cls.lock:
+            if reply not in cls.subscribers:
+                cls.subscribers.append(reply)
+
+    @classmethod
+    def unsubscribe(cls, reply):
+        """Stop sending state updates to reply"""
+        with cls.lock:
+            if reply in cls.subscribers:
+                cls.subscribers.remove(reply)
+
+    @classmethod
+    def _publish(cls, state: dict):
+        with cls.lock:
+            subscribers = list(cls.subscribers)
+        if subscribers:
+            line = f"state {json.dumps(state)}"
+            for reply in subscribers:
+                reply(line)
+
+class CommandCoalescer:
+    """Merges bursts of commands taken from the command queue before they are sent.
+
+    Relative seeks arriving within Controller.coalesce_window seconds of the first one
+    become a single net seek, and repeated presses of the same toggle cancel out in
+    pairs. The merged commands finish together with the command that replaces them.
+    """
+
+    SEEKS = {"skip_forward": 1, "skip_backward": -1, "skip": 1}
+    TOGGLES = ("cc", "fullscreen", "theater", "progress_bar", "video_navigator")
+
+    def __init__(self):
+        self.held = None
+
+    @classmethod
+    def kind(cls, command: QueuedCommand) -> str | None:
+        """Gets what a command can be merged with: "seek", its own toggle name, or None.
+
+        Commands routed to different tabs never merge, so the tab is part of the kind.
+        """
+        if command.name in cls.SEEKS:
+            kind = "seek"
+        elif command.name in cls.TOGGLES:
+            kind = command.name
+        else:
+            return None
+        return f"{kind}@{command.tab}" if command.tab else kind
+
+    def _first(self):
+        """Take the command held back from the last burst, if any and not expired"""
+        command, self.held = self.held, None
+        if command is not None and CommandQueue.expire(command):
+            return None
+        return command
+
+    def take(self) -> QueuedCommand | None:
+        """Get the next command to send, merged with its burst (thread version)"""
+        group = [self._first() or Controller.command_queue.get()]
+        kind = self.kind(group[0])
+        if kind is None or Controller.coalesce_window <= 0:
+            return group[0]
+        deadline = time.monotonic() + Controller.coalesce_window
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                command = Controller.command_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if self.kind(command) != kind:
+                self.held = command
+                break
+            group.append(command)
+        return self.merge(group)
+
+    async def take_async(self) -> QueuedCommand | None:
+        """Coroutine version of take"""
+        group = [self._first() or await Controller.command_queue.get()]
+        kind = self.kind(group[0])
+        if kind is None or Controller.coalesce_window <= 0:
+            return group[0]
+        deadline = time.monotonic() + Controller.coalesce_window
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                command = await asyncio.wait_for(Controller.command_queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if self.kind(command) != kind:
+                self.held = command
+                break
+            group.append(command)
+        return self.merge(group)
+
+    def release(self, command: QueuedCommand):
+        """Put a command that could not be sent, and the one held back, back in the queue,
+        where they wait for a tab (and expire) like the others"""
+        if self.held is not None:
+            Controller.command_queue.requeue(self.held)
+            self.held = None
+        Controller.command_queue.requeue(command)
+
+    def merge(self, group: list[QueuedCommand]) -> QueuedCommand | None:
+        """Replace a burst by one command, or by None when it cancels out"""
+        if len(group) == 1:
+            return group[0]
+        kind = self.kind(group[0]).split("@")[0]
+        tab = group[0].tab
+        merged = None
+        if kind == "seek":
+            net = sum(self.SEEKS[command.name]
+                      * {**Commands.defaults(command.name), **command.args}["skip_seconds"]
+                      for command in group)
+            if net:
+                seconds = int(abs(net)) if float(net).is_integer() else abs(net)
+                merged = QueuedCommand("skip_forward" if net > 0 else "skip_backward",
+                                       {"skip_seconds": seconds}, tab=tab)
+        elif len(group) % 2:
+            merged = QueuedCommand(kind, tab=tab)
+
+        with Controller.command_queue.condition:  # Also counted by CommandQueue.put
+            Controller.merged_commands += len(group) - (merged is not None)
+        print_msg(f"{GREY}Merged {len(group)} presses of {kind} into "
+                  f"{'one' if merged else 'none'}{RESET}")
+        if merged is None:
+            for command in group:
+                command.finish(True)
+            return None
+        merged.received = group[0].received
+        for command in group:
+            command.follow(merged, merged=True)
+        return merged
+
+class Metrics:
+    """Latency and counters of the command pipeline, kept for the stats command.
+
+    Every command is timed through the STAGES, and the last WINDOW samples of each stage
+    give the rolling percentiles (see the Latency Stats section of the README). "recover"
+    times how long lost tabs took to be reconnected.
+    """
+    STAGES = ("queue", "build", "send", "chrome", "total")
+    WINDOW = 1000
+
+    samples = {}
+    counters = {"commands": 0, "failed": 0, "dropped": 0, "rejected": 0, "evicted": 0,
+                "superseded": 0, "expired": 0, "replayed": 0, "connects": 0, "reconnects": 0}
+    max_queue_depth = 0
+    started = time.time()
+    lock = threading.Lock()
+
+    @classmethod
+    def count(cls, counter: str):
+        """Increase a counter"""
+        with cls.lock:
+            cls.counters[counter] = cls.counters.get(counter, 0) + 1
+
+    @classmethod
+    def queue_depth(cls) -> int:
+        """Gets the number of commands waiting, remembering the highest number seen"""
+        depth = Controller.command_queue.qsize()
+        cls.max_queue_depth = max(cls.max_queue_depth, depth)
+        return depth
+
+    @classmethod
+    def record(cls, command: QueuedCommand, ok: bool):
+        """Add the stage timings of a finished command"""
+        now = time.perf_counter()
+        points = [("queue", "taken"), ("build", "built"), ("send", "sent"), ("chrome", "replied")]
+        with cls.lock:
+            cls.counters["commands"] += 1
+            if not ok:
+                cls.counters["failed"] += 1
+                if "sent" not in command.stages:
+                    cls.counters["dropped"] += 1  # Never reached Chrome
+            start = command.received
+            for stage, point in points:
+                end = command.stages.get(point)
+                if end is None:
+                    break
+                cls._samples(stage).append(end - start)
+                start = end
+            cls._samples("total").append(now - command.received)
+
+    @classmethod
+    def sample(cls, stage: str, seconds: float):
+        """Add a sample that is not a command stage, such as recover"""
+        with cls.lock:
+            cls._samples(stage).append(seconds)
+
+    @classmethod
+    def _samples(cls, stage):
+        return cls.samples.setdefault(stage, collections.deque(maxlen=cls.WINDOW))
+
+    @staticmethod
+    def percentile(ordered: list[float], fraction: float) -> float:
+        """Gets the nearest-rank percentile of sorted samples"""
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        """Gets the counters and the p50/p95/p99 of every stage in milliseconds"""
+        with cls.lock:
+            samples = {stage: sorted(cls.samples.get(stage, ()))
+                       for stage in (*cls.STAGES, "recover")}
+            counters = dict(cls.counters)
+        latency = {}
+        for stage, ordered in samples.items():
+            if ordered:
+                latency[stage] = {
+                    "count": len(ordered),
+                    **{name: round(cls.percentile(ordered, fraction) * 1000, 3)
+                       for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+                }
+        return {
+            "uptime_s": round(time.time() - cls.started),
+            "queue_depth": cls.queue_depth(),
+            "max_queue_depth": cls.max_queue_depth,
+            "merged": Controller.merged_commands,
+            **counters,
+            "latency_ms": latency,
+        }
+
+class TraceRecorder:
+    """Appends every command received from a client to Controller.trace_file, for replay.
+
+    Commands are watched where the listener queues them and written as one JSON line each
+    once they finished, by a daemon thread (see the Tracing and Replay section of the README).
+    """
+    pending = queue.SimpleQueue()
+    thread = None
+    lock = threading.Lock()
+
+    @classmethod
+    def watch(cls, command: QueuedCommand):
+        """Record a client's command once it has finished, if tracing is on"""
+        if not Controller.trace_file:
+            return
+        arrived = time.time() - (time.perf_counter() - command.received)
+        command.future.add_done_callback(
+            lambda future: cls._submit(cls.entry(command, future.result(), arrived)))
+
+    @staticmethod
+    def entry(command: QueuedCommand, result: dict, arrived: float) -> dict:
+        """Gets the trace entry of a finished command"""
+        entry = {"t": round(arrived, 4), "name": command.name}
+        if command.args:
+            entry["args"] = command.args
+        if command.tab:
+            entry["tab"] = command.tab
+        entry["ok"] = result["ok"]
+        if result["error"]:
+            entry["error"] = result["error"]
+        if command.js_size is not None:
+            entry["js"] = command.js_size
+        start = command.received
+        for stage, point in (("queue", "taken"), ("build", "built"),
+                             ("send", "sent"), ("chrome", "replied")):
+            end = command.stages.get(point)
+            if end is None:
+                break
+            entry[stage] = round((end - start) * 1000, 3)
+            start = end
+        entry["total"] = result["ms"]
+        return entry
+
+    @classmethod
+    def _submit(cls, entry):
+        if cls.thread is None:
+            with cls.lock:
+                if cls.thread is None:
+                    cls.thread = threading.Thread(target=cls._run, daemon=True)
+                    cls.thread.start()
+        cls.pending.put(entry)
+
+    @classmethod
+    def flush(cls, timeout: float = 2.0):
+        """Wait until every entry recorded so far has been written"""
+        if cls.thread is not None and cls.thread.is_alive():
+            written = threading.Event()
+            cls.pending.put(written)
+            written.wait(timeout)
+
+    @classmethod
+    def _run(cls):
+        with open(Controller.trace_file, "a", encoding="utf-8") as file:
+            while True:
+                batch = [cls.pending.get()]
+                while True:
+                    try:
+                        batch.append(cls.pending.get_nowait())
+                    except queue.Empty:
+                        break
+                file.write("".join(f"{json.dumps(entry, separators=(',', ':'))}\n"
+                                   for entry in batch if isinstance(entry, dict)))
+                file.flush()
+                for entry in batch:
+                    if isinstance(entry, threading.Event):
+                        entry.set()
+
+class JsCode(str):
+    """JS source that goes into a command template as is; other strings become JS literals"""
+
+class QualityTarget(str):
+    """The target of a quality command: "up", "down", "max", "min", "auto", a height such
+    as "1080p", or a YouTube quality level name such as "hd720". Raises ValueError otherwise.
+    """
+    PATTERN = re.compile(r"up|down|max|min|auto|\d{3,4}p?|hd\d{3,4}"
+                         r"|highres|large|medium|small|tiny")
+
+    def __new__(cls, value):
+        value = str(value).strip().lower()
+        if not cls.PATTERN.fullmatch(value):
+            raise ValueError(f"unknown quality: {value}")
+        return super().__new__(cls, value)
+
+class SkipSeconds(float):
+    """The seconds a skip moves by, negative to go back. Raises ValueError for anything that
+    is not a finite number.
+    """
+
+    def __new__(cls, value):
+        seconds = float(value)
+        if not math.isfinite(seconds):
+            raise ValueError(f"invalid skip: {value}")
+        return super().__new__(cls, seconds)
+
+class ChapterNumber(int):
+    """The number of a chapter, counting from 1. Raises ValueError for anything else."""
+
+    def __new__(cls, value):
+        number = int(value)
+        if number < 1:
+            raise ValueError(f"invalid chapter: {value}")
+        return super().__new__(cls, number)
+
+class Timestamp(float):
+    """A position in a video in seconds, given as a number or as "12:34" / "1:02:03".
+    Raises ValueError for anything else.
+    """
+
+    def __new__(cls, value):
+        if isinstance(value, str) and ":" in value:
+            seconds = 0.0
+            for part in value.strip().split(":"):
+                seconds = seconds * 60 + float(part)
+        else:
+            seconds = float(value)
+        if not math.isfinite(seconds) or seconds < 0:
+            raise ValueError(f"invalid position: {value}")
+        return super().__new__(cls, seconds)
+
+class PlaybackRate(float):
+    """A playback speed such as 1.75 or "1.5x", from 0.0625 to 16 (the range browsers
+    support). Raises ValueError otherwise.
+    """
+
+    def __new__(cls, value):
+        rate = float(str(value).strip().lower().removesuffix("x"))
+        if not 0.0625 <= rate <= 16:
+            raise ValueError(f"invalid playback rate: {value}")
+        return super().__new__(cls, rate)
+
+class Volume(int):
+    """A volume in percent, given as 40 or "40%", from 0 to 100. Raises ValueError otherwise."""
+
+    def __new__(cls, value):
+        volume = float(str(value).strip().removesuffix("%"))
+        if not 0 <= volume <= 100:
+            raise ValueError(f"invalid volume: {value}")
+        return super().__new__(cls, round(volume))
+
 class Commands:
     """A class for the JS code/files for the commands"""
     JS_COMMAND_PATH = os.path.join("commands", "JS")
 
     # Larger commands (with their own .js file)
     JS_COMMAND_FILES = {
-        "quality_up": "quality_up.js",
-        "quality_down": "quality_down.js",
-        "next_chapter" : "next_chapter.js",
-        "prev_chapter": "prev_chapter.js",
+        "quality_up": "quality.js",
+        "quality_down": "quality.js",
+        "quality": "quality.js",
+        "next_chapter" : "chapters.js",
+        "prev_chapter": "chapters.js",
+        "chapter": "chapters.js",
+        "seek": "chapters.js",
         "progress_bar": "progress_bar.js",
         "video_navigator": "video_navigator.js",
     }
@@ -80,6 +1493,27 @@ class Commands:
     INLINE_COMMANDS = {
         "skip_forward": "document.querySelector('video').currentTime += {skip_seconds}",
         "skip_backward": "document.querySelector('video').currentTime -= {skip_seconds}",
+        "skip": "document.querySelector('video').currentTime += {skip_seconds}",
+        "rate": """ (() => {{
+            const video = document.querySelector('video');
+            if (!video) return null;
+            document.getElementById('movie_player')?.setPlaybackRate?.({rate});
+            if (video.playbackRate !== {rate}) video.playbackRate = {rate};
+            return video.playbackRate;
+        }})()""",
+        "volume": """ (() => {{
+            const video = document.querySelector('video');
+            if (!video) return null;
+            const player = document.getElementById('movie_player');
+            if (player?.setVolume) {{
+                player.setVolume({volume});
+                if ({volume} > 0 && player.isMuted?.()) player.unMute();
+            }} else {{
+                video.volume = {volume} / 100;
+                video.muted = false;
+            }}
+            return Math.round(video.volume * 100);
+        }})()""",
         "cc": """ (() => {
             const btn = document.querySelector('.ytp-subtitles-button');
             if (btn) btn.click();
@@ -93,71 +1527,594 @@ class Commands:
             if (btn) btn.click();
         })()""",
         "restart": "document.querySelector('video').currentTime = 0",
-        "navigator_select": """ (() => {
-            window.videoNavController.select();
-        })()""",
+        "pause": "document.querySelector('video').pause()",
+        "navigator_select": "window.videoNavController.select()",
         "navigator_layout": """ (() => {
                 
         })()""",
-        "navigator_up": """ (() => {
-            window.videoNavController.up();
-        })()""",
-        "navigator_down": """ (() => {
-            window.videoNavController.down();
-        })()""",
-		"navigator_left": """ (() => {
-            window.videoNavController.left();
-        })()""",
-		"navigator_right": """ (() => {
-            window.videoNavController.right();
-        })()""",
+        "navigator_up": "window.videoNavController.up()",
+        "navigator_down": "window.videoNavController.down()",
+		"navigator_left": "window.videoNavController.left()",
+		"navigator_right": "window.videoNavController.right()",
+    }
+
+    # Arguments accepted by commands, with the converter used to validate each value
+    PARAMETERS = {
+        "skip_forward": {"skip_seconds": SkipSeconds},
+        "skip_backward": {"skip_seconds": SkipSeconds},
+        "skip": {"skip_seconds": SkipSeconds},
+        "rate": {"rate": PlaybackRate},
+        "volume": {"volume": Volume},
+        "quality_up": {"steps": int, "target": QualityTarget},
+        "quality_down": {"steps": int, "target": QualityTarget},
+        "quality": {"target": QualityTarget, "steps": int},
+        "chapter": {"index": ChapterNumber},
+        "seek": {"position": Timestamp},
+    }
+
+    # Default arguments of the parameterised commands (skip_seconds follows the tray setting).
+    # Defaults that are not in PARAMETERS are fixed: they pick the mode of a shared JS file.
+    DEFAULTS = {
+        "quality_up": {"target": "up", "steps": 1},
+        "quality_down": {"target": "down", "steps": 1},
+        "quality": {"target": "auto", "steps": 1},
+        "next_chapter": {"step": 1, "index": 0, "position": -1},
+        "prev_chapter": {"step": -1, "index": 0, "position": -1},
+        "chapter": {"step": 0, "index": 1, "position": -1},
+        "seek": {"step": 0, "index": 0, "position": 0},
+        "rate": {"rate": 1},
+        "volume": {"volume": 100},
     }
 
+    # Page script that pushes the playback state through the __ytcState binding
+    STATE_REPORTER_FILE = "state_reporter.js"
+
+    # Seconds between checks of the JS files for edits
+    RELOAD_INTERVAL = 1.0
+
+    # Compiled templates of the JS files by file name, as (mtime, Template)
+    templates = {}
+    generation = 0
+    problems = []
+    _last_refresh = 0.0
+    _helper = (None, None, None)
+
     @classmethod
-    def load_js_command(cls, filename, **kwargs):
-        """Load the Javascript command from file"""
-        path = os.path.join("commands", "JS", filename)
+    def _load(cls, filename):
+        """(Re)compile a JS file if it changed on disk since it was last read.
+
+        Raises OSError if it cannot be read, and KeyError or ValueError if its placeholders
+        do not match the command's arguments; an edited file that fails keeps serving the
+        last good version.
+        """
+        path = resource_path(os.path.join(cls.JS_COMMAND_PATH, filename))
+        mtime = os.stat(path).st_mtime_ns
+        cached = cls.templates.get(filename)
+        if cached and cached[0] == mtime:
+            return
         with open(path, "r", encoding="utf-8") as js_file:
-            js_code = js_file.read()
-        return Template(js_code).substitute(**kwargs)
+            template = Template(js_file.read())
+        try:
+            cls._check(filename, template)
+        except (KeyError, ValueError):
+            if cached:
+                cls.templates[filename] = (mtime, cached[1])  # Not again until the next edit
+            raise
+        cls.templates[filename] = (mtime, template)
+        cls.problems = [problem for problem in cls.problems if f" in {filename} (" not in problem]
+        cls.generation += 1
+
+    @classmethod
+    def _check(cls, filename, template):
+        """Render a template with placeholder arguments, raising KeyError or ValueError"""
+        if filename == cls.STATE_REPORTER_FILE:
+            template.substitute(interval_ms="0")
+        for command, command_file in cls.JS_COMMAND_FILES.items():
+            if command_file == filename:
+                template.substitute({name: "0" for name in cls.placeholders(command)})
+
+    @classmethod
+    def refresh(cls):
+        """Reload the JS files that were edited, checking at most once per RELOAD_INTERVAL"""
+        now = time.monotonic()
+        if now - cls._last_refresh < cls.RELOAD_INTERVAL:
+            return
+        cls._last_refresh = now
+        for filename in dict.fromkeys((*cls.JS_COMMAND_FILES.values(), cls.STATE_REPORTER_FILE)):
+            try:
+                cls._load(filename)
+            except OSError:
+                pass  # Keep serving the last good version; preload() reports missing files
+            except (KeyError, ValueError) as e:
+                problem = f"malformed template in {filename} ({e})"
+                if problem not in cls.problems:
+                    cls.problems.append(problem)
+                    print_msg(f"{RED}ERROR: Command file problem: {problem}{RESET}")
+        Macros.load()
+
+    @classmethod
+    def preload(cls) -> list[str]:
+        """Read and compile every JS file up front, returning a description of each problem"""
+        cls.problems = []
+        for command, filename in cls.JS_COMMAND_FILES.items():
+            try:
+                cls._load(filename)
+            except OSError as e:
+                cls.problems.append(f"{command}: cannot read {filename} ({e.strerror})")
+            except (KeyError, ValueError) as e:
+                cls.problems.append(f"{command}: malformed template in {filename} ({e})")
+            else:
+                if not cls.templates[filename][1].template.strip():
+                    cls.problems.append(f"{command}: {filename} is empty")
+        try:
+            cls._load(cls.STATE_REPORTER_FILE)
+        except OSError as e:
+            cls.problems.append(
+                f"playback state: cannot read {cls.STATE_REPORTER_FILE} ({e.strerror})")
+        except (KeyError, ValueError) as e:
+            cls.problems.append(
+                f"playback state: malformed template in {cls.STATE_REPORTER_FILE} ({e})")
+        cls.problems.extend(Macros.load())
+        cls._last_refresh = time.monotonic()
+        return cls.problems
+
+    @classmethod
+    def load_js_command(cls, filename, **kwargs):
+        """Render a JS file command from its cached template"""
+        cls.refresh()
+        if filename not in cls.templates:
+            cls._load(filename)
+        return cls.templates[filename][1].substitute(**kwargs)
+
+    @classmethod
+    def exists(cls, command: str) -> bool:
+        """Checks if the command is known"""
+        return command in cls.INLINE_COMMANDS or command in cls.JS_COMMAND_FILES
+
+    @classmethod
+    def arguments(cls, command: str, args: dict) -> dict:
+        """Validates the arguments of a command, raising ValueError for bad ones"""
+        params = cls.PARAMETERS.get(command, {})
+        unknown = sorted(set(args) - set(params))
+        if unknown:
+            raise ValueError(f"unknown argument(s) for {command}: {', '.join(unknown)}")
+        checked = {}
+        for name, value in args.items():
+            try:
+                checked[name] = params[name](value)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"invalid value for {name}: {value!r}") from e
+            if isinstance(checked[name], float) and checked[name].is_integer():
+                checked[name] = int(checked[name])
+        return checked
+
+    @classmethod
+    def placeholders(cls, command: str) -> list[str]:
+        """Gets the names of the template placeholders of a command"""
+        return list({**cls.PARAMETERS.get(command, {}), **cls.DEFAULTS.get(command, {})})
+
+    @classmethod
+    def defaults(cls, command: str) -> dict:
+        """Gets the current default arguments of a command"""
+        if "skip_seconds" in cls.PARAMETERS.get(command, {}):
+            return {"skip_seconds": Controller.skip_seconds}
+        return dict(cls.DEFAULTS.get(command, {}))
+
+    @classmethod
+    def helper_script(cls) -> str:
+        """Builds the page helper that defines every command as a method of window.__ytc.
+
+        The helper replaces an older version of itself and reports its version through
+        the __ytcReady binding, so the controller knows which page context has it. It
+        reports playback, focus and visibility through the __ytcActive binding, which
+        decides the tab that commands go to, and runs the state reporter that pushes the
+        playback state through the __ytcState binding. It is rebuilt only when a JS file
+        changed.
+        """
+        cls.refresh()
+        if cls._helper[0] == cls.generation:
+            return cls._helper[2]
+        methods = []
+        for command in (*cls.INLINE_COMMANDS, *cls.JS_COMMAND_FILES):
+            placeholders = {name: JsCode(f"args.{name}") for name in cls.placeholders(command)}
+            js_code = cls.get(command, **placeholders)
+            if js_code is not None:
+                # Return the command's value (a script that starts with a comment has none)
+                if not js_code.lstrip().startswith(("//", "/*")):
+                    js_code = f"return {js_code.lstrip()}"
+                methods.append(f"{command}(args) {{\n{js_code}\n}}")
+        body = ",\n".join(methods)
+        try:
+            reporter = cls.load_js_command(
+                cls.STATE_REPORTER_FILE, interval_ms=int(Controller.state_interval * 1000))
+        except (OSError, KeyError, ValueError):
+            reporter = ""  # preload() reports it; commands work without the state stream
+        version = hashlib.sha1((body + reporter).encode()).hexdigest()[:12]
+        script = f"""(() => {{
+            const version = "{version}";
+            if (window.__ytc?.version !== version) {{
+                window.__ytc = {{ version,\n{body}\n}};
+            }}
+            if (!window.__ytcWatching) {{
+                window.__ytcWatching = true;
+                const report = (kind) => window.__ytcActive?.(kind);
+                document.addEventListener('play', () => report('play'), true);
+                window.addEventListener('focus', () => report('focus'));
+                document.addEventListener('visibilitychange', () => {{
+                    if (!document.hidden) report('visible');
+                }});
+            }}
+            {reporter}
+            window.__ytcReady?.(version);
+        }})()"""
+        cls._helper = (cls.generation, version, script)
+        return script
+
+    @classmethod
+    def helper_version(cls) -> str:
+        """Gets the version of the current page helper"""
+        cls.helper_script()
+        return cls._helper[1]
+
+    @classmethod
+    def call(cls, command: str, **kwargs) -> str | None:
+        """Gets the short call of a command on the injected page helper"""
+        if not cls.exists(command):
+            return None
+        return f"__ytc.{command}({json.dumps(kwargs, separators=(',', ':')) if kwargs else ''})"
 
     @classmethod
     def get(cls, command: str, **kwargs) -> str | None:
         """Gets the Javascript command"""
+        kwargs = {name: json.dumps(value)
+                  if isinstance(value, str) and not isinstance(value, JsCode) else value
+                  for name, value in kwargs.items()}
         if command in cls.INLINE_COMMANDS:
             js_code = cls.INLINE_COMMANDS[command]
             if kwargs:
                 return js_code.format(**kwargs)
             return js_code
         if command in cls.JS_COMMAND_FILES:
-            return cls.load_js_command(cls.JS_COMMAND_FILES[command], **kwargs)
+            try:
+                return cls.load_js_command(cls.JS_COMMAND_FILES[command], **kwargs)
+            except (OSError, KeyError, ValueError):
+                return None  # Missing or malformed file, see Commands.problems
         return None
 
-class LogViewer(tk.Tk):
-    """A simple Tkinter window to display log messages with ANSI color codes."""
+class Macros:
+    """Named sequences of commands, defined in macros.json and run with one client call.
+
+    A macro is a list of steps: a command name, {"name": ..., "args": {...}}, or
+    {"wait": <milliseconds>}. The commands between two waits are sent to the page as
+    one batch (one Runtime.evaluate); each following batch is queued by the controller
+    at its offset from the start of the macro. The file is reloaded when it changes.
+    """
+    MACRO_FILE = "macros.json"
+
+    # Batches of every macro by name, as [(offset seconds, [(command, args), ...]), ...]
+    macros = {}
+    problems = []
+    _mtime = None
+
+    @classmethod
+    def load(cls) -> list[str]:
+        """(Re)load the macros if the file changed on disk, returning a description of each
+        problem"""
+        path = resource_path(cls.MACRO_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None  # No macros defined
+        if mtime == cls._mtime:
+            return cls.problems
+        cls._mtime = mtime
+        cls.macros, cls.problems = {}, []
+        if mtime is None:
+            return cls.problems
+        try:
+            with open(path, "r", encoding="utf-8") as macro_file:
+                definitions = json.load(macro_file)
+        except (OSError, ValueError) as e:
+            cls.problems.append(f"cannot read {cls.MACRO_FILE} ({e})")
+            return cls.problems
+        if not isinstance(definitions, dict):
+            cls.problems.append(f"{cls.MACRO_FILE} must map macro names to lists of steps")
+            return cls.problems
+        for name, steps in definitions.items():
+            try:
+                cls.macros[name] = cls.compile(name, steps)
+            except ValueError as e:
+                cls.problems.append(f"macro {name}: {e}")
+        return cls.problems
+
+    @classmethod
+    def compile(cls, name: str, steps) -> list:
+        """Split the steps of a macro into batches, raising ValueError for bad steps"""
+        if Commands.exists(name) or name in ("exit", "stats", "state", "subscribe", "unsubscribe"):
+            raise ValueError("has the name of a command")
+        if not isinstance(steps, list) or not steps:
+            raise ValueError("must be a non-empty list of steps")
+        batches = [(0.0, [])]
+        for step in steps:
+            if isinstance(step, str):
+                step = {"name": step}
+            if not isinstance(step, dict):
+                raise ValueError(f"bad step: {step!r}")
+            if "wait" in step:
+                wait = step["wait"]
+                if isinstance(wait, bool) or not isinstance(wait, (int, float)) or wait < 0:
+                    raise ValueError(f"bad wait: {wait!r}")
+                offset = batches[-1][0] + wait / 1000
+                if batches[-1][1]:
+                    batches.append((offset, []))
+                else:
+                    batches[-1] = (offset, [])
+                continue
+            command = step.get("name")
+            if not Commands.exists(command):
+                raise ValueError(f"unknown command: {command}")
+            args = step.get("args") or {}
+            if not isinstance(args, dict):
+                raise ValueError(f"'args' of {command} must be an object")
+            batches[-1][1].append((command, Commands.arguments(command, args)))
+        if not batches[-1][1]:
+            batches.pop()  # A wait at the end has nothing to wait for
+        if not batches:
+            raise ValueError("has no commands, only waits")
+        return batches
+
+    @classmethod
+    def start(cls, command: QueuedCommand) -> QueuedCommand | None:
+        """Start a macro: return its first batch to be sent now and queue the others at their
+        offsets. The macro command finishes once every batch has. Other commands (including
+        the batches themselves) are returned unchanged.
+        """
+        batches = cls.macros.get(command.name)
+        if batches is None or "batch" in command.args:
+            return command
+        parts = [QueuedCommand(command.name, {"batch": index}, command.request_id, command.tab)
+                 for index in range(len(batches))]
+        command.follow(*parts)
+        first = None
+        for part, (offset, _steps) in zip(parts, batches):
+            if offset == 0 and first is None:
+                first = part
+                first.received, first.stages = command.received, dict(command.stages)
+                continue
+            timer = threading.Timer(offset, cls._release, args=(part,))
+            timer.daemon = True
+            timer.start()
+        return first
+
+    @staticmethod
+    def _release(part):
+        part.received = time.perf_counter()
+        Controller.command_queue.put(part)
+
+    @classmethod
+    def expression(cls, session, name: str, batch: int) -> str | None:
+        """Gets the JS of one batch of a macro: the calls of its commands, run in order"""
+        batches = cls.macros.get(name, [])
+        if batch >= len(batches):
+            return None  # The macro was edited while it ran
+        calls = [command_expression(session, command, {**Commands.defaults(command), **args})
+                 for command, args in batches[batch][1]]
+        if None in calls:
+            return None
+        if Controller.use_helper:
+            return ", ".join(calls)
+        return ",\n".join(f"(() => {{\n{call}\n}})()" for call in calls)
+
+    @classmethod
+    def describe(cls, name: str, batch: int) -> str:
+        """Gets the log line of a macro batch that was run"""
+        total = len(cls.macros.get(name, []))
+        part = f" (part {batch + 1}/{total})" if total > 1 else ""
+        return f"Ran {BLUE}macro {name}{RESET}{part}"
+
+class LogWorker:
+    """Writes the log on its own thread, so logging never holds up sending a command.
+
+    print_msg() only puts the message on a SimpleQueue. The worker takes everything that
+    is waiting at once, formats it (timestamp, "(xN)" counter of repeated lines), adds it
+    to Controller.screen_buffer, writes it to the terminal in one write, notifies the log
+    viewer once, and appends it to Controller.log_file as text or JSON lines, rotating the
+    file at Controller.log_max_bytes. With Controller.log_async off, messages are written
+    by the thread that logs them.
+    """
+    CLEAR = object()  # Clears the terminal and the screen buffer, in order with the messages
+    ANSI_RE = re.compile(r"\033\[[\d;]*[A-Za-z]")
+
+    pending = queue.SimpleQueue()
+    thread = None
+    lock = threading.Lock()
+    file = None
+
+    @classmethod
+    def submit(cls, record):
+        """Hand a message record (or CLEAR) to the worker, starting it when needed"""
+        if not Controller.log_async:
+            with cls.lock:
+                cls._write([record])
+            return
+        if cls.thread is None:
+            with cls.lock:
+                if cls.thread is None:
+                    cls.thread = threading.Thread(target=cls._run, daemon=True)
+                    cls.thread.start()
+        cls.pending.put(record)
+
+    @classmethod
+    def flush(cls, timeout: float = 2.0):
+        """Wait until every message submitted so far has been written"""
+        if cls.thread is not None and cls.thread.is_alive():
+            written = threading.Event()
+            cls.pending.put(written)
+            written.wait(timeout)
+
+    @classmethod
+    def _run(cls):
+        while True:
+            batch = [cls.pending.get()]
+            while True:
+                try:
+                    batch.append(cls.pending.get_nowait())
+                except queue.Empty:
+                    break
+            with cls.lock:
+                try:
+                    cls._write(batch)
+                except Exception as e:  # pylint: disable=broad-except
+                    sys.stderr.write(f"Log worker error: {e}\n")
+
+    @classmethod
+    def _write(cls, batch):
+        out = []
+        records = []
+        written = []
+        cleared = False
+        for record in batch:
+            if record is cls.CLEAR:
+                cls._output(out)
+                out = []
+                clear_screen()
+                Controller.screen_buffer.clear()
+                Controller.last_printed = None
+                cleared = True
+            elif isinstance(record, threading.Event):
+                written.append(record)
+            else:
+                cls._format(record, out, records)
+        cls._output(out)
+        if records and Controller.log_file:
+            cls._append_file(records)
+        if Controller.log_viewer and (records or cleared):
+            Controller.log_viewer.notify()
+        for event in written:
+            event.set()
+
+    @staticmethod
+    def _output(out):
+        if out:
+            sys.stdout.write("".join(out))
+            sys.stdout.flush()
+
+    @classmethod
+    def _format(cls, record, out, records):
+        """Add the terminal output and file record of a message"""
+        timestamp, msg, no_time_prefix, space_before = record
+        prefix = "\r\n" if space_before else ""
+        if no_time_prefix:
+            out.append(f"{prefix}{msg}\n")
+            Controller.last_printed = None
+            Controller.screen_buffer.append(f"{prefix}{msg}" if space_before else msg)
+            records.append((timestamp, msg, 1))
+            return
+        time_prefix = f"[{datetime.datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')}] "
+        if msg == Controller.last_printed and (timestamp - Controller.last_timer) < 60:
+            Controller.last_count += 1
+            line = f"{GREY}{time_prefix}{RESET}{msg} {GREY}(x{Controller.last_count}){RESET}"
+            Controller.screen_buffer.replace_last(line)
+            if out:  # The last line of this batch is the same message: write it once
+                escape = "\r" if out[-1].startswith(f"{GREY}\r") else "\033[F"
+                out[-1] = f"{GREY}{escape}{line}\n"
+            else:
+                out.append(f"{GREY}\033[F{line}\n")
+        else:
+            Controller.last_printed = msg
+            Controller.last_count = 1
+            line = f"{prefix}{GREY}{time_prefix}{RESET}{msg}"
+            Controller.screen_buffer.append(line)
+            out.append(f"{GREY}\r{line}\n")
+        Controller.last_timer = timestamp
+        records.append((timestamp, msg, Controller.last_count))
+
+    @classmethod
+    def _append_file(cls, records):
+        """Append records to the log file as text or JSON lines, rotating it when it is full"""
+        if Controller.log_format == "json":
+            lines = [json.dumps({
+                "time": round(timestamp, 3),
+                "level": cls.level(plain := cls.ANSI_RE.sub("", msg)),
+                "message": plain.strip(),
+                **({"repeat": count} if count > 1 else {}),
+            }) for timestamp, msg, count in records]
+        else:
+            lines = [f"[{datetime.datetime.fromtimestamp(timestamp):%Y-%m-%d %H:%M:%S}] "
+                     f"{cls.ANSI_RE.sub('', msg).strip()}{f' (x{count})' if count > 1 else ''}"
+                     for timestamp, msg, count in records]
+        data = "".join(f"{line}\n" for line in lines)
+        try:
+            if cls.file is None:
+                cls.file = open(Controller.log_file, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+            if cls.file.tell() + len(data) > Controller.log_max_bytes and cls.file.tell():
+                cls._rotate()
+            cls.file.write(data)
+            cls.file.flush()
+        except OSError as e:
+            sys.stderr.write(f"Cannot write log file {Controller.log_file}: {e}\n")
+            Controller.log_file = None
+
+    @classmethod
+    def _rotate(cls):
+        """Keep Controller.log_backups old files as <log_file>.1, .2, ..."""
+        cls.file.close()
+        for index in range(Controller.log_backups - 1, 0, -1):
+            older = f"{Controller.log_file}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{Controller.log_file}.{index + 1}")
+        if Controller.log_backups > 0:
+            os.replace(Controller.log_file, f"{Controller.log_file}.1")
+        cls.file = open(Controller.log_file, "w", encoding="utf-8")  # pylint: disable=consider-using-with
+
+    @staticmethod
+    def level(message: str) -> str:
+        """Gets the level of a log message from its ERROR:/WARNING: label"""
+        if "ERROR:" in message:
+            return "error"
+        if "WARNING:" in message:
+            return "warning"
+        return "info"
+
+class LogViewer:
+    """A simple Tkinter window to display log messages with ANSI color codes.
+
+    It only appends the lines that changed since its last update, so an update costs
+    the same after days of uptime. Other threads call notify(), which queues an event
+    for the Tk thread instead of touching the widget themselves. tkinter is imported
+    when the first viewer opens, so a headless controller never loads it.
+    """
+    ANSI_RE = re.compile(r'(\033\[\d+m)')
+    COLOR_MAP = {
+        '\033[31m': 'log_red',
+        '\033[32m': 'log_green',
+        '\033[33m': 'log_yellow',
+        '\033[34m': 'log_blue',
+        '\033[90m': 'log_grey',
+        '\033[0m': 'log_fg',
+    }
+
     def __init__(self):
         """Inital setup for the LogViewer"""
-        super().__init__()
-        self.title("YouTubeController Log Viewer")
-        self.geometry("800x400")
-        self.configure(bg="#23272e")
-        self.protocol("WM_DELETE_WINDOW", self.hide)
-        self.text = ScrolledText(self, state="disabled", font=("Consolas", 11),
+        # pylint: disable=import-outside-toplevel
+        import tkinter as tk
+        from tkinter.scrolledtext import ScrolledText
+        self.tk = tk
+        self.window = tk.Tk()
+        self.window.title("YouTubeController Log Viewer")
+        self.window.geometry("800x400")
+        self.window.configure(bg="#23272e")
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+        self.text = ScrolledText(self.window, state="disabled", font=("Consolas", 11),
         bg="#23272e", fg="#e6e6e6", insertbackground="#e6e6e6",
         selectbackground="#44475a", selectforeground="#f8f8f2",
         borderwidth=0, highlightthickness=0)
         self.text.pack(fill=tk.BOTH, expand=True)
-        self._last_lines = []
-        self._color_map = {
-            '\033[31m': 'log_red',
-            '\033[32m': 'log_green',
-            '\033[33m': 'log_yellow',
-            '\033[34m': 'log_blue',
-            '\033[90m': 'log_grey',
-            '\033[0m': 'log_fg',
-        }
+        self._last_seq = 0
+        self.max_lines = Controller.screen_buffer.entries.maxlen
         self._setup_tags()
-        self.after(1000, self._periodic_update)
+        self.window.bind("<<LogChanged>>", lambda _event: self.update_log())
+        self.window.after(1000, self._periodic_update)
 
     def _setup_tags(self):
         """Setup text tags for colored output"""
@@ -168,62 +2125,91 @@ class LogViewer(tk.Tk):
         self.text.tag_config('log_grey', foreground='#888888')
         self.text.tag_config('log_fg', foreground='#e6e6e6')
 
-    def update_log(self, lines):
-        """Update the log viewer with new lines"""
-        if lines == self._last_lines:
+    def notify(self):
+        """Ask the Tk thread to pick up new log lines (callable from any thread)"""
+        try:
+            self.window.event_generate("<<LogChanged>>", when="tail")
+        except (self.tk.TclError, RuntimeError):
+            pass  # Window is closing; the next start renders the buffer from scratch
+
+    def update_log(self):
+        """Append the lines that changed in Controller.screen_buffer since the last update"""
+        shown_seq = self._last_seq
+        reset, entries, self._last_seq = Controller.screen_buffer.since(shown_seq)
+        if not reset and not entries:
             return
-        self._last_lines = list(lines)
         self.text.config(state="normal")
-        self.text.delete(1.0, tk.END)
-        for line in lines:
+        if reset:
+            self.text.delete(1.0, self.tk.END)
+        for _, line, first_seq in entries:
+            if not reset and first_seq <= shown_seq:
+                self.text.delete("end-2l linestart", "end-1c")  # Rewritten last line
             self._insert_colored_line(line)
+        excess = int(self.text.index("end-1c").split(".")[0]) - 1 - self.max_lines
+        if excess > 0:
+            self.text.delete(1.0, f"{excess + 1}.0")
         self.text.config(state="disabled")
-        self.text.see(tk.END)
+        self.text.see(self.tk.END)
 
     def clear_log(self):
         """Clear the log viewer"""
-        self._last_lines = []
+        self._last_seq = Controller.screen_buffer.seq
         self.text.config(state="normal")
-        self.text.delete(1.0, tk.END)
+        self.text.delete(1.0, self.tk.END)
         self.text.config(state="disabled")
-        self.update()
 
     def _insert_colored_line(self, line):
         """Insert a line with ANSI color codes"""
-        ansi_re = re.compile(r'(\033\[\d+m)')
-        parts = ansi_re.split(line)
         current_tag = 'log_fg'
-        for part in parts:
-            if part in self._color_map:
-                current_tag = self._color_map[part]
-            else:
-                self.text.insert(tk.END, part, current_tag)
-        self.text.insert(tk.END, '\n', current_tag)
+        for part in self.ANSI_RE.split(line):
+            if part in self.COLOR_MAP:
+                current_tag = self.COLOR_MAP[part]
+            elif part:
+                self.text.insert(self.tk.END, part, current_tag)
+        self.text.insert(self.tk.END, '\n', current_tag)
 
     def show(self):
         """Show the log viewer window"""
-        self.deiconify()
-        self.lift()
-        self.focus_force()
+        self.window.deiconify()
+        self.window.lift()
+        self.window.focus_force()
 
     def hide(self):
         """Hide the log viewer window"""
-        self.withdraw()
+        self.window.withdraw()
+
+    def state(self):
+        """Gets the window state ("normal", "withdrawn", ...)"""
+        return self.window.state()
+
+    def mainloop(self):
+        """Run the Tk event loop until the window is destroyed"""
+        self.window.mainloop()
 
     def _periodic_update(self):
-        """Periodic update to check for new log lines"""
-        if Controller.screen_buffer != self._last_lines:
-            self.update_log(Controller.screen_buffer)
-        self.after(1000, self._periodic_update)
+        """Periodic check for new log lines, in case a notification was lost"""
+        if Controller.screen_buffer.seq != self._last_seq:
+            self.update_log()
+        self.window.after(1000, self._periodic_update)
 
 
 ### Helper Functions ###
 
+def lock_file(handle, lock=True):
+    """Take (or release) a non-blocking exclusive lock on an open file, raising OSError if taken."""
+    # pylint: disable=import-outside-toplevel
+    if os.name == "nt":
+        import msvcrt
+        msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK if lock else msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB if lock else fcntl.LOCK_UN)
+
 def check_single_instance():
     """Function to check if another instance of YouTubeController is already running."""
     try:
         Controller.lockfile_handle = open(Controller.lockfile, "w", encoding="utf-8")
-        msvcrt.locking(Controller.lockfile_handle.fileno(), msvcrt.LK_NBLCK, 1)
+        lock_file(Controller.lockfile_handle)
     except OSError:
         print_msg(
             f"{RED}ERROR: Another instance of YouTubeController is already running. "
@@ -231,11 +2217,12 @@ def check_single_instance():
             no_time_prefix=True)
         sys.exit(1)
 
-def check_port_available(port=65432):
-    """Function to check if the specified port is available."""
+def check_port_available(port=None):
+    """Function to check if the specified port (default: Controller.port) is available."""
+    port = port or Controller.port
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.bind(("localhost", port))
+            s.bind((Controller.host, port))
     except OSError:
         print_msg(
             f"{RED}ERROR: Port {port} is already in use. "
@@ -244,42 +2231,10 @@ def check_port_available(port=65432):
         sys.exit(1)
 
 def print_msg(msg, no_time_prefix=False, space_before=False):
-    """Function to print messages to the terminal with optional timestamp and buffering."""
-
-    def write_screen_buffer():
-        if Controller.log_viewer:
-            Controller.log_viewer.update_log(Controller.screen_buffer)
-
-    def current_time_str():
-        return datetime.datetime.now().strftime("%H:%M:%S")
-
-    prefix = "\r\n" if space_before else ""
-    if no_time_prefix:
-        print(f"{prefix}{msg}", flush=True)
-        Controller.last_printed = None
-        Controller.screen_buffer.append(f"{prefix}{msg}" if space_before else msg)
-        write_screen_buffer()
-        return
-    time_prefix = f"[{current_time_str()}] "
-    now = time.time()
-
-    if Controller.running:
-        if msg == Controller.last_printed and (now - Controller.last_timer) < 60:
-            Controller.last_count += 1
-            line = f"{GREY}{time_prefix}{RESET}{msg} {GREY}(x{Controller.last_count}){RESET}"
-            Controller.screen_buffer[-1] = line
-        else:
-            Controller.last_printed = msg
-            Controller.last_count = 1
-            line = f"{prefix}{GREY}{time_prefix}{RESET}{msg}"
-            Controller.screen_buffer.append(line)
-
-        if Controller.last_count > 1:
-            print(f"{GREY}\033[F{Controller.screen_buffer[-1]}", flush=True)
-        else:
-            print(f"{GREY}\r{Controller.screen_buffer[-1]}", flush=True)
-        Controller.last_timer = now
-        write_screen_buffer()
+    """Log a message with an optional timestamp; the LogWorker writes it, so this returns at
+    once."""
+    if no_time_prefix or Controller.running:
+        LogWorker.submit((time.time(), msg, no_time_prefix, space_before))
 
 def start_log_viewer():
     """Function to start the log viewer in a separate thread."""
@@ -288,7 +2243,7 @@ def start_log_viewer():
         return
     def run():
         Controller.log_viewer = LogViewer()
-        Controller.log_viewer.update_log(Controller.screen_buffer)
+        Controller.log_viewer.update_log()
         Controller.log_viewer.mainloop()
         Controller.log_viewer = None
     Controller.log_viewer_THREAD = threading.Thread(target=run, daemon=True)
@@ -301,6 +2256,11 @@ def toggle_log_viewer():
     else:
         start_log_viewer()
 
+def get_json(url, timeout):
+    """Fetch and decode a JSON document over HTTP, raising OSError or ValueError on failure."""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
 def wait_or_exit(duration, interval=0.1):
     """Wait for a duration in small intervals, checking if Controller.running is still True."""
     steps = int(duration / interval)
@@ -317,12 +2277,9 @@ def clear_screen():
 def welcome_message():
     """Clears the terminal and print a welcome message."""
 
-    clear_screen()
-
+    LogWorker.submit(LogWorker.CLEAR)
     if Controller.log_viewer:
-        Controller.log_viewer.clear_log()
         Controller.log_viewer.show()
-        Controller.screen_buffer.clear()
 
     print_msg(
         f"{GREEN}YouTubeControllerV{Controller.version} is running... "
@@ -331,146 +2288,369 @@ def welcome_message():
     print_msg(
         f"{GREY}Press Ctrl+C, or right-click the tray icon and select 'Quit' to exit.\r\n{RESET}",
         no_time_prefix=True)
+    for problem in Commands.problems:
+        print_msg(f"{RED}ERROR: Command file problem: {problem}{RESET}", no_time_prefix=True)
 
 
 ### Main Functions ###
 
-def find_youtube_ws_url():
-    """Function to find the YouTube WebSocket URL"""
+def find_youtube_tabs():
+    """Function to find the open YouTube video tabs, waiting until there is at least one"""
     print_msg("Fetching YouTube WebSocket URL...", no_time_prefix=True)
     start_time = time.time()
     timeout_seconds = 600  # 10 minutes
 
     while Controller.running:
+        Controller.command_queue.expire_waiting()
         elapsed = time.time() - start_time
         if elapsed > timeout_seconds:
             print_msg(f"{RED}ERROR: No YouTube video tab found after 10 minutes. Exiting...{RESET}")
             on_quit(None) # Exit the application
-            return None
-
-        try:
-            tabs = requests.get("http://localhost:9222/json", timeout=10).json()
-            youtube_tabs = [tab for tab in tabs if "youtube.com" in tab.get("url", "")]
-            if not youtube_tabs:
-                print_msg(
-                    f"{YELLOW}WARNING: No YouTube tab found."
-                    f"Please open youtube.com in your browser.{RESET}")
-                if not wait_or_exit(2):
-                    return None
-                continue
-
-            video_tabs = [tab for tab in youtube_tabs if "/watch?v=" in tab.get("url", "")]
-            if len(video_tabs) > 1:
-                print_msg(
-                    f"{YELLOW}WARNING: Multiple YouTube video tabs detected!"
-                    f" Please close all but one YouTube video tab.{RESET}")
-                if not wait_or_exit(5):
-                    return None
-                continue
-
-            if len(video_tabs) == 1:
-                print_msg(
-                    f"Found YouTube video tab: {GREEN}{video_tabs[0]['url']}{RESET}",
-                    no_time_prefix=True, space_before=True)
-                return video_tabs[0]["webSocketDebuggerUrl"]
-
-            print_msg(
-                f"{YELLOW}WARNING: No YouTube video detected."
-                f"Please open a video in your YouTube tab...{RESET}",
-                space_before=True)
-            if not wait_or_exit(2):
-                return None
+            return []
+
+        watcher = get_tab_watcher()
+        if watcher and (watcher.ready() or watcher.connect()):
+            version = watcher.version
+            tabs, retry_delay = select_youtube_tabs(watcher.snapshot())
+            if tabs:
+                return tabs
+            watcher.wait_for_change(version, retry_delay)
             continue
 
-        except requests.exceptions.RequestException as e:
+        try:
+            tabs, retry_delay = select_youtube_tabs(fetch_tabs())
+            if tabs:
+                return tabs
+            if not wait_or_exit(retry_delay):
+                return []
+        except (OSError, ValueError) as e:
             print_msg(
                 f"{RED}ERROR: Error fetching YouTube WebSocket URL."
                 f"Is Chrome running with remote debugging?{RESET}",
                 no_time_prefix=True)
             print_msg(f"{RED}Exception: {str(e)}{RESET}")
-    return None
-
-def send_command_loop():
-    """Function to connect to the YouTube WebSocket and send commands from the command queue."""
-    try:
-        while Controller.running:
-            ws_url = find_youtube_ws_url()
-            if not ws_url:
-                print_msg(
-                    f"{YELLOW}WARNING: YouTube WebSocket URL not found. Retrying in 5s.{RESET}")
-                if not wait_or_exit(5):
-                    return
-                continue
-
-            try:
-                print_msg(f"Connecting to WebSocket: {GREEN}{ws_url}{RESET}", no_time_prefix=True)
-                ws = websocket.create_connection(ws_url, timeout=5)
-
-                welcome_message()
-                print_msg(f"{GREEN}Connected to YouTube WebSocket{RESET}", no_time_prefix=True)
-                print_msg(f"{GREY}Listening for commands...{RESET}")
-
-                while Controller.running:
-                    command = Controller.command_queue.get()
-                    if command == "exit":
-                        ws.close()
-                        return
+    return []
+
+def browser_name(url):
+    """Gets the name a browser goes by in tab lists and @ addresses: the host:port of its
+    DevTools endpoint, e.g. "localhost:9223"."""
+    return urllib.parse.urlsplit(url).netloc
+
+def devtools_endpoint(value):
+    """Gets the /json URL of a DevTools endpoint given as a URL, "host:port" or a port."""
+    if "://" not in value:
+        value = f"http://{value if ':' in value else f'localhost:{value}'}/json"
+    parts = urllib.parse.urlsplit(value)
+    if not parts.port:
+        raise ValueError(f"invalid DevTools endpoint: {value}")
+    return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path or "/json", "", ""))
+
+def fetch_tabs():
+    """Fetch the tab lists of every browser in Controller.devtools_urls at the same time.
+
+    Each tab is tagged with its "browser". Raises OSError or ValueError if no browser answered.
+    """
+    urls = Controller.devtools_urls
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        futures = [executor.submit(get_json, url, 10) for url in urls]
+    tabs, errors = [], []
+    for url, future in zip(urls, futures):
+        try:
+            tabs += [{**tab, "browser": browser_name(url)} for tab in future.result()]
+        except (OSError, ValueError) as e:
+            errors.append(e)
+    if len(errors) == len(urls):
+        raise errors[0]
+    return tabs
+
+def get_tab_watcher():
+    """Gets the shared TabWatcher, or None when Target discovery is switched off."""
+    if not Controller.use_target_discovery:
+        return None
+    if Controller.tab_watcher is None:
+        Controller.tab_watcher = TabWatcher()
+    return Controller.tab_watcher
+
+def watch_connected_tab(session):
+    """Close the session as soon as the tab it is connected to is closed."""
+    if Controller.tab_watcher and Controller.tab_watcher.ready():
+        with Controller.tab_watcher.changed:
+            Controller.tab_watcher.closers[session.target_id] = lambda: session.close("tab closed")
+
+def video_tabs(tabs):
+    """Gets the YouTube video tabs from a DevTools tab list."""
+    return [tab for tab in tabs
+            if tab.get("type", "page") == "page"
+            and "youtube.com" in tab.get("url", "") and "/watch?v=" in tab.get("url", "")]
+
+def select_youtube_tabs(tabs):
+    """Pick the YouTube video tabs from the DevTools tab list.
+
+    Returns the video tabs, or an empty list together with the seconds to wait before
+    looking again.
+    """
+    youtube_tabs = [tab for tab in tabs if "youtube.com" in tab.get("url", "")]
+    if not youtube_tabs:
+        print_msg(
+            f"{YELLOW}WARNING: No YouTube tab found."
+            f"Please open youtube.com in your browser.{RESET}")
+        return [], 2
 
-                    expr = Commands.get(command, skip_seconds=Controller.skip_seconds) \
-                        if command in ("skip_forward", "skip_backward") \
-                        else Commands.get(command)
+    videos = video_tabs(youtube_tabs)
+    if videos:
+        print_msg(
+            f"Found {GREEN}{len(videos)}{RESET} YouTube video tab(s)",
+            no_time_prefix=True, space_before=True)
+        return videos, 0
 
-                    if expr:
-                        if not send_ws_command(ws, expr, command):
-                            break
+    print_msg(
+        f"{YELLOW}WARNING: No YouTube video detected."
+        f"Please open a video in your YouTube tab...{RESET}",
+        space_before=True)
+    return [], 2
 
-            except WebSocketTimeoutException:
-                print_msg(
-                    f"{YELLOW}WARNING: WebSocket connect timed out after 5s. Retrying...{RESET}")
-                if not wait_or_exit(1):
-                    return
-            except WebSocketException as e:
-                print_msg(f"{RED}ERROR: Error connecting to WebSocket. Retrying in 5s.{RESET}")
-                print_msg(f"{RED}Exception: {str(e)}{RESET}")
-                if not wait_or_exit(5):
-                    return
-    finally:
-        pass
+def send_command_loop():
+    """Function to connect to the YouTube tabs and send commands from the command queue."""
+    reader = SessionReader()
+    pool = TabPool(reader.add, reader.remove)
+    coalescer = CommandCoalescer()
+    threading.Thread(target=heartbeat_loop, daemon=True).start()
+    failures = 0
+    while Controller.running:
+        tabs = find_youtube_tabs()
+        if tabs:
+            pool.sync(tabs)
+        if not pool.sessions:
+            failures += 1
+            delay = TabPool.backoff(failures)
+            if not tabs:
+                print_msg(f"{YELLOW}WARNING: YouTube WebSocket URL not found. "
+                          f"Retrying in {delay:.1f}s.{RESET}")
+            if not wait_or_exit(delay):
+                return
+            continue
+        failures = 0
+        announce_tabs(pool)
 
-def send_ws_command(ws, expr, command):
-    """Send the evaluated JS expression over the WebSocket."""
+        while Controller.running:
+            Metrics.queue_depth()
+            command = coalescer.take()
+            if command is None:
+                continue
+            command.mark("taken")
+            if command.name == "exit":
+                pool.close()
+                return
+            if command.name == "heartbeat":
+                pool.heartbeat()
+                continue
+            command = Macros.start(command)
+            if command is None:
+                continue  # The macro starts with a wait
+
+            if pool.stale():
+                pool.refresh()
+            for tab in pool.missing(command):
+                pool.connect(tab)
+            targets = pool.route(command)
+            if targets is None:
+                coalescer.release(command)  # Send it once a tab is found again
+                break
+            for session, target_command in targets:
+                if session.wait_for_capacity(Controller.pipeline_depth, Controller.cdp_timeout):
+                    send_to_tab(pool, session, target_command)
+                else:
+                    chrome_stopped_replying(pool, session, target_command)
+
+def heartbeat_loop():
+    """Queue a heartbeat every Controller.ping_interval seconds, so the sender pings its tabs,
+    and reconnect to the browsers the tab watcher lost or could not reach yet."""
+    while Controller.ping_interval > 0 and wait_or_exit(Controller.ping_interval):
+        watcher = Controller.tab_watcher
+        if watcher and watcher.ready() and watcher.missing():
+            watcher.connect()
+        TabPool.wake()
+
+def announce_tabs(pool):
+    """Show the welcome message and the tabs that commands can be sent to."""
+    welcome_message()
+    print_msg(f"{GREEN}Connected to {len(pool.sessions)} YouTube tab(s){RESET}",
+              no_time_prefix=True)
+    for target_id in pool.sessions:
+        tab = pool.tabs[target_id]
+        print_msg(f"  {GREEN}{target_id}{RESET} {BLUE}{tab.get('browser', '')}{RESET} "
+                  f"{GREY}{tab['url']}{RESET}", no_time_prefix=True)
+    print_msg(f"{GREY}Listening for commands...{RESET}")
+
+def send_to_tab(pool, session, command):
+    """Send a command to one tab, dropping the tab's session if the send fails."""
+    command.sent_to = session.target_id
+    args = {**Commands.defaults(command.name), **command.args}
+    expr = command_expression(session, command.name, args)
+    command.mark("built")
+    if not expr:
+        command.finish(False, "unknown command")
+    elif not send_ws_command(session, expr, command):
+        pool.drop(session.target_id, lost=True)
+
+def chrome_stopped_replying(pool, session, command):
+    """Fail a command for a tab that stopped answering, and drop the tab's session."""
+    command.finish(False, "no reply from Chrome")
+    print_msg(f"{RED}ERROR: Tab {session.target_id} stopped replying. Reconnecting...{RESET}")
+    pool.drop(session.target_id, lost=True)
+
+def prepare_session(session):
+    """Track the page's execution contexts and install the page helper on a new connection.
+
+    The helper is registered for every new document and evaluated once in the current
+    one. The __ytcReady binding tells which context runs which helper version, so a
+    context without the helper, or with one built from JS files that have since been
+    edited, is detected before the next command is sent.
+    """
+    def on_context_created(params):
+        context = params.get("context", {})
+        aux = context.get("auxData", {})
+        if aux.get("isDefault") and aux.get("frameId") in (session.target_id, None):
+            session.context_id = context.get("id")
+
+    def on_binding_called(params):
+        if params.get("name") == "__ytcReady":
+            session.helper_context = params.get("executionContextId")
+            session.helper_version = params.get("payload")
+
+    session.subscribe("Runtime.executionContextCreated", on_context_created)
+    session.subscribe("Runtime.bindingCalled", on_binding_called)
+    session.send("Runtime.enable")
+    if Controller.use_helper:
+        session.send("Runtime.addBinding", {"name": "__ytcReady"})
+        session.send("Runtime.addBinding", {"name": "__ytcActive"})
+        session.send("Runtime.addBinding", {"name": "__ytcState"})
+        session.send("Page.addScriptToEvaluateOnNewDocument", {"source": Commands.helper_script()})
+        inject_helper(session)
+
+def inject_helper(session):
+    """Evaluate the page helper in the current page context."""
+    session.helper_context = session.context_id
+    session.helper_version = Commands.helper_version()
     try:
-        ws.send(json.dumps({
-            "id": 1,
-            "method": "Runtime.evaluate",
-            "params": {"expression": expr}
-        }))
-        print_command_result(command)
-        return True
-    except WebSocketException as e:
-        print_msg(f"{RED}ERROR: Failed to execute command: {command}{RESET}")
+        session.send("Runtime.evaluate", {"expression": Commands.helper_script()})
+    except WebSocketException:
+        pass  # The command sent right after it reports the broken connection
+
+def command_expression(session, command, args):
+    """Gets the JS to send for a command: a short helper call, or the full source without helper."""
+    if command in Macros.macros:
+        return Macros.expression(session, command, args.get("batch", 0))
+    if not Controller.use_helper:
+        return Commands.get(command, **args)
+    if (session.helper_context != session.context_id
+            or session.helper_version != Commands.helper_version()):
+        inject_helper(session)
+    return Commands.call(command, **args)
+
+def send_ws_command(session, expr, command):
+    """Send the evaluated JS expression over the CDP session; the reply is handled later.
+
+    A command that could not be written because the connection is gone never reached
+    the page, so it is queued again (once) and sent after the tab is reconnected.
+    """
+    try:
+        command.js_size = len(expr)
+        future = session.send("Runtime.evaluate", {"expression": expr, "returnByValue": True})
+        command.mark("sent")
+    except (WebSocketException, OSError) as e:
+        if not command.replayed and not command.retried:
+            command.replayed = True
+            Metrics.count("replayed")
+            print_msg(f"{YELLOW}Connection to tab {session.target_id} lost, "
+                      f"resending {command.name} once it is back{RESET}")
+            Controller.command_queue.requeue(command)
+            return False
+        command.finish(False, f"WebSocket error: {e}")
+        print_msg(f"{RED}ERROR: Failed to execute command: {command.name}{RESET}")
         print_msg(f"{YELLOW}WebSocket error: {str(e)}{RESET}")
         return False
     except (TypeError, ValueError) as e:
-        print_msg(f"{RED}ERROR: Failed to serialize command JSON: {command}{RESET}")
+        command.finish(False, f"Failed to serialize command JSON: {e}")
+        print_msg(f"{RED}ERROR: Failed to serialize command JSON: {command.name}{RESET}")
         print_msg(f"{YELLOW}Exception: {str(e)}{RESET}")
         return False
+    future.add_done_callback(lambda f: handle_command_reply(session, expr, command, f))
+    return True
+
+def cdp_error(reply):
+    """Get the error text of a CDP reply, including exceptions thrown by evaluated JS."""
+    if "error" in reply:
+        return reply["error"].get("message", "CDP error")
+    details = reply.get("result", {}).get("exceptionDetails")
+    if details:
+        return details.get("exception", {}).get("description") or details.get("text", "exception")
+    return None
+
+def handle_command_reply(session, expr, command, future):
+    """Finish a command once Chrome has replied to it, and log the outcome.
 
-def print_command_result(command):
+    A helper call that failed because the page lost its helper (e.g. it was reloaded
+    before the new-document script ran) is retried once after re-injecting the helper.
+    """
+    try:
+        reply, rtt = future.result()
+        command.mark("replied")
+    except ConnectionError as e:
+        command.finish(False, f"WebSocket error: {e}")
+        print_msg(f"{RED}ERROR: No reply for command: {command.name} ({e}){RESET}")
+        return
+    error = cdp_error(reply)
+    if error and "__ytc" in error and expr.startswith("__ytc.") and not command.retried:
+        command.retried = True
+        session.helper_context = None
+        inject_helper(session)
+        send_ws_command(session, expr, command)
+        return
+    command.finish(error is None, error, rtt)
+    if error:
+        print_msg(f"{RED}ERROR: Command {command.name} failed: {error}{RESET}")
+        return
+    if "navigator" in command.name:
+        track_navigator(reply.get("result", {}).get("result", {}).get("value"))
+    print_command_result(command.name, command.args)
+
+def track_navigator(state):
+    """Remember the video selected in the page's video navigator, from a navigator command's
+    reply."""
+    if isinstance(state, dict):
+        selected = state.get("selected") or {}
+        Controller.selected_video = selected.get("title") or selected.get("id")
+
+def format_position(seconds):
+    """Format a position in seconds as m:ss or h:mm:ss."""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{secs:02}" if hours else f"{minutes}:{secs:02}"
+
+def print_command_result(command, args=None):
     """Print a status message based on the executed command."""
-    skip = Controller.skip_seconds
+    args = args or {}
+    skip = args.get("skip_seconds", Controller.skip_seconds)
     selected = Controller.selected_video
 
     messages = {
         "skip_forward": f"Skipped {BLUE}forward {skip}{RESET} seconds",
         "skip_backward": f"Skipped {BLUE}backward {skip}{RESET} seconds",
+        "skip": f"Skipped {BLUE}{'backward' if skip < 0 else 'forward'} {abs(skip)}{RESET} seconds",
+        "rate": f"Set playback rate to {BLUE}{args.get('rate', 1)}x{RESET}",
+        "volume": f"Set volume to {BLUE}{args.get('volume', 100)}%{RESET}",
         "quality_up": f"{BLUE}Increased{RESET} video quality",
         "quality_down": f"{BLUE}Decreased{RESET} video quality",
+        "quality": f"Set video quality to {BLUE}{args.get('target', 'auto')}{RESET}",
         "cc": f"Toggled {BLUE}Closed Captions{RESET} (CC)",
         "fullscreen": f"Toggled {BLUE}Fullscreen{RESET}",
         "theater": f"Toggled {BLUE}theater Mode{RESET}",
         "restart": f"Restarted {BLUE}video{RESET}",
+        "pause": f"{BLUE}Paused{RESET} video",
         "next_chapter": f"Skipped to {BLUE}next{RESET} chapter",
+        "chapter": f"Jumped to {BLUE}chapter {args.get('index', 1)}{RESET}",
+        "seek": f"Jumped to {BLUE}{format_position(args.get('position', 0))}{RESET}",
         "prev_chapter": f"Skipped to {BLUE}previous{RESET} chapter",
         "progress_bar": f"Toggled {BLUE}progress bar{RESET} visibility",
         "video_navigator": f"Toggled {BLUE}video navigator{RESET}",
@@ -482,12 +2662,15 @@ def print_command_result(command):
         "navigator_right": f"Moved {BLUE}right{RESET} in navigator",
     }
 
+    if command in Macros.macros:
+        print_msg(Macros.describe(command, args.get("batch", 0)))
+        return
     print_msg(messages.get(command, f"Executed command: {command}"))
 
 def socket_listener():
-    """Function to listen for commands from a socket and put them in the command queue."""
+    """Function to accept client connections and serve each one on its own thread."""
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.bind(("localhost", 65432))
+        s.bind((Controller.host, Controller.port))
         s.listen()
         while Controller.running:
             s.settimeout(1.0)  # Add timeout to allow periodic check of Controller.running
@@ -495,10 +2678,394 @@ def socket_listener():
                 conn, _ = s.accept()
             except socket.timeout:
                 continue
-            with conn:
-                data = conn.recv(1024)
-                if data:
-                    Controller.command_queue.put(data.decode())
+            threading.Thread(target=handle_client, args=(conn,), daemon=True).start()
+
+def handle_client(conn):
+    """Read newline-framed messages from a client and reply to each one.
+
+    A line starting with "{" is a versioned JSON frame (see handle_frame), anything
+    else is a bare command name that is acknowledged as soon as it is queued. A client
+    may keep its connection open and send any number of messages. Legacy clients that
+    send a single unterminated command and close are still accepted.
+    """
+    writer = ClientWriter(conn)
+    reply = writer.write
+
+    with conn:
+        conn.settimeout(None)
+        try:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with conn.makefile("rb") as reader:
+                for line in reader:
+                    message = line.decode(errors="replace").strip()
+                    if message.startswith("{"):
+                        handle_frame(message, reply)
+                    elif message:
+                        reply(handle_text_command(message, reply))
+        except OSError:
+            pass  # Client went away (connection reset) or was disconnected for not reading
+        finally:
+            PlaybackState.unsubscribe(reply)
+            writer.close(timeout=1.0)
+
+def handle_text_command(message, reply=None):
+    """Queue a bare command and return its acknowledgement line.
+
+    The command name may be followed by a value for its first parameter (e.g. "seek 12:34")
+    and by "@<tab id>", "@<browser>" or "@all" to pick the tab(s) it goes to. "stats" is
+    answered with "stats <json>" holding Metrics.snapshot(), and "state" with
+    "state <json>" holding PlaybackState.snapshot(). After "subscribe", every playback
+    state update is sent to the client as a "state <json>" line until "unsubscribe".
+    """
+    command, *rest = message.split()
+    if command == "stats" and not rest:
+        return f"stats {json.dumps(Metrics.snapshot())}"
+    if command == "state" and not rest:
+        return f"state {json.dumps(PlaybackState.snapshot())}"
+    if command in ("subscribe", "unsubscribe") and not rest and reply is not None:
+        if command == "subscribe":
+            PlaybackState.subscribe(reply)
+        else:
+            PlaybackState.unsubscribe(reply)
+        return f"ok {command}"
+    if not Commands.exists(command) and command not in Macros.macros:
+        print_msg(f"{YELLOW}WARNING: Received unknown command: {command}{RESET}")
+        return f"error unknown_command {command}"
+    tab = rest.pop()[1:] if rest and rest[-1].startswith("@") else None
+    params = list(Commands.PARAMETERS.get(command, {}))
+    if tab == "" or len(rest) > 1 or (rest and not params):
+        return f"error bad_arguments {message}"
+    try:
+        args = Commands.arguments(command, {params[0]: rest[0]} if rest else {})
+    except ValueError as e:
+        return f"error bad_arguments {e}"
+    queued = QueuedCommand(command, args, tab=tab)
+    TraceRecorder.watch(queued)
+    if not Controller.command_queue.put(queued):
+        return f"error queue_full {message}"
+    return f"ok {message}"
+
+def parse_frame(message):
+    """Parse a JSON frame into its request id and commands, raising FrameError if malformed.
+
+    Frame format (version 1), one per line:
+        {"v": 1, "id": <any>, "commands": [{"name": "skip_forward", "args": {"skip_seconds": 10}}]}
+    A frame with a single command may put "name" and "args" at the top level instead.
+    A "tab" (a tab id, a browser or "all") on the frame or on a command picks the tab(s)
+    it goes to.
+    """
+    try:
+        frame = json.loads(message)
+    except json.JSONDecodeError as e:
+        raise FrameError(f"malformed frame: {e}") from e
+    if not isinstance(frame, dict):
+        raise FrameError("malformed frame: expected an object")
+    request_id = frame.get("id")
+    if frame.get("v") != PROTOCOL_VERSION:
+        raise FrameError(f"unsupported protocol version: {frame.get('v')!r}", request_id)
+
+    entries = frame["commands"] if "commands" in frame else [frame]
+    if not isinstance(entries, list) or not entries:
+        raise FrameError("malformed frame: 'commands' must be a non-empty list", request_id)
+
+    frame_tab = frame.get("tab")
+    commands = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not isinstance(entry.get("name"), str):
+            raise FrameError("malformed frame: every command needs a 'name'", request_id)
+        name = entry["name"]
+        if not Commands.exists(name) and name not in Macros.macros:
+            raise FrameError(f"unknown command: {name}", request_id)
+        args = entry.get("args") or {}
+        if not isinstance(args, dict):
+            raise FrameError(f"malformed frame: 'args' of {name} must be an object", request_id)
+        try:
+            args = Commands.arguments(name, args)
+        except ValueError as e:
+            raise FrameError(str(e), request_id) from e
+        tab = entry.get("tab", frame_tab)
+        if tab is not None and not isinstance(tab, str):
+            raise FrameError(f"malformed frame: 'tab' of {name} must be a string", request_id)
+        commands.append(QueuedCommand(name, args, request_id, tab))
+    return request_id, commands
+
+def handle_frame(message, reply):
+    """Queue the commands of a JSON frame and reply once all of them have been dispatched.
+
+    The reply is sent from whichever thread finishes the last command, so a client can
+    pipeline frames on one connection. Replies look like:
+        {"v": 1, "id": <id>, "ok": true, "ms": 1.2, "results": [{"name": ..., "ok": ..., ...}]}
+    """
+    try:
+        request_id, commands = parse_frame(message)
+    except FrameError as e:
+        reply(json.dumps({"v": PROTOCOL_VERSION, "id": e.request_id, "ok": False, "error": str(e)}))
+        return
+
+    start = time.perf_counter()
+    remaining = itertools.count(len(commands) - 1, -1)
+
+    def on_done(_future):
+        if next(remaining) != 0:
+            return
+        results = [command.future.result() for command in commands]
+        reply(json.dumps({
+            "v": PROTOCOL_VERSION,
+            "id": request_id,
+            "ok": all(result["ok"] for result in results),
+            "ms": round((time.perf_counter() - start) * 1000, 3),
+            "results": results,
+        }))
+
+    for command in commands:
+        TraceRecorder.watch(command)
+        Controller.command_queue.put(command)
+    for command in commands:
+        command.future.add_done_callback(on_done)
+
+
+### Asyncio Event Core ###
+
+class AsyncCommandQueue(CommandQueue):
+    """Stands in for Controller.command_queue when the asyncio event core runs.
+
+    put() may be called from any thread (socket clients, tray, log viewer) and applies
+    the same policies, then wakes the event loop; an "exit" command also wakes every
+    coroutine waiting on the stopping event so shutdown is immediate.
+    """
+
+    def __init__(self, loop, stopping):
+        super().__init__()
+        self.loop = loop
+        self.stopping = stopping
+        self.ready = asyncio.Event()
+
+    def put(self, command) -> bool:
+        """Queue a command from any thread, returning False if it was rejected"""
+        admitted = super().put(command)
+        if command.name == "exit":
+            self.loop.call_soon_threadsafe(self.stopping.set)
+        return admitted
+
+    def _wake(self):
+        self.loop.call_soon_threadsafe(self.ready.set)
+
+    async def get(self):  # pylint: disable=invalid-overridden-method,arguments-differ
+        """Wait for the next command that has not expired"""
+        while True:
+            with self.condition:
+                command = self._pop()
+                if command is None:
+                    self.ready.clear()
+            if command is None:
+                await self.ready.wait()
+            elif not self.expire(command):
+                return command
+
+async def wait_or_exit_async(stopping, duration):
+    """Wait for a duration, returning False as soon as the controller is stopping."""
+    try:
+        await asyncio.wait_for(stopping.wait(), duration)
+    except asyncio.TimeoutError:
+        return True
+    return False
+
+async def fetch_tabs_async():
+    """Coroutine version of fetch_tabs: fetches the tab lists on worker threads"""
+    return await asyncio.to_thread(fetch_tabs)
+
+async def find_youtube_tabs_async(stopping):
+    """Coroutine version of find_youtube_tabs"""
+    print_msg("Fetching YouTube WebSocket URL...", no_time_prefix=True)
+    deadline = time.time() + 600  # 10 minutes
+
+    while not stopping.is_set():
+        Controller.command_queue.expire_waiting()
+        if time.time() > deadline:
+            print_msg(f"{RED}ERROR: No YouTube video tab found after 10 minutes. Exiting...{RESET}")
+            on_quit(None) # Exit the application
+            return []
+
+        watcher = get_tab_watcher()
+        if watcher and (watcher.ready() or await asyncio.to_thread(watcher.connect)):
+            version = watcher.version
+            tabs, retry_delay = select_youtube_tabs(watcher.snapshot())
+            if tabs:
+                return tabs
+            await wait_for_tab_change_async(watcher, version, stopping, retry_delay)
+            continue
+
+        try:
+            tabs, retry_delay = select_youtube_tabs(await fetch_tabs_async())
+            if tabs:
+                return tabs
+        except (OSError, ValueError) as e:
+            print_msg(
+                f"{RED}ERROR: Error fetching YouTube WebSocket URL."
+                f"Is Chrome running with remote debugging?{RESET}",
+                no_time_prefix=True)
+            print_msg(f"{RED}Exception: {str(e)}{RESET}")
+            retry_delay = 2
+        if not await wait_or_exit_async(stopping, retry_delay):
+            return []
+    return []
+
+async def wait_for_tab_change_async(watcher, version, stopping, timeout):
+    """Coroutine version of TabWatcher.wait_for_change that also returns when stopping"""
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+
+    def listener():
+        loop.call_soon_threadsafe(changed.set)
+
+    watcher.listeners.append(listener)
+    waiters = (asyncio.create_task(changed.wait()), asyncio.create_task(stopping.wait()))
+    try:
+        if watcher.version == version:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.listeners.remove(listener)
+        for waiter in waiters:
+            waiter.cancel()
+
+async def wait_for_capacity_async(session):
+    """Coroutine version of CdpSession.wait_for_capacity"""
+    while not session.closed and session.in_flight() >= Controller.pipeline_depth:
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(session.oldest())), Controller.cdp_timeout)
+        except asyncio.TimeoutError:
+            session.close("no reply from Chrome")
+        except ConnectionError:
+            pass
+    return not session.closed
+
+async def send_command_loop_async(stopping):
+    """Coroutine version of send_command_loop"""
+    loop = asyncio.get_running_loop()
+
+    def attach(session):
+        loop.call_soon_threadsafe(loop.add_reader, session.fileno, session.read_ready)
+
+    def detach(session):
+        def remove():
+            loop.remove_reader(session.fileno)
+            session.ws.close()
+        loop.call_soon_threadsafe(remove)
+
+    pool = TabPool(attach, detach)
+    coalescer = CommandCoalescer()
+    pinger = asyncio.create_task(heartbeat_loop_async(stopping))
+    failures = 0
+    try:
+        while not stopping.is_set():
+            tabs = await find_youtube_tabs_async(stopping)
+            if tabs:
+                await asyncio.to_thread(pool.sync, tabs)
+            if not pool.sessions:
+                failures += 1
+                delay = TabPool.backoff(failures)
+                if not tabs:
+                    print_msg(f"{YELLOW}WARNING: YouTube WebSocket URL not found. "
+                              f"Retrying in {delay:.1f}s.{RESET}")
+                if not await wait_or_exit_async(stopping, delay):
+                    return
+                continue
+            failures = 0
+            announce_tabs(pool)
+
+            while True:
+                Metrics.queue_depth()
+                command = await coalescer.take_async()
+                if command is None:
+                    continue
+                command.mark("taken")
+                if command.name == "exit":
+                    return
+                if command.name == "heartbeat":
+                    await asyncio.to_thread(pool.heartbeat)
+                    continue
+                command = Macros.start(command)
+                if command is None:
+                    continue  # The macro starts with a wait
+
+                if pool.stale():
+                    await asyncio.to_thread(pool.refresh)
+                for tab in pool.missing(command):
+                    await asyncio.to_thread(pool.connect, tab)
+                targets = pool.route(command)
+                if targets is None:
+                    coalescer.release(command)  # Send it once a tab is found again
+                    break
+                for session, target_command in targets:
+                    if await wait_for_capacity_async(session):
+                        send_to_tab(pool, session, target_command)
+                    else:
+                        chrome_stopped_replying(pool, session, target_command)
+    finally:
+        pinger.cancel()
+        pool.close()
+
+async def heartbeat_loop_async(stopping):
+    """Coroutine version of heartbeat_loop"""
+    while Controller.ping_interval > 0 and await wait_or_exit_async(stopping,
+                                                                     Controller.ping_interval):
+        watcher = Controller.tab_watcher
+        if watcher and watcher.ready() and watcher.missing():
+            await asyncio.to_thread(watcher.connect)
+        TabPool.wake()
+
+async def handle_client_async(reader, writer):
+    """Coroutine version of handle_client"""
+    writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    loop = asyncio.get_running_loop()
+
+    def write(data):
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > Controller.client_backlog * 1024:
+            print_msg(f"{YELLOW}WARNING: Disconnecting a client that stopped reading.{RESET}")
+            writer.transport.abort()
+            return
+        writer.write(data)
+
+    def reply(text):
+        # Replies come from the reader threads and the tray too; the writer is the loop's
+        loop.call_soon_threadsafe(write, f"{text}\n".encode())
+
+    try:
+        while line := await reader.readline():
+            message = line.decode(errors="replace").strip()
+            if message.startswith("{"):
+                handle_frame(message, reply)
+            elif message:
+                reply(handle_text_command(message, reply))
+    except (ConnectionError, ValueError):
+        pass  # Client went away, or sent a line longer than the stream limit
+    except asyncio.CancelledError:
+        pass  # Shutting down with the client still connected
+    finally:
+        PlaybackState.unsubscribe(reply)
+        writer.close()
+
+async def async_main():
+    """Run the listener and the WebSocket connection as coroutines on one event loop.
+
+    The tray icon and the log viewer keep their own threads and reach the loop through
+    the AsyncCommandQueue that replaces Controller.command_queue.
+    """
+    stopping = asyncio.Event()
+    Controller.command_queue = AsyncCommandQueue(asyncio.get_running_loop(), stopping)
+    server = await asyncio.start_server(handle_client_async, Controller.host, Controller.port)
+    setup_tray()
+
+    async with server:
+        sender = asyncio.create_task(send_command_loop_async(stopping))
+        await asyncio.wait(
+            (sender, asyncio.create_task(stopping.wait())),
+            return_when=asyncio.FIRST_COMPLETED)
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
 
 
 ### System Tray Functions ###
@@ -507,7 +3074,9 @@ def on_quit(icon):
     """Function to handle quitting the application."""
     print_msg(f"{RED}Closing YouTubeController...{RESET}", space_before=True)
     Controller.running = False
-    Controller.command_queue.put("exit")
+    Controller.command_queue.put(QueuedCommand("exit"))
+    if Controller.tab_watcher:
+        Controller.tab_watcher.wake()
     if icon is not None:
         icon.stop()
 
@@ -521,6 +3090,7 @@ def set_skip_seconds(icon, menu_item):
 
 def build_tray_menu():
     """Function to build the system tray menu."""
+    from pystray import Menu, MenuItem as item  # pylint: disable=import-outside-toplevel
     skip_menu = tuple(
         item(
             f"{secs}s{' (default)' if secs == 5 else ''}",
@@ -541,10 +3111,26 @@ def build_tray_menu():
         ),
         Menu.SEPARATOR,
         item("🪟 Show/Hide Log Window", toggle_log_viewer),
+        item("📊 Print Latency Stats", print_stats),
         Menu.SEPARATOR,
         item("❌ Quit", on_quit)
     )
 
+def print_stats():
+    """Print the command counters and latency percentiles to the log."""
+    stats = Metrics.snapshot()
+    print_msg(
+        f"{BLUE}Stats:{RESET} {stats['commands']} commands, {stats['failed']} failed, "
+        f"{stats['dropped']} dropped ({stats['rejected']} rejected, {stats['evicted']} evicted, "
+        f"{stats['expired']} expired), {stats['merged']} merged, {stats['superseded']} superseded, "
+        f"{stats['reconnects']} reconnects ({stats['replayed']} replayed), "
+        f"queue {stats['queue_depth']} (max {stats['max_queue_depth']})", no_time_prefix=True)
+    for stage, latency in stats["latency_ms"].items():
+        print_msg(
+            f"  {stage:<7}p50 {latency['p50']:8.2f} ms  p95 {latency['p95']:8.2f} ms  "
+            f"p99 {latency['p99']:8.2f} ms  {GREY}({latency['count']} samples){RESET}",
+            no_time_prefix=True)
+
 def resource_path(relative_path):
     """Get the absolute path to a resource, works for both development and PyInstaller bundle."""
     if hasattr(sys, '_MEIPASS'):  # pylint: disable=protected-access
@@ -553,23 +3139,87 @@ def resource_path(relative_path):
 
 def get_icon_image():
     """Returns the icon.ico for the"""
+    from PIL import Image  # pylint: disable=import-outside-toplevel
     return Image.open(resource_path("icon.ico"))
 
 def setup_tray():
-    """Function to set up the system tray icon and menu."""
-    icon = Icon("icon")
-    icon.icon = get_icon_image()
-    icon.menu = build_tray_menu()
+    """Function to set up the system tray icon and menu, unless running headless."""
+    if Controller.headless:
+        return
+    try:
+        from pystray import Icon  # pylint: disable=import-outside-toplevel
+        icon = Icon("icon")
+        icon.icon = get_icon_image()
+        icon.menu = build_tray_menu()
+    except Exception as e:  # pylint: disable=broad-except
+        # pystray and Pillow may be missing, or there may be no desktop to show an icon on
+        print_msg(f"{YELLOW}WARNING: No tray icon, running headless ({e}){RESET}")
+        Controller.headless = True
+        return
     threading.Thread(target=icon.run, daemon=True).start()
 
 
 ### Main Application Logic ###
 
+def release_single_instance():
+    """Release and remove the lock file taken by check_single_instance."""
+    if Controller.lockfile_handle:
+        try:
+            lock_file(Controller.lockfile_handle, lock=False)
+            Controller.lockfile_handle.close()
+            os.remove(Controller.lockfile)
+        except OSError:
+            pass
+
+def parse_args(argv):
+    """Parse the command line and apply the settings to Controller."""
+    parser = argparse.ArgumentParser(description="Control YouTube in Chrome over DevTools.")
+    parser.add_argument("--asyncio", action="store_true",
+                        help="run on the asyncio event core instead of polling threads")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without the tray icon and log window (stop with Ctrl+C)")
+    parser.add_argument("--devtools", action="append", type=devtools_endpoint, metavar="ENDPOINT",
+                        help="DevTools endpoint of a browser as a URL, host:port or port; "
+                             "repeat for several browsers (default: localhost:9222)")
+    parser.add_argument("--host", default=Controller.host,
+                        help=f"address to listen for commands on (default: {Controller.host})")
+    parser.add_argument("--port", type=int, default=Controller.port,
+                        help=f"port to listen for commands on (default: {Controller.port})")
+    parser.add_argument("--coalesce", type=float, default=Controller.coalesce_window * 1000,
+                        metavar="MS",
+                        help="merge seeks and toggles pressed within MS milliseconds "
+                             "(default: off)")
+    parser.add_argument("--ping-interval", type=float, default=Controller.ping_interval,
+                        metavar="S",
+                        help="ping the connected tabs every S seconds, 0 to stop (default: 2)")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="append every client command and its timings to PATH")
+    parser.add_argument("--log-file", metavar="PATH",
+                        help="also append the log to PATH, rotated at 1 MB")
+    parser.add_argument("--log-json", action="store_true",
+                        help="write the log file as JSON lines")
+    args = parser.parse_args(argv)
+    Controller.log_file = args.log_file
+    Controller.log_format = "json" if args.log_json else "text"
+    Controller.headless = args.headless
+    Controller.coalesce_window = max(args.coalesce, 0) / 1000
+    Controller.ping_interval = max(args.ping_interval, 0)
+    Controller.trace_file = args.trace
+    Controller.devtools_urls = list(dict.fromkeys(args.devtools or Controller.devtools_urls))
+    Controller.host = args.host
+    Controller.port = args.port
+    return args
+
 def main():
     """Main function to start the YouTubeController application."""
+    args = parse_args(sys.argv[1:])
     check_single_instance()
-    check_port_available(65432)
+    check_port_available(Controller.port)
+    Commands.preload()
     welcome_message()
+    if args.asyncio:
+        main_async()
+        return
     send_thread = threading.Thread(target=send_command_loop)
     socket_thread = threading.Thread(target=socket_listener)
     send_thread.start()
@@ -584,22 +3234,37 @@ def main():
             f"{RED}Exiting on Ctrl+C. {GREY}Please wait...{RESET}",
             no_time_prefix=True, space_before=True)
         Controller.running = False
-        Controller.command_queue.put("exit")
+        Controller.command_queue.put(QueuedCommand("exit"))
+        if Controller.tab_watcher:
+            Controller.tab_watcher.wake()
     finally:
         try:
-            with socket.create_connection(("localhost", 65432), timeout=0.1):
+            with socket.create_connection((Controller.host, Controller.port), timeout=0.1):
                 pass
         except (socket.timeout, ConnectionRefusedError, OSError):
             pass
         send_thread.join()
         socket_thread.join()
-        if Controller.lockfile_handle:
-            try:
-                msvcrt.locking(Controller.lockfile_handle.fileno(), msvcrt.LK_UNLCK, 1)
-                Controller.lockfile_handle.close()
-                os.remove(Controller.lockfile)
-            except OSError:
-                pass
+        release_single_instance()
+        TraceRecorder.flush()
+        LogWorker.flush()
+
+def main_async():
+    """Run the controller on the asyncio event core instead of polling threads."""
+    if os.name == "nt":
+        # The WebSocket reader is registered with add_reader, which needs a selector loop
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    try:
+        asyncio.run(async_main())
+    except KeyboardInterrupt:
+        print_msg(
+            f"{RED}Exiting on Ctrl+C. {GREY}Please wait...{RESET}",
+            no_time_prefix=True, space_before=True)
+    finally:
+        Controller.running = False
+        release_single_instance()
+        TraceRecorder.flush()
+        LogWorker.flush()
 
 if __name__ == "__main__":
     main()
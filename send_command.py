@@ -1,19 +1,57 @@
+"""
+Send commands to a running YoutubeController.
+
+Usage:
+    send_command.py <command> [<command> ...]
+        Send one or more commands over a single connection and wait for their acknowledgements.
+    send_command.py --stdin
+        Stay resident and send one command per input line over one persistent connection.
+        Every acknowledgement from the controller is printed on its own line.
+    send_command.py --stats
+        Print the controller's command counters and latency percentiles as JSON.
+    send_command.py --state
+        Print the last known playback state of every connected tab as JSON.
+    send_command.py --watch
+        Print every playback state update as a JSON line until interrupted.
+
+Use --host <address> and --port <port> to talk to a controller that listens elsewhere,
+and --tab <tab id> to send the commands to a specific YouTube tab (--tab all for every
+tab, --tab <host:port> for the last active tab of one browser). A line read with --stdin
+may pick its own tab with a trailing "@<tab id>". A command may carry one value for its
+first parameter, e.g. "seek 754", "skip -30", "rate 1.75", "volume 40" or "chapter 3",
+given as the next argument or quoted together with the command. The macros defined in
+macros.json are sent by name like commands.
+"""
+
+import argparse
+import json
+import os
 import socket
 import sys
 
+HOST = "localhost"
+PORT = 65432
+
 COMMANDS = (
     "skip_forward",
     "skip_backward",
+    "skip",
+    "seek",
+    "rate",
+    "volume",
     "quality_up",
     "quality_down",
+    "quality",
     "cc",
     "fullscreen",
     "theater",
     "restart",
+    "pause",
     "next_chapter",
     "prev_chapter",
+    "chapter",
     "progress_bar",
-    
+
     "video_navigator",
     "navigator_select",
     "navigator_layout",
@@ -23,12 +61,130 @@ COMMANDS = (
     "navigator_right",
     )
 
-if len(sys.argv) != 2 or sys.argv[1] not in COMMANDS:
-    sys.exit(1)
+MACRO_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "macros.json")
+
+
+def known_commands():
+    """Gets the commands and the names of the macros defined in macros.json."""
+    try:
+        with open(MACRO_FILE, "r", encoding="utf-8") as macro_file:
+            macros = json.load(macro_file)
+    except (OSError, ValueError):
+        return COMMANDS
+    return COMMANDS + tuple(macros) if isinstance(macros, dict) else COMMANDS
+
+
+def group_values(argv, commands=COMMANDS):
+    """Join each value to the command before it, e.g. ["seek", "754", "cc"] -> ["seek 754", "cc"].
+
+    Returns None if an argument is neither a command nor the value of the one before it.
+    """
+    grouped = []
+    for word in argv:
+        if (word.split() or [""])[0] in commands:
+            grouped.append(word)
+        elif grouped and " " not in grouped[-1]:
+            grouped[-1] = f"{grouped[-1]} {word}"
+        else:
+            return None
+    return grouped
+
+def send(sock, reader, command, tab=None):
+    """Send a single newline-framed command and return the controller's acknowledgement."""
+    if tab:
+        command = f"{command} @{tab}"
+    sock.sendall(f"{command}\n".encode())
+    return reader.readline().decode().strip()
+
+def run_resident(sock, reader, tab=None, commands=COMMANDS):
+    """Forward commands read from stdin until it closes, printing each acknowledgement."""
+    failed = False
+    for line in sys.stdin:
+        command = line.strip()
+        if not command:
+            continue
+        if (command.split() or [""])[0] not in commands:
+            print(f"error unknown_command {command}", flush=True)
+            failed = True
+            continue
+        ack = send(sock, reader, command, None if "@" in command else tab)
+        print(ack, flush=True)
+        failed |= not ack.startswith("ok")
+    return failed
+
+def run_watch(sock, reader):
+    """Subscribe to the playback state and print every update until the controller quits."""
+    if send(sock, reader, "subscribe") != "ok subscribe":
+        return True
+    try:
+        for line in reader:
+            kind, _, payload = line.decode().strip().partition(" ")
+            if kind == "state":
+                print(payload, flush=True)
+    except KeyboardInterrupt:
+        pass
+    return False
+
+def parse_args(argv, commands=COMMANDS):
+    """Parse the options, given in any order, and group the commands with their values."""
+    parser = argparse.ArgumentParser(
+        prog="send_command.py", description="Send commands to a running YoutubeController.")
+    parser.add_argument("--host", default=HOST, help=f"controller address (default: {HOST})")
+    parser.add_argument("--port", type=int, default=PORT,
+                        help=f"controller port (default: {PORT})")
+    parser.add_argument("--tab", help='tab id, "all", or the <host:port> of a browser')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--stdin", action="store_true",
+                      help="send one command per input line over one connection")
+    mode.add_argument("--stats", action="store_true",
+                      help="print the command counters and latency percentiles")
+    mode.add_argument("--state", action="store_true",
+                      help="print the playback state of every connected tab")
+    mode.add_argument("--watch", action="store_true",
+                      help="print every playback state update until interrupted")
+    parser.add_argument("commands", nargs="*", metavar="command",
+                        help="a command or macro, optionally followed by its value")
+    args = parser.parse_intermixed_args(argv)
+
+    if args.stdin or args.stats or args.state or args.watch:
+        if args.commands:
+            parser.error("commands cannot be combined with --stdin, --stats, --state or --watch")
+        return args
+    if not args.commands:
+        parser.error("no command given")
+    grouped = group_values(args.commands, commands)
+    if grouped is None:
+        parser.error(f"unknown command in: {' '.join(args.commands)}")
+    args.commands = grouped
+    return args
+
+def main(argv):
+    """Parse the arguments and send the commands."""
+    commands = known_commands()
+    args = parse_args(argv, commands)
+    query = "stats" if args.stats else "state" if args.state else None
+
+    try:
+        with socket.create_connection((args.host, args.port)) as s:
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with s.makefile("rb") as reader:
+                if query:
+                    reply = send(s, reader, query)
+                    print(reply.partition(" ")[2])
+                    failed = not reply.startswith(query)
+                elif args.watch:
+                    failed = run_watch(s, reader)
+                elif args.stdin:
+                    failed = run_resident(s, reader, args.tab, commands)
+                else:
+                    failed = False
+                    for command in args.commands:
+                        failed |= not send(s, reader, command, args.tab).startswith("ok")
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    return 1 if failed else 0
+
 
-try:
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.connect(("localhost", 65432))
-        s.sendall(sys.argv[1].encode())
-except Exception as e:
-    print(f"Error: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,31 @@
+"""Shared fixtures: the tests import controller.py and the fake Chrome of the benchmarks."""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import controller  # pylint: disable=wrong-import-position
+from controller import CommandQueue, Controller  # pylint: disable=wrong-import-position
+from fake_cdp import FakeChrome  # pylint: disable=wrong-import-position
+
+
+@pytest.fixture(autouse=True)
+def quiet_controller(monkeypatch):
+    """Silence the log and give every test its own command queue and settings."""
+    monkeypatch.setattr(controller, "print_msg", lambda *args, **kwargs: None)
+    monkeypatch.setattr(Controller, "command_queue", CommandQueue())
+    for name in ("queue_capacity", "command_ttl", "seek_ttl", "coalesce_window",
+                 "merged_commands", "skip_seconds", "use_helper"):
+        monkeypatch.setattr(Controller, name, getattr(Controller, name))
+
+@pytest.fixture
+def chrome():
+    """A running fake Chrome, stopped after the test."""
+    fake = FakeChrome().start()
+    yield fake
+    fake.stop()
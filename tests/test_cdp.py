@@ -0,0 +1,57 @@
+"""CdpSession against the fake Chrome: request ids, reply futures and events."""
+
+import concurrent.futures
+
+import pytest
+import websocket
+
+from controller import CdpSession, SessionReader, get_json
+
+VIDEO_URL = "https://www.youtube.com/watch?v=abc"
+
+
+@pytest.fixture(name="tab")
+def fixture_tab(chrome):
+    """A video tab of the fake Chrome."""
+    return chrome.open_tab(VIDEO_URL)
+
+@pytest.fixture(name="session")
+def fixture_session(chrome, tab):
+    """A CdpSession to the tab, read by its own SessionReader."""
+    info = next(entry for entry in get_json(chrome.devtools_url, 5) if entry["id"] == tab.id)
+    cdp = CdpSession(websocket.create_connection(info["webSocketDebuggerUrl"], timeout=5),
+                     tab.id)
+    reader = SessionReader()
+    reader.add(cdp)
+    yield cdp
+    cdp.close()
+    reader.remove(cdp)
+
+def test_every_reply_resolves_the_future_of_its_request(session, tab):
+    futures = [session.send("Runtime.evaluate", {"expression": str(number)})
+               for number in range(5)]
+    replies = [future.result(timeout=5)[0] for future in futures]
+    sent = {message["id"]: message["params"]["expression"] for message in tab.received}
+    assert [sent[reply["id"]] for reply in replies] == [str(number) for number in range(5)]
+    assert len({reply["id"] for reply in replies}) == 5
+    assert session.in_flight() == 0
+
+def test_round_trip_time_is_measured(session, tab):
+    tab.latency = 0.05
+    _reply, rtt = session.send("Runtime.evaluate", {"expression": "0"}).result(timeout=5)
+    assert rtt >= 0.05
+
+def test_events_go_to_their_subscribers(session):
+    contexts = concurrent.futures.Future()
+    session.subscribe("Runtime.executionContextCreated",
+                      lambda params: contexts.set_result(params["context"]))
+    session.send("Runtime.enable").result(timeout=5)
+    assert contexts.result(timeout=5)["auxData"]["frameId"] == session.target_id
+
+def test_lost_connection_fails_the_pending_requests(chrome, session, tab):
+    tab.latency = 0.5
+    future = session.send("Runtime.evaluate", {"expression": "0"})
+    chrome.disconnect(tab)
+    with pytest.raises(ConnectionError):
+        future.result(timeout=5)
+    assert session.closed and session.in_flight() == 0
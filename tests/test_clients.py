@@ -0,0 +1,82 @@
+"""Command socket clients served by handle_client."""
+
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from controller import Controller, PlaybackState, handle_client
+
+
+@pytest.fixture(name="connect")
+def fixture_connect():
+    """Connect clients to handle_client threads; returns a function giving the client socket.
+
+    The handler threads are kept in connect.handlers.
+    """
+    server = socket.create_server(("localhost", 0))
+    clients = []
+
+    def connect():
+        client = socket.create_connection(server.getsockname())
+        conn, _ = server.accept()
+        handler = threading.Thread(target=handle_client, args=(conn,), daemon=True)
+        handler.start()
+        connect.handlers.append(handler)
+        clients.append(client)
+        return client
+
+    connect.handlers = []
+    yield connect
+    for client in clients:
+        client.close()
+    server.close()
+
+def read_line(client):
+    data = b""
+    while not data.endswith(b"\n"):
+        data += client.recv(1)
+    return data.decode().strip()
+
+def test_client_that_stops_reading_does_not_hold_up_the_others(connect, monkeypatch):
+    monkeypatch.setattr(Controller, "client_backlog", 10)
+    stalled, other = connect(), connect()
+    for client in (stalled, other):
+        client.sendall(b"subscribe\n")
+        assert read_line(client) == "ok subscribe"
+    received = []
+
+    def read_all():
+        while data := other.recv(1 << 20):
+            received.append(data.count(b"\n"))
+
+    reader = threading.Thread(target=read_all)
+    reader.start()
+    start = time.monotonic()
+    for number in range(200):
+        PlaybackState._publish({"tab": "T", "padding": "x" * 65536, "n": number})
+        time.sleep(0.002)
+    assert time.monotonic() - start < 3
+    deadline = time.monotonic() + 5
+    while len(PlaybackState.subscribers) > 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(PlaybackState.subscribers) == 1  # The stalled client was disconnected
+    other.sendall(b"unsubscribe\n")
+    other.shutdown(socket.SHUT_WR)
+    reader.join(5)
+    assert sum(received) == 201  # Every update and the acknowledgement
+
+def test_client_reset_closes_its_handler_quietly(connect, monkeypatch):
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", errors.append)
+    client = connect()
+    client.sendall(b"subscribe\n")
+    assert read_line(client) == "ok subscribe"
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+    client.close()  # Sends a reset instead of a normal close
+    handler, = connect.handlers
+    handler.join(5)
+    assert not handler.is_alive()
+    assert not errors and not PlaybackState.subscribers
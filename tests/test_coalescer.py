@@ -0,0 +1,68 @@
+"""CommandCoalescer: bursts of seeks and toggles merged before they are sent."""
+
+import threading
+
+from controller import CommandCoalescer, Controller, QueuedCommand
+
+
+def test_seeks_merge_into_one_net_seek():
+    group = [QueuedCommand("skip_forward", {"skip_seconds": 10}),
+             QueuedCommand("skip_backward", {"skip_seconds": 5}),
+             QueuedCommand("skip_forward", {"skip_seconds": 10})]
+    merged = CommandCoalescer().merge(group)
+    assert (merged.name, merged.args) == ("skip_forward", {"skip_seconds": 15})
+    merged.finish(True)
+    assert all(command.future.result()["merged"] for command in group)
+
+def test_seeks_that_cancel_out_send_nothing():
+    group = [QueuedCommand("skip_forward", {"skip_seconds": 5}),
+             QueuedCommand("skip_backward", {"skip_seconds": 5})]
+    assert CommandCoalescer().merge(group) is None
+    assert all(command.future.result()["ok"] for command in group)
+
+def test_toggles_cancel_out_in_pairs():
+    coalescer = CommandCoalescer()
+    assert coalescer.merge([QueuedCommand("cc"), QueuedCommand("cc")]) is None
+    assert coalescer.merge([QueuedCommand("cc") for _ in range(3)]).name == "cc"
+
+def test_kind_includes_the_tab():
+    assert CommandCoalescer.kind(QueuedCommand("skip", tab="A")) == "seek@A"
+    assert CommandCoalescer.kind(QueuedCommand("cc")) == "cc"
+    assert CommandCoalescer.kind(QueuedCommand("restart")) is None
+
+def test_take_merges_a_burst_and_holds_the_next_command():
+    Controller.coalesce_window = 0.05
+    for command in (QueuedCommand("skip_forward"), QueuedCommand("skip_forward"),
+                    QueuedCommand("restart")):
+        Controller.command_queue.put(command)
+    coalescer = CommandCoalescer()
+    merged = coalescer.take()
+    assert (merged.name, merged.args) == ("skip_forward",
+                                          {"skip_seconds": 2 * Controller.skip_seconds})
+    assert coalescer.held.name == "restart"
+    assert coalescer.take().name == "restart"
+
+def test_release_puts_the_held_command_back_behind_the_unsent_one():
+    coalescer = CommandCoalescer()
+    coalescer.held = QueuedCommand("restart")
+    coalescer.release(QueuedCommand("theater"))
+    assert coalescer.held is None
+    assert [command.name for command in Controller.command_queue.waiting] == ["theater",
+                                                                             "restart"]
+
+def test_merged_presses_are_counted_from_every_thread():
+    Controller.merged_commands = 0
+
+    def press():
+        for _ in range(500):
+            Controller.command_queue.put(QueuedCommand("cc"))
+
+    threads = [threading.Thread(target=press) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    coalescer = CommandCoalescer()
+    for _ in range(500):
+        coalescer.merge([QueuedCommand("theater"), QueuedCommand("theater")])
+    for thread in threads:
+        thread.join()
+    assert Controller.merged_commands == 2000 + 1000
@@ -0,0 +1,103 @@
+"""Command arguments (Commands.PARAMETERS) and macro compilation (Macros.compile)."""
+
+import os
+import shutil
+
+import pytest
+
+from controller import Commands, Macros
+
+
+@pytest.mark.parametrize("command, args, expected", [
+    ("skip", {"skip_seconds": "-30"}, {"skip_seconds": -30}),
+    ("skip_forward", {"skip_seconds": 2.5}, {"skip_seconds": 2.5}),
+    ("rate", {"rate": "1.5x"}, {"rate": 1.5}),
+    ("volume", {"volume": "40%"}, {"volume": 40}),
+    ("quality", {"target": "1080P"}, {"target": "1080p"}),
+    ("chapter", {"index": "3"}, {"index": 3}),
+    ("seek", {"position": "1:02:03"}, {"position": 3723}),
+])
+def test_valid_arguments(command, args, expected):
+    assert Commands.arguments(command, args) == expected
+
+@pytest.mark.parametrize("command, args", [
+    ("skip", {"skip_seconds": float("nan")}),
+    ("skip", {"skip_seconds": "inf"}),
+    ("rate", {"rate": 32}),
+    ("volume", {"volume": 101}),
+    ("quality", {"target": "huge"}),
+    ("chapter", {"index": 0}),
+    ("seek", {"position": "-1"}),
+    ("seek", {"position": "nan"}),
+    ("skip", {"seconds": 5}),
+    ("cc", {"skip_seconds": 5}),
+])
+def test_invalid_arguments(command, args):
+    with pytest.raises(ValueError):
+        Commands.arguments(command, args)
+
+def test_macro_batches_split_at_waits():
+    batches = Macros.compile("test_macro", [
+        "theater", {"name": "volume", "args": {"volume": "50"}},
+        {"wait": 500}, {"wait": 250}, "cc"])
+    assert batches == [(0.0, [("theater", {}), ("volume", {"volume": 50})]),
+                       (0.75, [("cc", {})])]
+
+def test_macro_starting_with_a_wait_has_no_first_batch():
+    assert Macros.compile("test_macro", [{"wait": 100}, "cc"]) == [(0.1, [("cc", {})])]
+
+@pytest.mark.parametrize("name, steps", [
+    ("cc", ["theater"]),
+    ("test_macro", []),
+    ("test_macro", ["no_such_command"]),
+    ("test_macro", [{"wait": -1}]),
+    ("test_macro", [{"wait": 100}, {"wait": 200}]),
+    ("test_macro", [{"name": "volume", "args": {"volume": 500}}]),
+])
+def test_bad_macros_are_rejected(name, steps):
+    with pytest.raises(ValueError):
+        Macros.compile(name, steps)
+
+@pytest.fixture(name="js_dir")
+def fixture_js_dir(tmp_path, monkeypatch):
+    """A copy of the JS command files that the test may edit, loaded from scratch."""
+    source = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          Commands.JS_COMMAND_PATH)
+    for filename in os.listdir(source):
+        shutil.copy(os.path.join(source, filename), tmp_path)
+    monkeypatch.setattr(Commands, "JS_COMMAND_PATH", str(tmp_path))
+    monkeypatch.setattr(Commands, "templates", {})
+    monkeypatch.setattr(Commands, "problems", [])
+    monkeypatch.setattr(Commands, "RELOAD_INTERVAL", 0.0)
+    Commands.preload()
+    return tmp_path
+
+def edit(path, text):
+    """Rewrite a file so that its modification time changes."""
+    path.write_text(text, encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_edited_template_is_reloaded(js_dir):
+    assert not Commands.problems
+    edit(js_dir / "progress_bar.js", "// edited")
+    assert Commands.get("progress_bar") == "// edited"
+
+@pytest.mark.parametrize("text", ["return ${nope};", "cost = $5;"])
+def test_malformed_edit_keeps_the_last_good_template(js_dir, text):
+    good = Commands.get("quality", target="up", steps=1)
+    edit(js_dir / "quality.js", text)
+    assert Commands.get("quality", target="up", steps=1) == good
+    assert "__ytc" in Commands.helper_script()
+    assert any("quality.js" in problem for problem in Commands.problems)
+    edit(js_dir / "quality.js", "// fixed ${target} ${steps}")
+    assert Commands.get("quality", target="up", steps=1) == '// fixed "up" 1'
+    assert not Commands.problems
+
+def test_malformed_template_at_start_disables_only_its_commands(js_dir):
+    Commands.templates.clear()
+    edit(js_dir / "chapters.js", "${")
+    assert any("chapters.js" in problem for problem in Commands.preload())
+    assert Commands.get("chapter", index=1, step=0, position=-1) is None
+    assert Commands.get("cc") is not None
+    assert "chapter(args)" not in Commands.helper_script()
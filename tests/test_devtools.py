@@ -0,0 +1,55 @@
+"""DevTools endpoints: --devtools values and the tab lists of several browsers."""
+
+import asyncio
+
+import pytest
+
+from controller import Controller, browser_name, devtools_endpoint, fetch_tabs, fetch_tabs_async
+from fake_cdp import FakeChrome
+
+VIDEO_URL = "https://www.youtube.com/watch?v=abc"
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("9223", "http://localhost:9223/json"),
+    ("127.0.0.1:9224", "http://127.0.0.1:9224/json"),
+    ("http://localhost:9222", "http://localhost:9222/json"),
+    ("http://localhost:9222/json/list", "http://localhost:9222/json/list"),
+])
+def test_endpoint_forms(value, expected):
+    assert devtools_endpoint(value) == expected
+
+@pytest.mark.parametrize("value", ["localhost", "http://localhost/json", "99999"])
+def test_endpoint_without_a_valid_port_is_rejected(value):
+    with pytest.raises(ValueError):
+        devtools_endpoint(value)
+
+def test_browser_is_named_by_its_endpoint():
+    assert browser_name("http://localhost:9223/json") == "localhost:9223"
+
+@pytest.fixture(name="browsers")
+def fixture_browsers(chrome, monkeypatch):
+    """The fake Chrome and a second fake browser, both in Controller.devtools_urls."""
+    other = FakeChrome().start()
+    monkeypatch.setattr(Controller, "devtools_urls", [chrome.devtools_url, other.devtools_url])
+    yield chrome, other
+    other.stop()
+
+def test_tabs_of_every_browser_are_tagged_with_it(browsers):
+    tabs = {browser.open_tab(VIDEO_URL).id: browser_name(browser.devtools_url)
+            for browser in browsers}
+    assert {tab["id"]: tab["browser"] for tab in fetch_tabs()} == tabs
+
+def test_one_browser_down_leaves_the_others(chrome, monkeypatch):
+    tab = chrome.open_tab(VIDEO_URL)
+    monkeypatch.setattr(Controller, "devtools_urls",
+                        [chrome.devtools_url, "http://127.0.0.1:9/json"])
+    assert [entry["id"] for entry in fetch_tabs()] == [tab.id]
+    monkeypatch.setattr(Controller, "devtools_urls", ["http://127.0.0.1:9/json"])
+    with pytest.raises(OSError):
+        fetch_tabs()
+
+def test_async_fetch_gives_the_same_tabs(browsers):
+    for browser in browsers:
+        browser.open_tab(VIDEO_URL)
+    assert asyncio.run(fetch_tabs_async()) == fetch_tabs()
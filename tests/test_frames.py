@@ -0,0 +1,49 @@
+"""JSON frames on the command socket: parsing and the replies (see handle_frame)."""
+
+import json
+
+from controller import Controller, handle_frame
+
+
+def send_frame(frame):
+    """Handle a frame; returns the replies sent so far (a list that fills up later)."""
+    replies = []
+    handle_frame(frame if isinstance(frame, str) else json.dumps(frame),
+                 lambda text: replies.append(json.loads(text)))
+    return replies
+
+def test_reply_comes_once_every_command_finished():
+    replies = send_frame({"v": 1, "id": 7, "commands": [
+        {"name": "cc"}, {"name": "skip", "args": {"skip_seconds": -5}, "tab": "all"}]})
+    first, second = Controller.command_queue.get(), Controller.command_queue.get()
+    assert (second.name, second.args, second.tab) == ("skip", {"skip_seconds": -5}, "all")
+    first.finish(True)
+    assert not replies
+    second.finish(False, "no tab")
+    assert len(replies) == 1
+    reply = replies[0]
+    assert (reply["v"], reply["id"], reply["ok"]) == (1, 7, False)
+    assert [(result["name"], result["error"]) for result in reply["results"]] == [
+        ("cc", None), ("skip", "no tab")]
+
+def test_single_command_frame():
+    replies = send_frame({"v": 1, "id": "a", "name": "volume", "args": {"volume": "30%"}})
+    command = Controller.command_queue.get()
+    assert (command.name, command.args, command.request_id) == ("volume", {"volume": 30}, "a")
+    command.finish(True)
+    assert replies[0]["ok"] and replies[0]["id"] == "a"
+
+def test_expired_command_is_reported():
+    replies = send_frame({"v": 1, "id": 9, "name": "restart"})
+    Controller.command_queue.waiting[0].received -= Controller.command_ttl + 1
+    Controller.command_queue.expire_waiting()
+    assert replies[0]["results"][0]["error"] == "expired in the queue"
+
+def test_malformed_frames_are_answered_at_once():
+    assert send_frame("{not json")[0]["error"].startswith("malformed frame")
+    assert send_frame({"v": 2, "id": 1, "name": "cc"})[0] == {
+        "v": 1, "id": 1, "ok": False, "error": "unsupported protocol version: 2"}
+    assert send_frame({"v": 1, "id": 2, "name": "nope"})[0]["error"] == "unknown command: nope"
+    bad = send_frame({"v": 1, "id": 3, "name": "chapter", "args": {"index": 0}})[0]
+    assert bad["error"] == "invalid value for index: 0"
+    assert Controller.command_queue.qsize() == 0
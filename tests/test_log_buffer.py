@@ -0,0 +1,47 @@
+"""LogBuffer: the log ring buffer and the changes a reader fetches with since()."""
+
+from controller import LogBuffer
+
+
+def lines(entries):
+    return [line for _seq, line, _first in entries]
+
+def test_reader_gets_only_the_new_lines():
+    buffer = LogBuffer(capacity=10)
+    buffer.append("one")
+    buffer.append("two")
+    reset, entries, seq = buffer.since(0)
+    assert (reset, lines(entries)) == (False, ["one", "two"])
+    buffer.append("three")
+    assert buffer.since(seq) == (False, [(3, "three", 3)], 3)
+    assert buffer.since(3) == (False, [], 3)
+
+def test_rewritten_last_line_is_fetched_again():
+    buffer = LogBuffer(capacity=10)
+    buffer.append("Connected")
+    buffer.append("skip")
+    _reset, _entries, seq = buffer.since(0)
+    buffer.replace_last("skip (x2)")
+    reset, entries, _seq = buffer.since(seq)
+    assert not reset and entries == [(3, "skip (x2)", 2)]
+    assert buffer.lines() == ["Connected", "skip (x2)"]
+
+def test_reader_that_fell_behind_starts_over():
+    buffer = LogBuffer(capacity=3)
+    buffer.append("a")
+    _reset, _entries, seq = buffer.since(0)
+    for line in "bcde":
+        buffer.append(line)
+    reset, entries, seq = buffer.since(seq)
+    assert (reset, lines(entries), seq) == (True, ["c", "d", "e"], 5)
+    assert buffer.since(seq - 1) == (False, [(5, "e", 5)], 5)  # Still in the buffer
+
+def test_clear_makes_every_reader_start_over():
+    buffer = LogBuffer(capacity=3)
+    buffer.append("a")
+    _reset, _entries, seq = buffer.since(0)
+    buffer.clear()
+    buffer.append("b")
+    reset, entries, _seq = buffer.since(seq)
+    assert reset and lines(entries) == ["b"]
+    assert len(buffer) == 1 and buffer[0] == "b"
@@ -0,0 +1,40 @@
+"""Metrics: stage timings of finished commands and their percentiles."""
+
+import pytest
+
+from controller import Metrics, QueuedCommand
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    """Start every test with no samples and zeroed counters."""
+    monkeypatch.setattr(Metrics, "samples", {})
+    monkeypatch.setattr(Metrics, "counters", dict.fromkeys(Metrics.counters, 0))
+
+@pytest.mark.parametrize("fraction, expected", [(0.0, 1), (0.5, 51), (0.95, 96), (0.99, 100),
+                                                 (1.0, 100)])
+def test_nearest_rank_percentile(fraction, expected):
+    assert Metrics.percentile(list(range(1, 101)), fraction) == expected
+
+def test_snapshot_gives_percentiles_in_milliseconds():
+    for sample in range(1, 101):
+        Metrics.sample("recover", sample / 1000)
+    assert Metrics.snapshot()["latency_ms"]["recover"] == {
+        "count": 100, "p50": 51.0, "p95": 96.0, "p99": 100.0}
+
+def test_only_the_last_window_of_samples_is_kept(monkeypatch):
+    monkeypatch.setattr(Metrics, "WINDOW", 10)
+    for sample in range(100):
+        Metrics.sample("recover", sample)
+    assert sorted(Metrics.samples["recover"]) == list(range(90, 100))
+
+def test_command_is_timed_per_stage():
+    command = QueuedCommand("cc")
+    for stage, offset in (("taken", 0.1), ("built", 0.3), ("sent", 0.6)):
+        command.stages[stage] = command.received + offset
+    Metrics.record(command, False)
+    assert {stage: round(Metrics.samples[stage][0], 6) for stage in ("queue", "build", "send")} \
+        == {"queue": 0.1, "build": 0.2, "send": 0.3}
+    assert "chrome" not in Metrics.samples and len(Metrics.samples["total"]) == 1
+    assert (Metrics.counters["commands"], Metrics.counters["failed"],
+            Metrics.counters["dropped"]) == (1, 1, 0)
@@ -0,0 +1,47 @@
+"""PlaybackState: states pushed by the tabs, cached and published to subscribers."""
+
+import json
+
+import pytest
+
+from controller import PlaybackState
+
+
+@pytest.fixture(name="published")
+def fixture_published(monkeypatch):
+    """A subscriber on a fresh PlaybackState; returns a function giving the states sent to it."""
+    monkeypatch.setattr(PlaybackState, "tabs", {})
+    monkeypatch.setattr(PlaybackState, "subscribers", [])
+    lines = []
+    PlaybackState.subscribe(lines.append)
+    return lambda: [json.loads(line.removeprefix("state ")) for line in lines]
+
+def test_update_is_cached_and_published(published):
+    PlaybackState.update("T1", json.dumps({"video": "abc", "position": 12.5, "paused": False}))
+    state, = published()
+    assert (state["tab"], state["position"], state["paused"]) == ("T1", 12.5, False)
+    assert PlaybackState.snapshot() == {"tabs": [state]}
+
+def test_chapter_index_is_kept_until_the_video_changes(published):
+    chapters = [{"start": 0, "title": "Intro"}, {"start": 60, "title": "Main"}]
+    PlaybackState.update("T1", json.dumps({"video": "abc", "chapter_index": chapters}))
+    PlaybackState.update("T1", json.dumps({"video": "abc", "position": 61}))
+    PlaybackState.update("T1", json.dumps({"video": "xyz", "position": 0}))
+    assert ["chapter_index" in state for state in published()] == [True, True, False]
+
+def test_malformed_updates_are_ignored(published):
+    for payload in ("{nope", "[1, 2]", None):
+        PlaybackState.update("T1", payload)
+    assert not published() and PlaybackState.snapshot() == {"tabs": []}
+
+def test_forgotten_tab_is_published_as_closed(published):
+    PlaybackState.forget("T1")  # Unknown: nothing to tell
+    PlaybackState.update("T1", json.dumps({"video": "abc"}))
+    PlaybackState.forget("T1")
+    assert published()[-1] == {"tab": "T1", "closed": True}
+    assert len(published()) == 2 and PlaybackState.snapshot() == {"tabs": []}
+
+def test_unsubscribed_client_gets_nothing_more(published):
+    PlaybackState.unsubscribe(PlaybackState.subscribers[0])
+    PlaybackState.update("T1", json.dumps({"video": "abc"}))
+    assert not published()
@@ -0,0 +1,86 @@
+"""CommandQueue policies and time to live (see CommandQueue)."""
+
+import queue
+
+import pytest
+
+from controller import CommandQueue, Controller, Metrics, QueuedCommand
+
+
+def names(commands):
+    return [command.name for command in commands]
+
+def test_priority_commands_go_first():
+    commands = CommandQueue()
+    commands.put(QueuedCommand("cc"))
+    commands.put(QueuedCommand("pause"))
+    assert commands.get().name == "pause"
+    assert commands.get().name == "cc"
+
+def test_heartbeats_are_not_queued_twice():
+    commands = CommandQueue()
+    commands.put(QueuedCommand("heartbeat"))
+    commands.put(QueuedCommand("heartbeat"))
+    assert commands.qsize() == 1
+
+def test_presses_of_the_same_toggle_pair_off():
+    commands = CommandQueue()
+    first, second = QueuedCommand("cc"), QueuedCommand("cc")
+    commands.put(first)
+    commands.put(QueuedCommand("skip_forward"))
+    commands.put(second)
+    assert names(commands.waiting) == ["skip_forward"]
+    assert first.future.result()["ok"] and second.future.result()["ok"]
+
+def test_toggles_of_different_tabs_do_not_pair_off():
+    commands = CommandQueue()
+    commands.put(QueuedCommand("cc", tab="A"))
+    commands.put(QueuedCommand("cc", tab="B"))
+    assert names(commands.waiting) == ["cc", "cc"]
+
+def test_latest_setter_wins():
+    commands = CommandQueue()
+    old = QueuedCommand("volume", {"volume": 10})
+    new = QueuedCommand("volume", {"volume": 40})
+    commands.put(old)
+    commands.put(new)
+    assert list(commands.waiting) == [new]
+    new.finish(True)
+    assert old.future.result()["superseded"]
+
+def test_full_queue_drops_the_oldest_seek_and_rejects_the_rest():
+    Controller.queue_capacity = 2
+    commands = CommandQueue()
+    oldest = QueuedCommand("skip_forward")
+    commands.put(oldest)
+    commands.put(QueuedCommand("restart"))
+    assert commands.put(QueuedCommand("skip_backward"))
+    assert oldest.future.result()["error"] == "dropped from the full queue"
+    rejected = QueuedCommand("theater")
+    assert not commands.put(rejected)
+    assert rejected.future.result()["error"] == "queue full"
+    assert names(commands.waiting) == ["restart", "skip_backward"]
+
+def test_expired_commands_are_skipped():
+    commands = CommandQueue()
+    stale = QueuedCommand("skip_forward")
+    stale.received -= Controller.seek_ttl + 1
+    commands.put(stale)
+    commands.put(QueuedCommand("cc"))
+    expired = Metrics.counters["expired"]
+    assert commands.get().name == "cc"
+    assert stale.future.result()["error"] == "expired in the queue"
+    assert Metrics.counters["expired"] == expired + 1
+    with pytest.raises(queue.Empty):
+        commands.get(timeout=0.01)
+
+def test_waiting_commands_expire_without_being_taken():
+    commands = CommandQueue()
+    stale, fresh = QueuedCommand("restart"), QueuedCommand("restart")
+    stale.received -= Controller.command_ttl + 1
+    commands.put(stale)
+    commands.put(fresh)
+    commands.put(QueuedCommand("exit"))
+    commands.expire_waiting()
+    assert stale.future.done() and not fresh.future.done()
+    assert names(commands.urgent) == ["exit"] and list(commands.waiting) == [fresh]
@@ -0,0 +1,170 @@
+"""TabPool against the fake Chrome: routing, idle sessions, lost sessions and their reconnects."""
+
+import threading
+import time
+
+import pytest
+
+from controller import (Controller, PlaybackState, QueuedCommand, SessionReader, TabPool, get_json,
+                        video_tabs)
+
+VIDEO_URL = "https://www.youtube.com/watch?v=abc"
+
+
+@pytest.fixture(name="pool")
+def fixture_pool(chrome, monkeypatch):
+    """A pool connected to one video tab of the fake Chrome; reconnects are not retried."""
+    monkeypatch.setattr(Controller, "reconnect_delay", 60.0)
+    monkeypatch.setattr(Controller, "reconnect_max_delay", 60.0)
+    monkeypatch.setattr(Controller, "ping_interval", 0.0)
+    chrome.open_tab(VIDEO_URL)
+    reader = SessionReader()
+    tab_pool = TabPool(reader.add, reader.remove)
+    tab_pool.sync(video_tabs(get_json(chrome.devtools_url, 5)))
+    yield tab_pool
+    tab_pool.close()
+
+def lose_tab(chrome, pool):
+    """Cut the connection of the pool's tab; the next heartbeat starts reconnecting it"""
+    (target_id, session), = pool.sessions.items()
+    session.send(*TabPool.PING).result(timeout=5)  # The fake Chrome is serving the session
+    chrome.disconnect(chrome.tabs[target_id])
+    deadline = time.monotonic() + 5
+    while not session.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pool.heartbeat()
+    return target_id
+
+def wait_for_reconnect(pool, target_id):
+    """Wait for the reconnect thread of a tab and collect its outcome"""
+    pool.reconnecting[target_id].join(5)
+    pool.heartbeat()
+
+def test_sync_leaves_a_lost_tab_to_its_reconnect_thread(chrome, pool):
+    release = threading.Event()
+    opened = []
+
+    def slow_open(tab):
+        release.wait(5)
+        opened.append(tab["id"])
+        return TabPool.open(pool, tab)
+
+    pool.open = slow_open
+    target_id = lose_tab(chrome, pool)
+    start = time.monotonic()
+    pool.sync(list(pool.tabs.values()))
+    pool.sync(list(pool.tabs.values()))
+    assert time.monotonic() - start < 1
+    assert target_id in pool.reconnecting and not pool.sessions
+    release.set()
+    wait_for_reconnect(pool, target_id)
+    assert opened == [target_id]
+    assert target_id in pool.sessions and target_id not in pool.down_since
+
+def test_command_for_a_lost_tab_waits_for_its_reconnect(chrome, pool):
+    release = threading.Event()
+    pool.open = lambda tab: release.wait(5) and TabPool.open(pool, tab)
+    target_id = lose_tab(chrome, pool)
+    command = QueuedCommand("cc")
+    assert not pool.missing(command)
+    assert pool.route(command) == []
+    assert pool.parked == {target_id: [command]}
+    release.set()
+    wait_for_reconnect(pool, target_id)
+    assert list(Controller.command_queue.waiting) == [command]
+    assert pool.route(command) == [(pool.sessions[target_id], command)]
+
+def test_failed_reconnect_is_retried_after_a_backoff(chrome, pool):
+    pool.open = lambda tab: None
+    target_id = lose_tab(chrome, pool)
+    command = QueuedCommand("cc", tab=target_id)
+    pool.route(command)
+    wait_for_reconnect(pool, target_id)
+    assert pool.failures[target_id] == 1
+    assert pool.retry_at[target_id] > time.monotonic() + 20
+    assert list(Controller.command_queue.waiting) == [command]  # Routed again, or expires
+    pool.heartbeat()
+    assert target_id not in pool.reconnecting
+
+def test_backoff_doubles_up_to_the_limit_with_jitter(monkeypatch):
+    monkeypatch.setattr(Controller, "reconnect_delay", 0.1)
+    monkeypatch.setattr(Controller, "reconnect_max_delay", 1.0)
+    for failures, limit in [(0, 0.1), (1, 0.1), (2, 0.2), (4, 0.8), (5, 1.0), (50, 1.0)]:
+        delays = [TabPool.backoff(failures) for _ in range(200)]
+        assert limit / 2 <= min(delays) and max(delays) <= limit
+        assert max(delays) - min(delays) > limit / 10
+
+def add_tab(chrome, pool, browser="Chrome"):
+    """Open another video tab of the given browser and sync the pool with it"""
+    target_id = chrome.open_tab(VIDEO_URL).id
+    tabs = video_tabs(get_json(chrome.devtools_url, 5))
+    for tab in tabs:
+        tab["browser"] = browser if tab["id"] == target_id else "Chrome"
+    pool.sync(tabs)
+    return target_id
+
+def test_commands_go_to_the_tab_they_name_or_the_most_active_one(chrome, pool):
+    first, = pool.sessions
+    second = add_tab(chrome, pool, browser="Edge")
+    pool.activity[first] = time.monotonic()
+    assert pool.route(QueuedCommand("cc"))[0][0].target_id == first
+    assert pool.route(QueuedCommand("cc", tab=second))[0][0].target_id == second
+    assert pool.route(QueuedCommand("cc", tab="Edge"))[0][0].target_id == second
+    pool.activity[second] = time.monotonic() + 1
+    assert pool.route(QueuedCommand("cc"))[0][0].target_id == second
+
+def test_command_for_all_tabs_is_copied_per_tab(chrome, pool):
+    add_tab(chrome, pool)
+    command = QueuedCommand("skip", {"skip_seconds": 5}, request_id=3, tab="all")
+    pairs = pool.route(command)
+    assert {session.target_id for session, _copy in pairs} == set(pool.sessions)
+    assert all(copy.tab == session.target_id and copy.args == command.args
+               and copy.request_id == 3 for session, copy in pairs)
+    for _session, copy in pairs:
+        copy.finish(True)
+    assert command.future.result(timeout=1)["ok"]
+
+def test_unknown_tab_fails_the_command(pool):
+    command = QueuedCommand("cc", tab="Firefox")
+    assert pool.route(command) == []
+    assert command.future.result(timeout=1)["error"] == "unknown tab: Firefox"
+
+def test_no_session_gives_none(pool):
+    pool.close()
+    assert pool.route(QueuedCommand("cc")) is None
+
+def test_idle_session_is_closed_and_reopened_for_the_next_command(pool, monkeypatch):
+    monkeypatch.setattr(Controller, "idle_timeout", 60)
+    target_id, = pool.sessions
+    pool.activity[target_id] = time.monotonic() - 61
+    pool.sweep()
+    assert not pool.sessions and pool.idle == {target_id}
+    command = QueuedCommand("cc")
+    for tab in pool.missing(command):
+        pool.connect(tab)
+    assert pool.route(command)[0][0].target_id == target_id
+    assert not pool.idle
+
+def test_idle_session_stays_open_while_a_client_is_subscribed(pool, monkeypatch):
+    monkeypatch.setattr(Controller, "idle_timeout", 60)
+    monkeypatch.setattr(PlaybackState, "subscribers", [print])
+    target_id, = pool.sessions
+    pool.activity[target_id] = time.monotonic() - 61
+    pool.sweep()
+    assert target_id in pool.sessions
+
+def test_heartbeat_drops_a_tab_that_stopped_answering_pings(chrome, pool, monkeypatch):
+    monkeypatch.setattr(Controller, "ping_timeout", 0.1)
+    target_id, = pool.sessions
+    session = pool.sessions[target_id]
+    pool.heartbeat()
+    assert pool.pings[target_id][0].result(timeout=5)
+    chrome.tabs[target_id].latency = 0.5
+    pool.heartbeat()
+    time.sleep(0.2)
+    chrome.tabs[target_id].latency = 0.0
+    pool.heartbeat()
+    assert session.closed and target_id not in pool.sessions
+    assert target_id in pool.down_since and target_id in pool.reconnecting
+    wait_for_reconnect(pool, target_id)
+    assert target_id in pool.sessions
@@ -0,0 +1,74 @@
+"""TabWatcher against fake browsers: the tab index fed by CDP Target events."""
+
+import time
+
+import pytest
+
+from controller import Controller, TabWatcher, browser_name
+from fake_cdp import FakeChrome
+
+VIDEO_URL = "https://www.youtube.com/watch?v=abc"
+
+
+@pytest.fixture(name="watcher")
+def fixture_watcher(chrome, monkeypatch):
+    """A TabWatcher connected to the fake Chrome."""
+    monkeypatch.setattr(Controller, "devtools_urls", [chrome.devtools_url])
+    tab_watcher = TabWatcher()
+    assert tab_watcher.connect()
+    return tab_watcher
+
+def wait_until(watcher, predicate, timeout=5.0):
+    """Wait for the tab index to satisfy predicate(tabs by id)"""
+    deadline = time.monotonic() + timeout
+    while not predicate({tab["id"]: tab for tab in watcher.snapshot()}):
+        remaining = deadline - time.monotonic()
+        assert remaining > 0, watcher.snapshot()
+        watcher.wait_for_change(watcher.version, min(remaining, 0.1))
+
+def test_tabs_open_before_connecting_are_listed(chrome, monkeypatch):
+    tab = chrome.open_tab(VIDEO_URL)
+    monkeypatch.setattr(Controller, "devtools_urls", [chrome.devtools_url])
+    watcher = TabWatcher()
+    assert watcher.connect()
+    wait_until(watcher, lambda tabs: tab.id in tabs)
+    listed = {tab["id"]: tab for tab in watcher.snapshot()}[tab.id]
+    assert listed["url"] == VIDEO_URL
+    assert listed["browser"] == browser_name(chrome.devtools_url)
+    assert listed["webSocketDebuggerUrl"].endswith(f":{chrome.port}/devtools/page/{tab.id}")
+
+def test_opened_navigated_and_closed_tabs_follow_the_events(chrome, watcher):
+    tab = chrome.open_tab(VIDEO_URL)
+    wait_until(watcher, lambda tabs: tab.id in tabs)
+    chrome.navigate(tab, "https://www.youtube.com/watch?v=xyz")
+    wait_until(watcher, lambda tabs: tabs[tab.id]["url"].endswith("xyz"))
+    chrome.close_tab(tab)
+    wait_until(watcher, lambda tabs: tab.id not in tabs)
+
+def test_closer_runs_when_its_tab_closes(chrome, watcher):
+    tab = chrome.open_tab(VIDEO_URL)
+    wait_until(watcher, lambda tabs: tab.id in tabs)
+    closed = []
+    with watcher.changed:
+        watcher.closers[tab.id] = lambda: closed.append(tab.id)
+    chrome.close_tab(tab)
+    wait_until(watcher, lambda tabs: tab.id not in tabs)
+    assert closed == [tab.id]
+
+def test_tabs_of_each_browser_are_kept_apart(chrome, monkeypatch):
+    other = FakeChrome().start()
+    first, second = chrome.open_tab(VIDEO_URL), other.open_tab(VIDEO_URL)
+    monkeypatch.setattr(Controller, "devtools_urls", [chrome.devtools_url, other.devtools_url])
+    watcher = TabWatcher()
+    assert watcher.connect() and not watcher.missing()
+    wait_until(watcher, lambda tabs: first.id in tabs and second.id in tabs)
+    other.stop()  # The browser went away: its tabs go with it
+    wait_until(watcher, lambda tabs: second.id not in tabs)
+    assert watcher.missing() == [other.devtools_url]
+    assert [tab["id"] for tab in watcher.snapshot()] == [first.id]
+
+def test_unreachable_browser_is_missing(monkeypatch):
+    monkeypatch.setattr(Controller, "devtools_urls", ["http://127.0.0.1:9/json"])
+    watcher = TabWatcher()
+    assert not watcher.connect() and not watcher.ready()
+    assert watcher.missing() == ["http://127.0.0.1:9/json"]
@@ -0,0 +1,39 @@
+"""TraceRecorder: the trace lines written for finished client commands."""
+
+import json
+import queue
+
+from controller import Controller, QueuedCommand, TraceRecorder
+
+
+def test_entry_has_the_stages_the_command_reached():
+    command = QueuedCommand("skip", {"skip_seconds": 5}, tab="all")
+    command.js_size = 38
+    command.stages.update(taken=command.received + 0.002, built=command.received + 0.003)
+    entry = TraceRecorder.entry(command, {"ok": False, "error": "no tab", "ms": 4.5}, 1e9)
+    assert entry == {"t": 1e9, "name": "skip", "args": {"skip_seconds": 5}, "tab": "all",
+                     "ok": False, "error": "no tab", "js": 38, "queue": 2.0, "build": 1.0,
+                     "total": 4.5}
+
+def test_nothing_is_watched_while_tracing_is_off():
+    command = QueuedCommand("cc")
+    TraceRecorder.watch(command)
+    command.finish(True)
+    assert TraceRecorder.pending.empty()
+
+def test_finished_commands_are_written_in_order(tmp_path, monkeypatch):
+    trace = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(Controller, "trace_file", str(trace))
+    monkeypatch.setattr(TraceRecorder, "pending", queue.SimpleQueue())
+    monkeypatch.setattr(TraceRecorder, "thread", None)
+    commands = [QueuedCommand("cc"), QueuedCommand("volume", {"volume": 40})]
+    for command in commands:
+        TraceRecorder.watch(command)
+    QueuedCommand("theater").finish(True)  # Not from a client: not watched
+    for command in commands:
+        command.finish(True)
+    TraceRecorder.flush()
+    entries = [json.loads(line) for line in trace.read_text(encoding="utf-8").splitlines()]
+    assert [(entry["name"], entry.get("args"), entry["ok"]) for entry in entries] == [
+        ("cc", None, True), ("volume", {"volume": 40}, True)]
+    assert all(entry["total"] >= 0 and "queue" not in entry for entry in entries)